@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Benchmark the voice generation pipeline without any speech models.
+
+Runs the same flow as `make voices` (load lines, status/hash check, synthesis,
+pause trimming, signal pre-screen, loudness normalization, verification, OGG
+encoding, report and manifest writes) on a synthetic script using the stub
+TTS/STT backends, then reports how long each stage took. A second, no-op pass
+measures the incremental "everything is current" path.
+
+Everything is written to a scratch directory, so the real voice assets,
+manifests and reports are never touched. Requires numpy and ffmpeg; pydub and
+jiwer are used when installed, like in the real pipeline.
+
+Example:
+  python3 tools/benchmark_voice_pipeline.py --lines 5000 --lang en
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent
+
+STAGE_ORDER = [
+    "load_lines",
+    "status",
+    "synthesize",
+    "trim",
+    "stitch",
+    "prescreen",
+    "loudness",
+    "verify",
+    "encode",
+    "report",
+    "manifest",
+    "timing",
+]
+
+EN_WORDS = (
+    "the han brothers march to the gate and the rebels scatter before the banner "
+    "of heaven we swear by the peach garden to serve the people and restore peace "
+    "magistrate commander soldiers ride at dawn through the pass with spears drawn"
+).split()
+ZH_CHARS = "汉兄弟出征城门叛军溃散天命旗帜桃园结义保国安民将军士兵黎明策马关隘长枪"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Model-free voice pipeline benchmark.")
+    parser.add_argument("--lines", type=int, default=5000, help="Number of synthetic voice lines.")
+    parser.add_argument("--lang", default="en", choices=["en", "zh"], help="Language of the synthetic script.")
+    parser.add_argument("--seed", type=int, default=1337, help="Seed for the synthetic script.")
+    parser.add_argument("--work-dir", default=None, help="Scratch directory (default: a fresh temp dir).")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory afterwards.")
+    parser.add_argument("--json-out", default=None, help="Also write the results as JSON to this path.")
+    parser.add_argument("--verbose", action="store_true", help="Show the generator's per-line output.")
+    return parser.parse_args()
+
+
+def synthetic_text(rng, lang_code):
+    sentences = []
+    for _ in range(rng.randint(1, 3)):
+        if lang_code == "zh":
+            sentence = "".join(rng.choice(ZH_CHARS) for _ in range(rng.randint(6, 18)))
+            sentences.append(sentence + rng.choice("。！？"))
+        else:
+            words = [rng.choice(EN_WORDS) for _ in range(rng.randint(4, 16))]
+            if len(words) > 6 and rng.random() < 0.5:
+                words[len(words) // 2] += ","
+            sentence = " ".join(words)
+            sentences.append(sentence[0].upper() + sentence[1:] + rng.choice(".!?"))
+    return ("" if lang_code == "zh" else " ").join(sentences)
+
+
+def build_synthetic_script(count, lang_code, characters, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"bench_{i:05d}",
+            "char": rng.choice(characters),
+            "text": synthetic_text(rng, lang_code),
+        }
+        for i in range(count)
+    ]
+
+
+def run_pass(voices, lang_code, quiet):
+    voices.reset_stage_timings()
+    sink = io.StringIO() if quiet else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        exit_code = voices.main(["--langs", lang_code])
+    wall = time.perf_counter() - start
+    return exit_code, wall, dict(voices.STAGE_TIMINGS), dict(voices.STAGE_COUNTS)
+
+
+def print_pass(title, line_count, wall, timings, counts):
+    print(f"\n{title}: {wall:.2f}s wall, {line_count / wall if wall else 0:.1f} lines/s overall")
+    print(f"  {'stage':<12} {'calls':>7} {'seconds':>10} {'ms/call':>10} {'lines/s':>10}")
+    for stage in STAGE_ORDER + sorted(set(timings) - set(STAGE_ORDER)):
+        if stage not in timings:
+            continue
+        seconds = timings[stage]
+        calls = counts.get(stage, 0)
+        per_call = 1000.0 * seconds / calls if calls else 0.0
+        per_line = line_count / seconds if seconds else float("inf")
+        print(f"  {stage:<12} {calls:>7} {seconds:>10.3f} {per_call:>10.2f} {per_line:>10.1f}")
+
+
+def main():
+    args = parse_args()
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg is required for the encode stage but was not found on PATH.")
+        return 1
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="voice-bench-")).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (work_dir / "tools").mkdir(exist_ok=True)
+
+    os.environ["VOICE_LANG"] = args.lang
+    os.environ["VOICE_TTS_BACKEND"] = "stub"
+    os.environ["VOICE_STT_BACKEND"] = "stub"
+    sys.path.insert(0, str(TOOLS_DIR))
+    import generate_voices_xtts as voices
+    import voice_loudness
+    import voice_timing
+
+    # The generator resolves its inputs and outputs relative to the working
+    # directory and PROJECT_ROOT; point both at the scratch tree.
+    previous_cwd = os.getcwd()
+    os.chdir(work_dir)
+    voices.PROJECT_ROOT = work_dir
+    voice_loudness.PROJECT_ROOT = work_dir
+    voice_timing.PROJECT_ROOT = work_dir
+
+    try:
+        characters = sorted(k for k in voices.CHAR_TARGETS if k != "default")
+        start = time.perf_counter()
+        script = build_synthetic_script(args.lines, args.lang, characters, args.seed)
+        with open(voices.extracted_lines_file(args.lang), "w", encoding="utf-8") as f:
+            json.dump(script, f, ensure_ascii=False)
+        extract_seconds = time.perf_counter() - start
+
+        print(f"Voice pipeline benchmark: {args.lines} {args.lang} lines in {work_dir}")
+        print(f"  synthetic script written in {extract_seconds:.2f}s")
+
+        results = {"lines": args.lines, "language": args.lang, "extract_seconds": extract_seconds, "passes": {}}
+        for title, key in (("Cold pass (generate everything)", "cold"), ("Warm pass (nothing to do)", "warm")):
+            exit_code, wall, timings, counts = run_pass(voices, args.lang, quiet=not args.verbose)
+            if exit_code:
+                print(f"{title} failed with exit code {exit_code}")
+                return exit_code
+            print_pass(title, args.lines, wall, timings, counts)
+            results["passes"][key] = {"wall_seconds": wall, "stages": timings, "calls": counts}
+
+        audio_dir = Path(voices.OUTPUT_DIR) / args.lang
+        total_bytes = sum(p.stat().st_size for p in audio_dir.glob("*.ogg"))
+        results["output_bytes"] = total_bytes
+        print(f"\nEncoded output: {total_bytes / 1e6:.1f} MB in {audio_dir}")
+    finally:
+        os.chdir(previous_cwd)
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,165 @@
 """
 Check the language of voice samples in the mandarin folder using Whisper.
 This will detect if files are actually Mandarin or if they're Japanese/other languages.
+
+With --fast, only Whisper's language detection runs, on the first 30 seconds of
+each file. Files are decoded in parallel and results are cached by file hash, so
+re-checking a folder only looks at new or changed files. Files detected below
+--threshold confidence still get a full transcription.
 """
 
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from faster_whisper import WhisperModel
 
 # Path to mandarin voice samples
 MANDARIN_RAW_DIR = "assets/voice_samples/mandarin/raw"
+LANGUAGE_CACHE_FILE = Path(__file__).resolve().parent / "voice_sample_language_cache.json"
+SAMPLE_RATE = 16000
+DETECT_WINDOW_SECONDS = 30
+MANDARIN_CODES = ['zh', 'zh-cn', 'zh-tw']
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_language_cache():
+    if not LANGUAGE_CACHE_FILE.exists():
+        return {}
+    try:
+        with open(LANGUAGE_CACHE_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_language_cache(cache):
+    with open(LANGUAGE_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def decode_window(audio_file):
+    """Decode only the first 30 s of a file as 16 kHz mono for language detection.
+
+    Uses PyAV the same way faster_whisper.decode_audio does, but stops reading
+    packets once the window is full instead of decoding the whole file.
+    """
+    import av
+    import numpy as np
+
+    limit = SAMPLE_RATE * DETECT_WINDOW_SECONDS
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    chunks = []
+    decoded = 0
+    with av.open(str(audio_file), metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+                decoded += chunks[-1].shape[0]
+            if decoded >= limit:
+                break
+        else:
+            for resampled in resampler.resample(None):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+    audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+    return audio[:limit].astype(np.float32) / 32768.0
+
 
-def check_languages():
+def detect_language(model, audio):
+    """Return (language, probability) for a decoded window without transcribing it."""
+    if hasattr(model, 'detect_language'):
+        language, probability, _ = model.detect_language(audio)
+        return language, float(probability)
+    # Older faster-whisper: transcribe() detects the language up front and only
+    # decodes text when the segment generator is consumed, which we never do.
+    _, info = model.transcribe(audio, language=None)
+    return info.language, float(info.language_probability)
+
+
+def print_result(result):
+    print(f"  Detected Language: {result['detected_language']} (confidence: {result['confidence']:.2%})")
+    text = result.get('transcription')
+    if text is not None:
+        print(f"  Transcription: {text[:100]}{'...' if len(text) > 100 else ''}")
+    status = "✓ MANDARIN" if result['is_mandarin'] else f"✗ NOT MANDARIN (detected: {result['detected_language']})"
+    print(f"  Status: {status}")
+
+
+def check_languages_fast(model, audio_files, threshold, workers, use_cache=True):
+    """Language-ID only; full transcription just for low-confidence files."""
+    cache = load_language_cache() if use_cache else {}
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Hash everything first so cached files are never decoded.
+        hashing = {audio_file: pool.submit(file_hash, audio_file) for audio_file in audio_files}
+        digests = {}
+        for audio_file, future in hashing.items():
+            try:
+                digests[audio_file] = future.result()
+            except Exception as e:
+                digests[audio_file] = e
+        decoded = {
+            audio_file: pool.submit(decode_window, audio_file)
+            for audio_file, digest in digests.items()
+            if not isinstance(digest, Exception) and digest not in cache
+        }
+        for audio_file in audio_files:
+            print(f"\nChecking: {audio_file.name}")
+            print("-" * 80)
+            try:
+                digest = digests[audio_file]
+                if isinstance(digest, Exception):
+                    raise digest
+                cached = cache.get(digest)
+                if cached:
+                    result = {**cached, 'file': audio_file.name}
+                    print("  (cached)")
+                else:
+                    language, probability = detect_language(model, decoded[audio_file].result())
+                    result = {
+                        'file': audio_file.name,
+                        'detected_language': language,
+                        'confidence': probability,
+                        'is_mandarin': language in MANDARIN_CODES,
+                    }
+                    if probability < threshold:
+                        print(f"  Low confidence ({probability:.2%}); transcribing the full file...")
+                        segments, info = model.transcribe(str(audio_file), language=None)
+                        result['transcription'] = " ".join([segment.text for segment in segments]).strip()
+                        result['detected_language'] = info.language
+                        result['confidence'] = float(info.language_probability)
+                        result['is_mandarin'] = info.language in MANDARIN_CODES
+                    cache[digest] = {k: v for k, v in result.items() if k != 'file'}
+                print_result(result)
+                results.append(result)
+            except Exception as e:
+                print(f"  ERROR: {e}")
+                results.append({
+                    'file': audio_file.name,
+                    'error': str(e)
+                })
+    if use_cache:
+        save_language_cache(cache)
+    return results
+
+
+def check_languages(fast=False, threshold=0.8, workers=None, use_cache=True, raw_dir=MANDARIN_RAW_DIR):
     """Check the language of all files in the mandarin raw folder"""
     print("Loading Whisper model...")
     model = WhisperModel("base", device="cpu", compute_type="int8")
     
-    raw_dir = Path(MANDARIN_RAW_DIR)
+    raw_dir = Path(raw_dir)
     if not raw_dir.exists():
         print(f"Error: Directory not found: {raw_dir}")
         return
@@ -30,6 +174,11 @@ def check_languages():
     print(f"\nFound {len(audio_files)} audio file(s). Checking languages...\n")
     print("=" * 80)
     
+    if fast:
+        workers = workers or min(8, os.cpu_count() or 1)
+        results = check_languages_fast(model, sorted(audio_files), threshold, workers, use_cache=use_cache)
+        return summarize(results)
+
     results = []
     for audio_file in sorted(audio_files):
         print(f"\nChecking: {audio_file.name}")
@@ -67,7 +216,10 @@ def check_languages():
                 'error': str(e)
             })
     
-    # Summary
+    return summarize(results)
+
+
+def summarize(results):
     print("\n" + "=" * 80)
     print("SUMMARY")
     print("=" * 80)
@@ -88,7 +240,20 @@ def check_languages():
 
 
 if __name__ == "__main__":
-    check_languages()
+    parser = argparse.ArgumentParser(description="Check the language of Mandarin reference voice samples.")
+    parser.add_argument("--dir", default=MANDARIN_RAW_DIR, help="Folder of samples to check.")
+    parser.add_argument("--fast", action="store_true", help="Language detection on the first 30 s only, cached by file hash.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="In --fast mode, fully transcribe files below this confidence.")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel decode workers for --fast (default: up to 8).")
+    parser.add_argument("--no-cache", action="store_true", help="In --fast mode, ignore and do not update the language cache.")
+    args = parser.parse_args()
+    check_languages(
+        fast=args.fast,
+        threshold=args.threshold,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        raw_dir=args.dir,
+    )
 
 
 
@@ -1,13 +1,24 @@
+import argparse
+import glob
+import hashlib
+import json
 import os
 import sys
 import subprocess
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 VENV_PYTHON = "./tools/venv_uvr/bin/python3"
 DEMUCS_BIN = "./tools/venv_uvr/bin/demucs"
 INPUT_DIR = "assets/voice_samples/movies/raw"
 OUTPUT_DIR = "assets/voice_samples/movies/clean"
+DEMUCS_MODEL = "htdemucs"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac", ".m4a")
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+CLEAN_MANIFEST = ".clean_manifest.json"
+STEM_CACHE_DIR = "tools/stem_cache"
 
 
 def clean_sample(filepath):
@@ -35,59 +46,309 @@ def clean_sample(filepath):
         os.makedirs(output_dir)
 
     filename = os.path.basename(filepath)
+    name_no_ext = os.path.splitext(filename)[0]
+    output_filename = f"clean_{name_no_ext}.wav"
+    output_path = os.path.join(output_dir, output_filename)
     print(f"--- Cleaning: {filename} ---")
-    print("Running Demucs AI separation (this may take a minute)...")
 
-    # Run Demucs
-    # --two-stems=vocals creates 'vocals' and 'no_vocals'
-    # -d cpu for compatibility (Mac Silicon can use mps but cpu is safer for first run)
+    input_hash = file_hash(input_path)
+    vocal_source = stem_cache_path(input_hash)
+    workspace = job_workspace()
+    try:
+        if os.path.exists(vocal_source):
+            print(f"Reusing cached {DEMUCS_MODEL} vocals: {vocal_source}")
+        else:
+            print("Running Demucs AI separation (this may take a minute)...")
+
+            # Run Demucs
+            # --two-stems=vocals creates 'vocals' and 'no_vocals'
+            # -d cpu for compatibility (Mac Silicon can use mps but cpu is safer for first run)
+            result = subprocess.run(
+                [DEMUCS_BIN, "--two-stems=vocals", "-n", DEMUCS_MODEL, "-o", workspace, input_path]
+            )
+
+            if result.returncode != 0:
+                print("Error: Demucs failed.")
+                return
+
+            # Demucs output structure: <workspace>/<model>/[filename_no_ext]/vocals.wav
+            separated = os.path.join(workspace, DEMUCS_MODEL, name_no_ext, "vocals.wav")
+            if not os.path.exists(separated):
+                print(f"Error: Could not find separated vocal file at {separated}")
+                return
+            store_stem(separated, vocal_source)
+
+        print(f"Normalizing volume and saving to: {output_path}")
+        # Two-pass ffmpeg loudnorm; I=-16 is a standard loudness for speech
+        staged_output = os.path.join(workspace, output_filename)
+        ok, stderr = loudnorm_two_pass(vocal_source, staged_output)
+        if not ok:
+            print(f"Error: FFmpeg normalization failed: {stderr}")
+            # Fallback to copy if normalization fails
+            shutil.copy(vocal_source, staged_output)
+        shutil.move(staged_output, output_path)
+        if ok:
+            print(f"SUCCESS! Cleaned and normalized vocals saved to: {output_path}")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stem_cache_path(input_hash, model_name=DEMUCS_MODEL):
+    """Separated vocals are cached by input content and Demucs model, not by file name."""
+    return os.path.join(STEM_CACHE_DIR, model_name, input_hash[:2], input_hash, "vocals.wav")
+
+
+def job_workspace():
+    """A private scratch directory per job, on the same filesystem as the stem cache."""
+    os.makedirs(STEM_CACHE_DIR, exist_ok=True)
+    return tempfile.mkdtemp(prefix=".job-", dir=STEM_CACHE_DIR)
+
+
+def store_stem(separated_path, cache_path):
+    """Atomically move a freshly separated stem into the cache."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    os.replace(separated_path, cache_path)
+    return cache_path
+
+
+def batch_output_dir(input_path):
+    """<type>/raw/file.mp3 -> <type>/clean, otherwise a clean/ folder next to the input."""
+    parent = os.path.dirname(os.path.abspath(input_path))
+    if os.path.basename(parent) == "raw":
+        return os.path.join(os.path.dirname(parent), "clean")
+    return os.path.join(parent, "clean")
+
+
+def collect_inputs(pattern):
+    if os.path.isdir(pattern):
+        paths = [
+            os.path.join(pattern, name)
+            for name in os.listdir(pattern)
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        ]
+    else:
+        paths = [p for p in glob.glob(pattern, recursive=True) if p.lower().endswith(AUDIO_EXTENSIONS)]
+    return sorted(paths)
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, CLEAN_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_manifest(output_dir, updates):
+    """Merge this run's entries into the manifest on disk, so parallel runs do not drop each other's."""
+    manifest = load_manifest(output_dir)
+    manifest.update(updates)
+    tmp_path = os.path.join(output_dir, f"{CLEAN_MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, os.path.join(output_dir, CLEAN_MANIFEST))
+
+
+def is_up_to_date(input_path, output_path, input_hash, entry):
+    """Output is newer than the input and both hashes match the manifest."""
+    if not entry or not os.path.exists(output_path):
+        return False
+    if os.path.getmtime(output_path) < os.path.getmtime(input_path):
+        return False
+    return (
+        entry.get("input_hash") == input_hash
+        and entry.get("demucs_model") == DEMUCS_MODEL
+        and entry.get("loudnorm") == LOUDNORM_FILTER
+        and entry.get("output_hash") == file_hash(output_path)
+    )
+
+
+def loudnorm_two_pass(source, output_path):
+    """Measure with loudnorm, then apply it with the measured values (linear gain where possible)."""
+    measure = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", source,
+         "-af", f"{LOUDNORM_FILTER}:print_format=json", "-f", "null", "-"],
+        capture_output=True,
+    )
+    stderr = measure.stderr.decode("utf-8", "replace")
+    if measure.returncode != 0 or "{" not in stderr:
+        return False, stderr
+    stats = json.loads(stderr[stderr.rindex("{"):stderr.rindex("}") + 1])
+    second_pass = (
+        f"{LOUDNORM_FILTER}:measured_I={stats['input_i']}:measured_TP={stats['input_tp']}"
+        f":measured_LRA={stats['input_lra']}:measured_thresh={stats['input_thresh']}"
+        f":offset={stats['target_offset']}:linear=true"
+    )
     result = subprocess.run(
-        [DEMUCS_BIN, "--two-stems=vocals", "-o", "tools/temp_separation", input_path]
+        ["ffmpeg", "-hide_banner", "-i", source, "-af", second_pass, "-y", output_path],
+        capture_output=True,
     )
+    return result.returncode == 0, result.stderr.decode("utf-8", "replace")
+
+
+class DemucsSeparator:
+    """Loads the Demucs model once and separates vocals in-process."""
 
-    if result.returncode != 0:
-        print("Error: Demucs failed.")
+    def __init__(self, model_name=DEMUCS_MODEL, device=None):
+        import torch
+        from demucs.pretrained import get_model
+
+        self.torch = torch
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = get_model(model_name)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def separate_vocals(self, input_path, vocals_path):
+        from demucs.apply import apply_model
+        from demucs.audio import AudioFile, save_audio
+
+        wav = AudioFile(input_path).read(
+            streams=0, samplerate=self.model.samplerate, channels=self.model.audio_channels
+        )
+        # Same normalization as the demucs CLI.
+        ref = wav.mean(0)
+        wav = (wav - ref.mean()) / ref.std()
+        with self.torch.no_grad():
+            sources = apply_model(self.model, wav[None], device=self.device, split=True, overlap=0.25, progress=False)[0]
+        sources = sources * ref.std() + ref.mean()
+        vocals = sources[self.model.sources.index("vocals")]
+        os.makedirs(os.path.dirname(vocals_path), exist_ok=True)
+        save_audio(vocals.cpu(), vocals_path, samplerate=self.model.samplerate)
+
+
+def ensure_demucs_python():
+    """Re-run under the UVR venv when demucs is not importable here."""
+    try:
+        import demucs  # noqa: F401
         return
+    except ImportError:
+        pass
+    venv_python = os.path.abspath(VENV_PYTHON)
+    if os.path.exists(venv_python) and os.path.abspath(sys.executable) != venv_python:
+        os.execv(venv_python, [venv_python] + sys.argv)
+    print(f"Error: demucs is not installed for {sys.executable} (expected it in {VENV_PYTHON}).")
+    sys.exit(1)
 
-    # Find the resulting vocal file
-    # Demucs output structure: tools/temp_separation/htdemucs/[filename_no_ext]/vocals.wav
-    name_no_ext = os.path.splitext(filename)[0]
-    vocal_source = os.path.join(
-        "tools/temp_separation", "htdemucs", name_no_ext, "vocals.wav"
-    )
 
-    if os.path.exists(vocal_source):
+def clean_batch(pattern, workers=None, force=False):
+    inputs = collect_inputs(pattern)
+    if not inputs:
+        print(f"No audio files found for: {pattern}")
+        return 1
+
+    manifests = {}
+    updates = {}
+    jobs = []
+    skipped = 0
+    for input_path in inputs:
+        output_dir = batch_output_dir(input_path)
+        name_no_ext = os.path.splitext(os.path.basename(input_path))[0]
         output_filename = f"clean_{name_no_ext}.wav"
         output_path = os.path.join(output_dir, output_filename)
-        
-        print(f"Normalizing volume and saving to: {output_path}")
-        # Use ffmpeg to normalize volume (loudnorm) and convert to wav
-        # I=-16 is a standard loudness for speech
-        result = subprocess.run([
-            "ffmpeg", "-i", vocal_source,
-            "-af", "loudnorm=I=-16:TP=-1.5:LRA=11",
-            "-y", output_path
-        ], capture_output=True)
-
-        if result.returncode != 0:
-            print(f"Error: FFmpeg normalization failed: {result.stderr.decode('utf-8')}")
-            # Fallback to copy if normalization fails
-            shutil.copy(vocal_source, output_path)
-        else:
-            print(f"SUCCESS! Cleaned and normalized vocals saved to: {output_path}")
+        manifest = manifests.setdefault(output_dir, load_manifest(output_dir))
+        input_hash = file_hash(input_path)
+        if not force and is_up_to_date(input_path, output_path, input_hash, manifest.get(output_filename)):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_dir, output_filename, output_path, input_hash))
 
-        # Cleanup temp files
-        shutil.rmtree("tools/temp_separation")
-    else:
-        print(f"Error: Could not find separated vocal file at {vocal_source}")
+    to_separate = [job for job in jobs if not os.path.exists(stem_cache_path(job[4]))]
+    print(
+        f"{len(inputs)} file(s): {len(jobs)} to clean ({len(jobs) - len(to_separate)} with cached stems), "
+        f"{skipped} already up to date."
+    )
+    if not jobs:
+        return 0
+
+    separator = None
+    if to_separate:
+        ensure_demucs_python()
+        print(f"Loading Demucs model {DEMUCS_MODEL} once for the whole batch...")
+        separator = DemucsSeparator()
+
+    workspace = job_workspace()
+    failures = 0
+    cleaned = 0
+    pending = []
+    # Separation is GPU/CPU heavy and runs here in order; each finished stem is
+    # handed to the pool for ffmpeg loudnorm while the next file separates.
+    try:
+        with ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1)) as pool:
+            for i, (input_path, output_dir, output_filename, output_path, input_hash) in enumerate(jobs, start=1):
+                vocal_source = stem_cache_path(input_hash)
+                if os.path.exists(vocal_source):
+                    print(f"[{i}/{len(jobs)}] Cached vocals: {os.path.basename(input_path)}")
+                else:
+                    print(f"[{i}/{len(jobs)}] Separating vocals: {os.path.basename(input_path)}")
+                    separated = os.path.join(workspace, f"{i:03d}_vocals.wav")
+                    try:
+                        separator.separate_vocals(input_path, separated)
+                    except Exception as e:
+                        print(f"  Error: Demucs failed: {e}")
+                        failures += 1
+                        continue
+                    store_stem(separated, vocal_source)
+                os.makedirs(output_dir, exist_ok=True)
+                staged_output = os.path.join(workspace, f"{i:03d}_{output_filename}")
+                future = pool.submit(loudnorm_two_pass, vocal_source, staged_output)
+                pending.append((future, staged_output, output_dir, output_filename, output_path, input_hash))
+
+            for future, staged_output, output_dir, output_filename, output_path, input_hash in pending:
+                ok, stderr = future.result()
+                if not ok:
+                    print(f"  Error: FFmpeg normalization failed for {output_filename}: {stderr.strip()[-500:]}")
+                    failures += 1
+                    continue
+                shutil.move(staged_output, output_path)
+                updates.setdefault(output_dir, {})[output_filename] = {
+                    "input_hash": input_hash,
+                    "demucs_model": DEMUCS_MODEL,
+                    "loudnorm": LOUDNORM_FILTER,
+                    "output_hash": file_hash(output_path),
+                }
+                cleaned += 1
+                print(f"  Saved: {output_path}")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    for output_dir, entries in updates.items():
+        save_manifest(output_dir, entries)
+    print(f"Done: {cleaned} cleaned, {skipped} skipped, {failures} failed.")
+    return 1 if failures else 0
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python tools/clean_sample.py [filename_or_path]")
-        print("  Examples:")
-        print("    python tools/clean_sample.py mandarin/raw/deep_male_mandarin.mp3")
-        print("    python tools/clean_sample.py clean_li-shang-captain-from-mulan.wav")
-        sys.exit(1)
-
-    clean_sample(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Separate vocals with Demucs and loudness-normalize reference voice samples.",
+        epilog=(
+            "Examples:\n"
+            "  python tools/clean_sample.py mandarin/raw/deep_male_mandarin.mp3\n"
+            "  python tools/clean_sample.py clean_li-shang-captain-from-mulan.wav\n"
+            "  python tools/clean_sample.py --batch assets/voice_samples/mandarin/raw\n"
+            "  python tools/clean_sample.py --batch 'assets/voice_samples/movies/raw/*.mp3'"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("target", help="File name or <type>/raw/<file> path; with --batch, a directory or glob.")
+    parser.add_argument("--batch", action="store_true", help="Clean every audio file in a directory or glob with one Demucs load.")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel ffmpeg loudnorm jobs in batch mode.")
+    parser.add_argument("--force", action="store_true", help="In batch mode, re-clean files even if their output is up to date.")
+    args = parser.parse_args()
+
+    if args.batch:
+        sys.exit(clean_batch(args.target, workers=args.workers, force=args.force))
+    clean_sample(args.target)
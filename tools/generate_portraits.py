@@ -1,6 +1,12 @@
 import os
 import sys
 import argparse
+import hashlib
+import itertools
+import json
+import math
+import tempfile
+import time
 import torch
 import shutil
 from PIL import Image
@@ -57,17 +63,39 @@ except Exception:
 
 from diffusers import StableDiffusionImg2ImgPipeline
 from model_paths import resolve_sd_model_path
+from portrait_metrics import DOWNSCALE_METHODS, mean_delta_e, palette_distance, pixel_downscale, ssim
+from sd_pipeline import (
+    SCHEDULER_PRESETS,
+    apply_scheduler_preset,
+    checkpoint_fingerprint,
+    pick_device,
+    pipeline_manager,
+    seed_from_name,
+)
 
 # --- Configuration ---
 MODEL_PATH = str(resolve_sd_model_path())
 INPUT_DIR = "assets/portraits/source_raw"
 OUTPUT_DIR = "assets/portraits/generated"
-DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
+DEVICE = pick_device()
+# Portraits render in float32 unless --dtype float16 opts in; both are part of the manifest key
+PORTRAIT_DTYPES = ("float32", "float16")
+DEFAULT_DTYPE = os.environ.get("PORTRAIT_DTYPE", "float32")
 
 TARGET_W = 40
 TARGET_H = 48
 GEN_W = 320
 GEN_H = 384
+# How the generated image is reduced to TARGET_W x TARGET_H (see portrait_metrics)
+DEFAULT_DOWNSCALE = os.environ.get("PORTRAIT_DOWNSCALE", "nearest")
+# Sampler preset (see sd_pipeline.SCHEDULER_PRESETS); also sets the default step count
+DEFAULT_SCHEDULER = os.environ.get("PORTRAIT_SCHEDULER", "euler-a")
+# Base seed, mixed with each file name for a stable per-portrait seed
+DEFAULT_SEED = int(os.environ.get("PORTRAIT_SEED", "1337"))
+# CLIP embeddings of prompts, shared across pipeline calls; created by load_pipeline
+prompt_cache = None
+# Records the inputs and parameters behind each generated portrait, so unchanged ones are skipped
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, ".portrait_manifest.json")
 
 # --- Character Database ---
 YOUNG_CHARS = [
@@ -115,31 +143,92 @@ def get_age_gender_features(filename):
             
     return age, gender, feature_text
 
-def load_pipeline():
+def load_pipeline(dtype_name=DEFAULT_DTYPE):
+    global prompt_cache
     print(f"Loading model from {MODEL_PATH}...")
     try:
-        pipe = StableDiffusionImg2ImgPipeline.from_single_file(
-            MODEL_PATH,
-            safety_checker=None,
-            feature_extractor=None,
-            requires_safety_checker=False,
-            local_files_only=True,
-            torch_dtype=torch.float32,
-            use_safetensors=True
-        )
-        if DEVICE == "mps":
-            pipe.enable_attention_slicing()
-        pipe.to(DEVICE)
-        pipe.safety_checker = None
-        from diffusers import EulerAncestralDiscreteScheduler
-        pipe.scheduler = EulerAncestralDiscreteScheduler.from_config(pipe.scheduler.config)
+        # Attention slicing only on MPS, where unified memory is tight
+        manager = pipeline_manager(MODEL_PATH, DEVICE, getattr(torch, dtype_name), attention_slicing=DEVICE == "mps")
+        pipe = manager.get(StableDiffusionImg2ImgPipeline, feature_extractor=None, local_files_only=True)
+        prompt_cache = manager.prompt_cache()
         return pipe
     except Exception as e:
         print(f"Failed to load model: {e}")
         return None
 
-def process_portrait(
-    pipe,
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def model_fingerprint():
+    if not os.path.exists(MODEL_PATH):
+        return "missing"
+    return checkpoint_fingerprint(MODEL_PATH)
+
+def load_portrait_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def save_portrait_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def portrait_params(job, model_hash):
+    """Everything that determines a portrait's pixels."""
+    preset = SCHEDULER_PRESETS[job["scheduler"]]
+    params = {
+        "input_hash": job["input_hash"],
+        "prompt": job["prompt"],
+        "negative_prompt": job["negative_prompt"],
+        "strength": job["strength"],
+        "guidance": job["guidance"],
+        "steps": job["steps"],
+        "scheduler": preset["scheduler"] or job["scheduler"],
+        "device": DEVICE,
+        "dtype": job["dtype"],
+        "seed": job["seed"],
+        "model_hash": model_hash,
+        "gen_size": list(job["gen_size"]),
+        "downscale": job["downscale"],
+        "target_size": [TARGET_W, TARGET_H],
+    }
+    # Only presets that tune the scheduler (e.g. Karras sigmas) add this, so older entries stay valid
+    if preset["config"]:
+        params["scheduler_config"] = preset["config"]
+    return params
+
+def portrait_key(job, model_hash):
+    encoded = json.dumps(portrait_params(job, model_hash), sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def portrait_is_current(job, manifest, model_hash):
+    entry = manifest.get(job["output_path"])
+    if not entry or entry.get("key") != portrait_key(job, model_hash):
+        return False
+    # An output edited or replaced by hand is regenerated too
+    return os.path.exists(job["output_path"]) and file_sha256(job["output_path"]) == entry.get("output_hash")
+
+def record_portrait(manifest, job, model_hash):
+    manifest[job["output_path"]] = {
+        "key": portrait_key(job, model_hash),
+        "params": portrait_params(job, model_hash),
+        "seed": job["seed"],
+        "output_hash": file_sha256(job["output_path"]),
+    }
+
+def prepare_portrait_job(
     filename,
     input_path_override=None,
     output_path_override=None,
@@ -148,17 +237,21 @@ def process_portrait(
     strength_override=None,
     guidance_override=None,
     steps_override=None,
+    base_seed=DEFAULT_SEED,
+    gen_size=None,
+    downscale=DEFAULT_DOWNSCALE,
+    scheduler=DEFAULT_SCHEDULER,
+    dtype=DEFAULT_DTYPE,
 ):
+    """Everything one img2img call needs for a portrait: init image, prompts, parameters, output path."""
     input_path = input_path_override or os.path.join(INPUT_DIR, filename)
     name_clean = filename.replace("-generic", "").replace(".png", "").replace("-", " ")
     
     age, gender, features = get_age_gender_features(filename)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    print(f"--- Processing: {name_clean} ({age} {gender}) ---")
     
     init_image = Image.open(input_path).convert("RGB")
-    init_image = init_image.resize((GEN_W, GEN_H), Image.NEAREST)
+    gen_size = tuple(gen_size or (GEN_W, GEN_H))
+    init_image = init_image.resize(gen_size, Image.NEAREST)
     
     age_keywords = ""
     negative_age = ""
@@ -176,29 +269,330 @@ def process_portrait(
     eye_prompt = "distinct high-contrast eyes with visible whites and dark black pupils"
     strength = 0.30 if strength_override is None else float(strength_override)  # The safe remaster sweet spot
     guidance = 7.5 if guidance_override is None else float(guidance_override)
-    steps = 20 if steps_override is None else int(steps_override)
+    steps = SCHEDULER_PRESETS[scheduler]["steps"] if steps_override is None else int(steps_override)
 
     prompt = prompt_override or f"pixel art portrait of Chinese Han Dynasty {age} {gender} {name_clean}, {features} {age_keywords} {eye_prompt}, distinct nose and mouth, proportionate facial features, sharp crisp outlines, cleaned up, refined, high-saturation vibrant SNES palette, consistent palette, sharp pixels, 16-bit style"
     negative_prompt = negative_prompt_override or f"blurry, low quality, photographic, realistic, gradient, 3d render, soft, smooth, fuzzy outlines, merged nose and mouth, short face, distorted anatomy, {negative_age} changed face, different character"
-    
+
+    return {
+        "filename": filename,
+        "label": f"{name_clean} ({age} {gender})",
+        "init_image": init_image,
+        "prompt": prompt,
+        "negative_prompt": negative_prompt,
+        "strength": strength,
+        "guidance": guidance,
+        "steps": steps,
+        "scheduler": scheduler,
+        "dtype": dtype,
+        "seed": seed_from_name(filename, base_seed),
+        "gen_size": gen_size,
+        "downscale": downscale,
+        "input_path": input_path,
+        "input_hash": file_sha256(input_path),
+        "output_path": output_path_override or os.path.join(OUTPUT_DIR, filename),
+    }
+
+def run_portrait_jobs(pipe, jobs):
+    """Run jobs that share strength/guidance/steps/scheduler as one pipeline call; returns the number saved.
+
+    Prompts, init images and seeded generators are per item, so a portrait comes
+    out the same whether it ran alone or in a batch.
+    """
+    first = jobs[0]
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     try:
-        image = pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            image=init_image,
-            strength=strength, 
-            guidance_scale=guidance, 
-            num_inference_steps=steps
-        ).images[0]
-        
-        final_image = image.resize((TARGET_W, TARGET_H), Image.NEAREST)
-        output_path = output_path_override or os.path.join(OUTPUT_DIR, filename)
-        final_image.save(output_path)
-        print(f"  SUCCESS! Saved to {output_path}")
-        return True
+        apply_scheduler_preset(pipe, first["scheduler"])
+        prompt_embeds, negative_prompt_embeds = prompt_cache.encode(
+            [job["prompt"] for job in jobs],
+            [job["negative_prompt"] for job in jobs],
+        )
+        images = pipe(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
+            image=[job["init_image"] for job in jobs],
+            strength=first["strength"],
+            guidance_scale=first["guidance"],
+            num_inference_steps=first["steps"],
+            generator=[torch.Generator("cpu").manual_seed(job["seed"]) for job in jobs],
+        ).images
     except Exception as e:
         print(f"  Generation error: {e}")
-        return False
+        return 0
+
+    saved = 0
+    for job, image in zip(jobs, images):
+        final_image = pixel_downscale(image, TARGET_W, TARGET_H, job["downscale"])
+        os.makedirs(os.path.dirname(job["output_path"]) or ".", exist_ok=True)
+        final_image.save(job["output_path"])
+        print(f"  SUCCESS! Saved to {job['output_path']} (seed {job['seed']})")
+        job["saved"] = True
+        saved += 1
+    return saved
+
+def job_batch_key(job):
+    return (job["strength"], job["guidance"], job["steps"], job["scheduler"], job["gen_size"])
+
+def run_portrait_batches(pipe, jobs, batch_size, manifest=None, model_hash=None):
+    """Group jobs with compatible parameters into pipeline calls of up to batch_size items.
+
+    When a manifest is given, saved portraits are recorded in it after every batch.
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job_batch_key(job), []).append(job)
+
+    saved = 0
+    for group in groups.values():
+        for start in range(0, len(group), batch_size):
+            batch = group[start:start + batch_size]
+            if DEVICE == "mps":
+                torch.mps.empty_cache()
+            if len(batch) == 1:
+                print(f"--- Processing: {batch[0]['label']} ---")
+            else:
+                print(f"--- Batch of {len(batch)}: {', '.join(job['label'] for job in batch)} ---")
+            saved += run_portrait_jobs(pipe, batch)
+            if manifest is not None:
+                for job in batch:
+                    if job.get("saved"):
+                        record_portrait(manifest, job, model_hash)
+                save_portrait_manifest(manifest)
+    return saved
+
+def benchmark_batching(pipe, jobs, batch_size):
+    """Time the same jobs one at a time and batched, writing to a scratch directory."""
+    with tempfile.TemporaryDirectory(prefix="portrait-bench-") as scratch:
+        for job in jobs:
+            job["output_path"] = os.path.join(scratch, job["filename"])
+        # Both runs start from the same warm state: every prompt embedding is
+        # cached and each batch size has been through the pipeline once, so the
+        # first run does not pay for model, kernel and embedding set-up alone.
+        for job in jobs:
+            prompt_cache.embed(job["prompt"])
+            prompt_cache.embed(job["negative_prompt"] or "")
+        compatible = [job for job in jobs if job_batch_key(job) == job_batch_key(jobs[0])]
+        for size in sorted({1, batch_size}):
+            warmup = [
+                dict(job, output_path=os.path.join(scratch, "warmup", job["filename"]))
+                for job in compatible[:size]
+            ]
+            print(f"Warm-up at batch size {len(warmup)} (untimed)")
+            run_portrait_jobs(pipe, warmup)
+        rates = {}
+        for size in sorted({1, batch_size}):
+            started = time.perf_counter()
+            saved = run_portrait_batches(pipe, jobs, size)
+            elapsed = time.perf_counter() - started
+            rates[size] = saved * 60.0 / elapsed if elapsed > 0 else 0.0
+            print(f"Batch size {size}: {saved} image(s) in {elapsed:.1f}s ({rates[size]:.2f} images/min on {DEVICE})")
+    if batch_size != 1 and rates[1] > 0:
+        print(f"Batch size {batch_size} is {rates[batch_size] / rates[1]:.2f}x the one-at-a-time rate.")
+
+SWEEP_PARAMS = {"strength": float, "guidance": float, "steps": int}
+SWEEP_LABELS = {"strength": "s", "guidance": "g", "steps": "n"}
+SWEEP_CELL_SCALE = 4
+SWEEP_LABEL_H = 14
+
+def parse_sweep(spec):
+    """Parse "strength=0.25,0.3;guidance=6,7.5" into parameter dicts, one per grid point."""
+    axes = []
+    for part in spec.split(";"):
+        if not part.strip():
+            continue
+        name, _, values = part.partition("=")
+        name = name.strip()
+        if name not in SWEEP_PARAMS or not values.strip():
+            raise ValueError(f"Invalid sweep axis '{part}' (expected one of {', '.join(SWEEP_PARAMS)}=v1,v2,...)")
+        try:
+            axes.append([(name, SWEEP_PARAMS[name](v)) for v in values.split(",") if v.strip()])
+        except ValueError:
+            raise ValueError(f"Invalid {name} value in sweep axis '{part}'")
+    return [dict(point) for point in itertools.product(*axes)]
+
+def encode_sweep_inputs(pipe, job):
+    """VAE-encode the init image and look up both prompt embeddings once for a whole sweep.
+
+    Returns the VAE posterior rather than latents: each cell samples it with
+    its own seeded generator (see sweep_latents).
+    """
+    with torch.no_grad():
+        image = pipe.image_processor.preprocess(job["init_image"]).to(device=pipe.device, dtype=pipe.vae.dtype)
+        latent_dist = pipe.vae.encode(image).latent_dist
+    prompt_embeds, negative_prompt_embeds = prompt_cache.encode([job["prompt"]], [job["negative_prompt"]])
+    return latent_dist, prompt_embeds, negative_prompt_embeds
+
+def sweep_latents(pipe, latent_dist, seed):
+    """Init latents and generator for one sweep cell, drawn the way img2img's prepare_latents does.
+
+    The pipeline samples the posterior with the job's generator and then draws
+    the noise from the same generator, so the cell gets that generator back,
+    already advanced, to match a normal render at the same parameters.
+    """
+    generator = torch.Generator("cpu").manual_seed(seed)
+    with torch.no_grad():
+        latents = latent_dist.sample(generator=generator) * pipe.vae.config.scaling_factor
+    return latents, [generator]
+
+def sweep_label(point):
+    return " ".join(f"{SWEEP_LABELS[name]}={value:g}" for name, value in point.items())
+
+def write_contact_sheet(cells, output_path):
+    """Lay the sweep results out on a grid, each enlarged with its parameters underneath."""
+    from PIL import ImageDraw
+
+    cols = math.ceil(math.sqrt(len(cells)))
+    rows = math.ceil(len(cells) / cols)
+    cell_w = TARGET_W * SWEEP_CELL_SCALE
+    cell_h = TARGET_H * SWEEP_CELL_SCALE + SWEEP_LABEL_H
+    sheet = Image.new("RGB", (cols * cell_w, rows * cell_h), (24, 24, 24))
+    draw = ImageDraw.Draw(sheet)
+    for i, (label, image) in enumerate(cells):
+        x = (i % cols) * cell_w
+        y = (i // cols) * cell_h
+        sheet.paste(image.resize((cell_w, cell_h - SWEEP_LABEL_H), Image.NEAREST), (x, y))
+        draw.text((x + 2, y + cell_h - SWEEP_LABEL_H + 1), label, fill=(235, 235, 235))
+    sheet.save(output_path)
+
+def run_sweep(pipe, job, points):
+    """Denoise one portrait once per sweep point, reusing its encoded image and prompts."""
+    sweep_dir = os.path.join(OUTPUT_DIR, "sweeps", os.path.splitext(job["filename"])[0])
+    os.makedirs(sweep_dir, exist_ok=True)
+    print(f"--- Sweeping {job['label']}: {len(points)} point(s), seed {job['seed']} ---")
+    latent_dist, prompt_embeds, negative_prompt_embeds = encode_sweep_inputs(pipe, job)
+    apply_scheduler_preset(pipe, job["scheduler"])
+
+    cells = []
+    started = time.perf_counter()
+    for i, point in enumerate(points, start=1):
+        params = {"strength": job["strength"], "guidance": job["guidance"], "steps": job["steps"]}
+        params.update(point)
+        label = sweep_label(params)
+        latents, generator = sweep_latents(pipe, latent_dist, job["seed"])
+        image = pipe(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
+            image=latents,
+            strength=params["strength"],
+            guidance_scale=params["guidance"],
+            num_inference_steps=params["steps"],
+            generator=generator,
+        ).images[0]
+        final_image = pixel_downscale(image, TARGET_W, TARGET_H, job["downscale"])
+        final_image.save(os.path.join(sweep_dir, f"{label.replace(' ', '_').replace('=', '')}.png"))
+        cells.append((label, final_image))
+        print(f"  [{i}/{len(points)}] {label}")
+
+    sheet_path = os.path.join(sweep_dir, "contact_sheet.png")
+    write_contact_sheet(cells, sheet_path)
+    print(f"  {len(points)} point(s) in {time.perf_counter() - started:.1f}s; contact sheet: {sheet_path}")
+    return sheet_path
+
+def parse_size(value):
+    """Parse "160x192" into (160, 192); both sides must be multiples of 8 for the VAE."""
+    if isinstance(value, tuple):
+        return value
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{value}' (expected WxH, e.g. 160x192)")
+    if width % 8 or height % 8 or width < TARGET_W or height < TARGET_H:
+        raise argparse.ArgumentTypeError(f"Size {value} must be multiples of 8 and at least {TARGET_W}x{TARGET_H}")
+    return width, height
+
+def compare_render_configs(pipe, files, jobs, overrides, configs):
+    """Render the same portraits under each (label, overrides) config and compare them.
+
+    Reports seconds per portrait and, for every 40x48 result against the first
+    config (the reference): mean CIE76 color difference, SSIM and palette distance.
+    """
+    inputs = {job["filename"]: job.get("input_path") for job in jobs}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="portrait-compare-") as scratch:
+        # Untimed warm-up, so the reference does not pay for the first call
+        warmup = prepare_portrait_job(
+            files[0],
+            input_path_override=inputs.get(files[0]),
+            output_path_override=os.path.join(scratch, "warmup", files[0]),
+            **dict(overrides, **configs[0][1]),
+        )
+        run_portrait_jobs(pipe, [warmup])
+        for i, (label, config) in enumerate(configs):
+            run_dir = os.path.join(scratch, str(i))
+            config_jobs = [
+                prepare_portrait_job(
+                    f,
+                    input_path_override=inputs.get(f),
+                    output_path_override=os.path.join(run_dir, f),
+                    **dict(overrides, **config),
+                )
+                for f in files
+            ]
+            started = time.perf_counter()
+            saved = run_portrait_batches(pipe, config_jobs, 1)
+            elapsed = time.perf_counter() - started
+            images = {job["filename"]: Image.open(job["output_path"]).convert("RGB") for job in config_jobs if job.get("saved")}
+            results[label] = (elapsed / max(1, saved), images)
+
+    def mean(values):
+        return sum(values) / len(values) if values else float("nan")
+
+    reference_label = configs[0][0]
+    _, reference_images = results[reference_label]
+    width = max(len(label) for label, _ in configs)
+    print(f"\n{'config':<{width}}  {'s/portrait':>10}  {'mean dE':>8}  {'worst dE':>8}  {'SSIM':>6}  {'palette':>7}")
+    for label, _ in configs:
+        per_portrait, images = results[label]
+        names = [name for name in images if name in reference_images]
+        diffs = [mean_delta_e(images[name], reference_images[name]) for name in names]
+        structure = mean([ssim(images[name], reference_images[name]) for name in names])
+        palette = mean([palette_distance(images[name], reference_images[name]) for name in names])
+        worst_diff = max(diffs) if diffs else float("nan")
+        print(f"{label:<{width}}  {per_portrait:>10.2f}  {mean(diffs):>8.2f}  {worst_diff:>8.2f}  {structure:>6.3f}  {palette:>7.2f}")
+    print(f"Reference: {reference_label}. A mean dE under ~2.3 is hard to notice; SSIM 1.0 is identical structure.")
+
+def parse_size_list(value):
+    """Parse "320x384,160x192" for --resolution-bench."""
+    sizes = [parse_size(size) for size in value.split(",") if size.strip()]
+    if not sizes:
+        raise argparse.ArgumentTypeError("Expected at least one size, e.g. 160x192")
+    return sizes
+
+def benchmark_resolutions(pipe, files, jobs, overrides, sizes):
+    """Compare diffusion sizes and downscale methods against the full-size GEN_W x GEN_H nearest render."""
+    reference = ((GEN_W, GEN_H), "nearest")
+    configs = [reference] + [
+        (size, method) for size in sizes for method in DOWNSCALE_METHODS if (size, method) != reference
+    ]
+    compare_render_configs(
+        pipe,
+        files,
+        jobs,
+        overrides,
+        [(f"{size[0]}x{size[1]} {method}", {"gen_size": size, "downscale": method}) for size, method in configs],
+    )
+
+def parse_scheduler_bench(spec):
+    """Parse "euler-a,dpmpp-2m:8,unipc" (or "all") into (preset, steps or None) pairs."""
+    if spec.strip() == "all":
+        return [(name, None) for name in SCHEDULER_PRESETS]
+    entries = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, steps = part.strip().partition(":")
+        if name not in SCHEDULER_PRESETS:
+            raise ValueError(f"Unknown scheduler preset '{name}' (expected one of: {', '.join(SCHEDULER_PRESETS)})")
+        entries.append((name, int(steps) if steps else None))
+    return entries
+
+def benchmark_schedulers(pipe, files, jobs, overrides, entries):
+    """Compare scheduler presets, each at its own step count unless one is given, against the first."""
+    configs = []
+    for name, steps in entries:
+        steps = steps or overrides.get("steps_override") or SCHEDULER_PRESETS[name]["steps"]
+        configs.append((f"{name} ({steps} steps)", {"scheduler": name, "steps_override": steps}))
+    compare_render_configs(pipe, files, jobs, overrides, configs)
 
 def main():
     parser = argparse.ArgumentParser(description="Generate portrait(s) with local RetroDiffusion img2img.")
@@ -209,14 +603,23 @@ def main():
     parser.add_argument("--negative-prompt-file", dest="negative_prompt_file", default=None, help="Text file containing negative prompt.")
     parser.add_argument("--strength", dest="strength", type=float, default=None, help="Img2img strength override.")
     parser.add_argument("--guidance", dest="guidance", type=float, default=None, help="Guidance scale override.")
-    parser.add_argument("--steps", dest="steps", type=int, default=None, help="Inference steps override.")
+    parser.add_argument("--steps", dest="steps", type=int, default=None, help="Inference steps override (default: the scheduler preset's step count).")
+    parser.add_argument("--scheduler", dest="scheduler", choices=list(SCHEDULER_PRESETS), default=DEFAULT_SCHEDULER, help="Sampler preset (default: $PORTRAIT_SCHEDULER or euler-a). dpmpp-2m and unipc reach similar results in about half the steps.")
+    parser.add_argument("--dtype", dest="dtype", choices=PORTRAIT_DTYPES, default=DEFAULT_DTYPE, help="Model precision (default: $PORTRAIT_DTYPE or float32). float16 is faster on CUDA but renders differently.")
+    parser.add_argument("--batch-size", dest="batch_size", type=int, default=int(os.environ.get("PORTRAIT_BATCH_SIZE", "1")), help="Portraits per pipeline call (portraits with the same strength/guidance/steps are batched).")
+    parser.add_argument("--seed", dest="seed", type=int, default=DEFAULT_SEED, help="Base seed, mixed with each file name for stable per-portrait seeds (default: $PORTRAIT_SEED or 1337).")
+    parser.add_argument("--force", action="store_true", help="Regenerate portraits even if the manifest says they are current.")
+    parser.add_argument("--gen-size", dest="gen_size", type=parse_size, default=os.environ.get("PORTRAIT_GEN_SIZE", f"{GEN_W}x{GEN_H}"), help=f"Diffusion resolution WxH, multiples of 8 (default: $PORTRAIT_GEN_SIZE or {GEN_W}x{GEN_H}). Lower is faster.")
+    parser.add_argument("--downscale", dest="downscale", choices=DOWNSCALE_METHODS, default=DEFAULT_DOWNSCALE, help="Reduction to the final sprite: nearest pixel, or each block's dominant palette color (mode).")
+    parser.add_argument("--resolution-bench", dest="resolution_bench", default=None, type=parse_size_list, help=f'Compare diffusion sizes, e.g. "160x192,120x144": time per portrait and difference of the 40x48 result against the current {GEN_W}x{GEN_H} nearest path, which is always rendered as the reference.')
+    parser.add_argument("--scheduler-bench", dest="scheduler_bench", default=None, help='Compare scheduler presets, e.g. "euler-a,dpmpp-2m,dpmpp-2m-karras:8,unipc" or "all": time per portrait, dE, SSIM and palette distance of the 40x48 result against the first preset.')
+    parser.add_argument("--sweep", dest="sweep", default=None, help='Parameter grid for one portrait, e.g. "strength=0.25,0.3,0.35;guidance=6,7.5;steps=20,30". Writes each result and a labelled contact sheet to <output>/sweeps/<name>/.')
+    parser.add_argument("--benchmark", action="store_true", help="Time the selected portraits one at a time and at --batch-size, writing to a scratch directory.")
     args = parser.parse_args()
+    args.batch_size = max(1, args.batch_size)
 
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
-        
-    pipe = load_pipeline()
-    if not pipe: return
 
     prompt_override = None
     negative_prompt_override = None
@@ -226,60 +629,113 @@ def main():
     if args.negative_prompt_file:
         with open(args.negative_prompt_file, "r", encoding="utf-8") as f:
             negative_prompt_override = f.read().strip()
+    overrides = {
+        "prompt_override": prompt_override,
+        "negative_prompt_override": negative_prompt_override,
+        "strength_override": args.strength,
+        "guidance_override": args.guidance,
+        "steps_override": args.steps,
+        "base_seed": args.seed,
+        "gen_size": args.gen_size,
+        "downscale": args.downscale,
+        "scheduler": args.scheduler,
+        "dtype": args.dtype,
+    }
 
     # One-off custom run: use explicit reference/prompt/output but preserve model pipeline from this script.
     if args.input_ref:
         output_path = args.output_path or os.path.join(OUTPUT_DIR, "custom_portrait.png")
-        success = process_portrait(
-            pipe,
-            filename=os.path.basename(output_path),
-            input_path_override=args.input_ref,
-            output_path_override=output_path,
-            prompt_override=prompt_override,
-            negative_prompt_override=negative_prompt_override,
-            strength_override=args.strength,
-            guidance_override=args.guidance,
-            steps_override=args.steps,
-        )
-        print(f"\nFinished! Successfully processed {1 if success else 0}/1 portrait.")
+        files = [os.path.basename(output_path)]
+        jobs = [
+            prepare_portrait_job(
+                files[0],
+                input_path_override=args.input_ref,
+                output_path_override=output_path,
+                **overrides,
+            )
+        ]
+    else:
+        # Get list of all input files
+        all_input_files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".png")]
+        all_input_files.sort()
+        
+        # Check if a specific character name was provided as an argument
+        target_name = args.target_name.lower() if args.target_name else None
+        
+        if target_name:
+            # Filter files that contain the target name (e.g. "liu-bei" matches "Liu-Bei.png")
+            files = [f for f in all_input_files if target_name in f.lower()]
+            if not files:
+                print(f"No portrait found matching '{target_name}' in {INPUT_DIR}")
+                return
+            print(f"Generating matching portrait(s): {', '.join(files)}")
+        else:
+            # Default: Process everything
+            files = all_input_files
+            print(f"Generating {len(files)} final remastered portraits (Strength 0.30).")
+
+        jobs = [prepare_portrait_job(f, **overrides) for f in files]
+
+    if args.sweep:
+        try:
+            points = parse_sweep(args.sweep)
+        except ValueError as e:
+            print(e)
+            return
+        if len(jobs) != 1 or not points:
+            print("--sweep needs exactly one portrait (a NAME matching one file, or --input-ref) and at least one value.")
+            return
+        pipe = load_pipeline(args.dtype)
+        if not pipe: return
+        run_sweep(pipe, jobs[0], points)
         return
 
-    # Get list of all input files
-    all_input_files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".png")]
-    all_input_files.sort()
-    
-    # Check if a specific character name was provided as an argument
-    target_name = args.target_name.lower() if args.target_name else None
-    
-    if target_name:
-        # Filter files that contain the target name (e.g. "liu-bei" matches "Liu-Bei.png")
-        files = [f for f in all_input_files if target_name in f.lower()]
-        if not files:
-            print(f"No portrait found matching '{target_name}' in {INPUT_DIR}")
+    if args.resolution_bench:
+        pipe = load_pipeline(args.dtype)
+        if not pipe: return
+        benchmark_resolutions(pipe, files, jobs, overrides, args.resolution_bench)
+        return
+
+    if args.scheduler_bench:
+        try:
+            entries = parse_scheduler_bench(args.scheduler_bench)
+        except ValueError as e:
+            print(e)
             return
-        print(f"Generating matching portrait(s): {', '.join(files)}")
-    else:
-        # Default: Process everything
-        files = all_input_files
-        print(f"Generating {len(files)} final remastered portraits (Strength 0.30).")
-    
-    success_count = 0
-    for i, f in enumerate(files):
-        if DEVICE == "mps":
-            torch.mps.empty_cache()
-            
-        if process_portrait(
-            pipe,
-            f,
-            prompt_override=prompt_override,
-            negative_prompt_override=negative_prompt_override,
-            strength_override=args.strength,
-            guidance_override=args.guidance,
-            steps_override=args.steps,
-        ):
-            success_count += 1
-            
-    print(f"\nFinished! Successfully processed {success_count}/{len(files)} portraits.")
+        pipe = load_pipeline(args.dtype)
+        if not pipe: return
+        benchmark_schedulers(pipe, files, jobs, overrides, entries)
+        return
+
+    if args.benchmark:
+        pipe = load_pipeline(args.dtype)
+        if not pipe: return
+        benchmark_batching(pipe, jobs, args.batch_size)
+        return
+
+    # Skip portraits whose output was produced from identical inputs and parameters
+    manifest = load_portrait_manifest()
+    model_hash = model_fingerprint()
+    if not args.force:
+        current = [job for job in jobs if portrait_is_current(job, manifest, model_hash)]
+        if current:
+            print(f"Skipping {len(current)} current portrait(s) (use --force to regenerate).")
+        jobs = [job for job in jobs if job not in current]
+    if not jobs:
+        print(f"\nFinished! All {len(files)} portrait(s) are current.")
+        return
+
+    pipe = load_pipeline(args.dtype)
+    if not pipe: return
+
+    started = time.perf_counter()
+    success_count = run_portrait_batches(pipe, jobs, args.batch_size, manifest=manifest, model_hash=model_hash)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        print(f"{success_count * 60.0 / elapsed:.2f} images/min (batch size {args.batch_size}, {DEVICE})")
+
+    print(f"Cache: {prompt_cache.summary()}")
+    print(f"\nFinished! Successfully processed {success_count}/{len(jobs)} portraits.")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,7 @@
 import os
 import sys
+import argparse
+import json
 import torch
 import shutil
 from PIL import Image
@@ -24,17 +26,34 @@ except Exception:
 
 from diffusers import StableDiffusionImg2ImgPipeline
 from model_paths import resolve_sd_model_path
+from sd_pipeline import (
+    SCHEDULER_PRESETS,
+    apply_scheduler_preset,
+    pick_device,
+    pipeline_manager,
+    seed_from_name,
+)
 
 # --- Configuration ---
 MODEL_PATH = str(resolve_sd_model_path())
 INPUT_DIR = "assets/portraits/source_raw"
 OUTPUT_DIR = "assets/portraits/stylized"
-DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
+DEVICE = pick_device()
+# Portraits render in float32 unless --dtype float16 opts in; both are recorded in the manifest
+PORTRAIT_DTYPES = ("float32", "float16")
+DEFAULT_DTYPE = os.environ.get("PORTRAIT_DTYPE", "float32")
 
 TARGET_W = 40
 TARGET_H = 48
 GEN_W = 320
 GEN_H = 384
+# Base seed, mixed with each file name for a stable per-portrait seed
+DEFAULT_SEED = int(os.environ.get("PORTRAIT_SEED", "1337"))
+# Sampler preset (see sd_pipeline.SCHEDULER_PRESETS); also sets the step count
+DEFAULT_SCHEDULER = os.environ.get("PORTRAIT_SCHEDULER", "euler-a")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, ".portrait_manifest.json")
+# CLIP embeddings of prompts, shared across pipeline calls; created by load_pipeline
+prompt_cache = None
 
 # --- Character Database ---
 YOUNG_CHARS = [
@@ -60,30 +79,37 @@ def get_age_and_gender(filename):
         return "elderly", gender
     return "adult", gender
 
-def load_pipeline():
+def load_pipeline(dtype_name=DEFAULT_DTYPE):
+    global prompt_cache
     print(f"Loading model from {MODEL_PATH}...")
     try:
-        pipe = StableDiffusionImg2ImgPipeline.from_single_file(
-            MODEL_PATH,
-            load_safety_checker=False,
-            torch_dtype=torch.float32,
-            use_safetensors=True
-        )
-        
-        if DEVICE == "mps":
-            pipe.enable_attention_slicing()
-        
-        pipe.to(DEVICE)
-        pipe.safety_checker = None
-        
-        from diffusers import EulerAncestralDiscreteScheduler
-        pipe.scheduler = EulerAncestralDiscreteScheduler.from_config(pipe.scheduler.config)
+        # Attention slicing only on MPS, where unified memory is tight
+        manager = pipeline_manager(MODEL_PATH, DEVICE, getattr(torch, dtype_name), attention_slicing=DEVICE == "mps")
+        pipe = manager.get(StableDiffusionImg2ImgPipeline)
+        prompt_cache = manager.prompt_cache()
         return pipe
     except Exception as e:
         print(f"Failed to load model: {e}")
         return None
 
-def process_portrait(pipe, filename):
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def process_portrait(pipe, filename, base_seed=DEFAULT_SEED, manifest=None, scheduler=DEFAULT_SCHEDULER, steps=None, dtype=DEFAULT_DTYPE):
     input_path = os.path.join(INPUT_DIR, filename)
     name_clean = filename.replace("-generic", "").replace(".png", "").replace("-", " ")
     
@@ -112,47 +138,76 @@ def process_portrait(pipe, filename):
     prompt = f"pixel art portrait of Chinese Han Dynasty {age} {gender} {name_clean}, cartoon, stylized, simplified, {age_keywords} distinct high-contrast eyes with visible whites, distinct nose and mouth, proportionate facial features, sharp crisp outlines, cleaned up, refined, high-saturation vibrant SNES palette, consistent palette, sharp pixels, 16-bit style"
     negative_prompt = f"blurry, low quality, photographic, realistic, gradient, 3d render, soft, smooth, fuzzy outlines, merged nose and mouth, short face, distorted anatomy, detailed realism, hyper-realistic, {negative_age} changed face, different character"
     
+    seed = seed_from_name(filename, base_seed)
+    strength = 0.35
+    guidance = 8.0
+    steps = steps or SCHEDULER_PRESETS[scheduler]["steps"]
+
     try:
+        prompt_embeds, negative_prompt_embeds = prompt_cache.encode([prompt], [negative_prompt])
         # Strength 0.35 might be better for "stylized" to allow more change
         image = pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
             image=init_image,
-            strength=0.35, 
-            guidance_scale=8.0, # Higher guidance for more stylization
-            num_inference_steps=20
+            strength=strength, 
+            guidance_scale=guidance, # Higher guidance for more stylization
+            num_inference_steps=steps,
+            generator=torch.Generator("cpu").manual_seed(seed),
         ).images[0]
         
         final_image = image.resize((TARGET_W, TARGET_H), Image.NEAREST)
         
         output_path = os.path.join(OUTPUT_DIR, filename)
         final_image.save(output_path)
-        print(f"  SUCCESS! Saved to {output_path}")
+        print(f"  SUCCESS! Saved to {output_path} (seed {seed})")
+        if manifest is not None:
+            manifest[output_path] = {
+                "seed": seed,
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "strength": strength,
+                "guidance": guidance,
+                "steps": steps,
+                "scheduler": scheduler,
+                "device": DEVICE,
+                "dtype": dtype,
+            }
         return True
     except Exception as e:
         print(f"  Generation error: {e}")
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate stylized test portraits with local RetroDiffusion img2img.")
+    parser.add_argument("--seed", dest="seed", type=int, default=DEFAULT_SEED, help="Base seed, mixed with each file name for stable per-portrait seeds (default: $PORTRAIT_SEED or 1337).")
+    parser.add_argument("--scheduler", dest="scheduler", choices=list(SCHEDULER_PRESETS), default=DEFAULT_SCHEDULER, help="Sampler preset (default: $PORTRAIT_SCHEDULER or euler-a).")
+    parser.add_argument("--steps", dest="steps", type=int, default=None, help="Inference steps (default: the scheduler preset's step count).")
+    parser.add_argument("--dtype", dest="dtype", choices=PORTRAIT_DTYPES, default=DEFAULT_DTYPE, help="Model precision (default: $PORTRAIT_DTYPE or float32). float16 is faster on CUDA but renders differently.")
+    args = parser.parse_args()
+
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
-    pipe = load_pipeline()
+    pipe = load_pipeline(args.dtype)
     if not pipe:
         return
+    apply_scheduler_preset(pipe, args.scheduler)
 
     # Process test characters
     test_chars = ["Cao-Pi.png", "Cai-Mao.png", "Liu-Bei.png", "Guan-Yu.png", "Zhang-Fei.png"]
     
     print(f"Generating stylized test portraits (Strength 0.35).")
     
+    manifest = load_manifest()
     success_count = 0
     for f in test_chars:
         if DEVICE == "mps":
             torch.mps.empty_cache()
             
-        if process_portrait(pipe, f):
+        if process_portrait(pipe, f, base_seed=args.seed, manifest=manifest, scheduler=args.scheduler, steps=args.steps, dtype=args.dtype):
             success_count += 1
+    save_manifest(manifest)
             
     print(f"\nFinished! Successfully generated {success_count}/{len(test_chars)} stylized test portraits in {OUTPUT_DIR}.")
 
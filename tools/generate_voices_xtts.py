@@ -1,20 +1,25 @@
+import argparse
 import os
+import re
 import sys
 import subprocess
 import hashlib
+import time
+import shutil
+import wave
+from collections import defaultdict
+from contextlib import contextmanager
 
-try:
-    import whisper
-except ImportError:
-    whisper = None  # Optional dependency
 import json
 from pathlib import Path
+import numpy as np
 from voice_metrics import calculate_text_error_rate
+import voice_backends
+import voice_loudness
+import voice_prescreen
+import voice_report_store
+import voice_timing
 
-try:
-    from TTS.api import TTS
-except ImportError:
-    TTS = None  # Optional dependency
 try:
     from pydub import AudioSegment
     from pydub.silence import split_on_silence
@@ -26,18 +31,55 @@ except ImportError:
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 VENV_PYTHON = "./tools/venv_xtts/bin/python3.11"
 OUTPUT_DIR = "public/assets/audio/voices"
-# LANGUAGE is set above when determining EXTRACTED_LINES_FILE
 TARGETS_DIR = "public/assets/voice_samples"
 MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
 REPORT_FILE = "voice_verification_report.json"  # Will be language-specific: voice_verification_report_{lang}.json
 # Language-specific extracted lines file
-LANGUAGE = os.environ.get("VOICE_LANG", "en")  # Current language for voice generation
-if LANGUAGE != "en":
-    EXTRACTED_LINES_FILE = f"tools/extracted_voice_lines_{LANGUAGE}.json"
-else:
-    EXTRACTED_LINES_FILE = "tools/extracted_voice_lines.json"
+# Default language when none is passed explicitly; the engine functions all take lang_code
+LANGUAGE = os.environ.get("VOICE_LANG", "en")
+SUPPORTED_LANGUAGES = ("en", "zh")
+
+
+def extracted_lines_file(lang_code):
+    if lang_code != "en":
+        return f"tools/extracted_voice_lines_{lang_code}.json"
+    return "tools/extracted_voice_lines.json"
+
+
+EXTRACTED_LINES_FILE = extracted_lines_file(LANGUAGE)
+TARGET_LUFS = float(os.environ.get("VOICE_TARGET_LUFS", voice_loudness.DEFAULT_TARGET_LUFS))
 VOICE_SETTINGS_FILE = "tools/voice_settings.json"
+# Voice lines are single-speaker speech: mono Opus with a per-line bitrate is
+# indistinguishable from the old 64k stereo at well under half the size.
+# "stereo64" reproduces the old encoding.
+ENCODING_PROFILES = {
+    "stereo64": {"channels": 2, "bitrate_kbps": 64},
+    "mono32": {"channels": 1, "bitrate_kbps": 32, "application": "voip"},
+    "mono-adaptive": {"channels": 1, "bitrate_kbps": None, "application": "voip"},
+}
+ENCODING_PROFILE = os.environ.get("VOICE_ENCODING_PROFILE", "mono-adaptive")
 PHONETIC_OVERRIDES_FILE = "tools/phonetic_overrides.json"
+# Reject clearly broken takes (silence, clipping, noise, runaway length) before STT.
+PRESCREEN_ENABLED = os.environ.get("VOICE_PRESCREEN", "1") != "0"
+# Stream synthesis and abort takes that run past voice_prescreen.max_duration_seconds()
+# for their text, retrying up to SYNTH_RETRIES times before a final unbudgeted take.
+STREAMING_ENABLED = os.environ.get("VOICE_TTS_STREAMING", "1") != "0"
+SYNTH_RETRIES = int(os.environ.get("VOICE_SYNTH_RETRIES", "2"))
+# Multi-sentence lines are synthesized per sentence and cached, so editing one
+# sentence only re-synthesizes that sentence. Segments are stitched with the
+# same 150 ms gap trim_long_pauses() puts between chunks.
+SEGMENT_CACHE_ENABLED = os.environ.get("VOICE_SEGMENT_CACHE", "1") != "0"
+SEGMENT_CACHE_DIR = "tools/voice_segment_cache"
+SEGMENT_CACHE_VERSION = 1
+SEGMENT_GAP_MS = 150
+# The normalized WAV behind each encoded clip is kept, named by the clip's hash,
+# so voice_encoding_report.py can re-encode from a lossless source.
+MASTER_WAVS_ENABLED = os.environ.get("VOICE_KEEP_MASTERS", "1") != "0"
+MASTER_WAV_DIR = "tools/voice_masters"
+# Break after sentence-final punctuation (and any closing quote), but not after "...".
+SENTENCE_BREAK_RE = re.compile(
+    r"(?<=[。！？])(?![」』”’])|(?<=[。！？][」』”’])|(?<=[^.]\.)\s+|(?<=[!?])\s+|(?<=[.!?][\"'”’)])\s+"
+)
 
 # Map characters to target wav/mp3 files for cloning in assets/voice_samples/
 CHAR_TARGETS = {
@@ -129,8 +171,31 @@ CHAR_TARGETS_MANDARIN = {
 tts = None
 stt_model = None
 _SOURCE_PATH_CACHE = {}
+_LOUDNESS_CACHES = {}
+# Word timings from verification, per language and line, for the timing manifest
+_FRESH_WORD_TIMINGS = {}
 VOICE_HASH_VERSION = 1
 
+# Wall-clock seconds and call counts per pipeline stage, for benchmarks.
+STAGE_TIMINGS = defaultdict(float)
+STAGE_COUNTS = defaultdict(int)
+
+
+@contextmanager
+def timed_stage(name):
+    """Accumulate the wall-clock time spent in a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_TIMINGS[name] += time.perf_counter() - start
+        STAGE_COUNTS[name] += 1
+
+
+def reset_stage_timings():
+    STAGE_TIMINGS.clear()
+    STAGE_COUNTS.clear()
+
 
 def project_relative_path(path):
     """Return a compact path for logs."""
@@ -235,27 +300,81 @@ def save_voice_hash_manifest(voice_lines, lang_code):
         f.write("\n")
 
 
+def loudness_cache(lang_code):
+    """Per-language loudness measurements, loaded once and saved by save_loudness_cache."""
+    if lang_code not in _LOUDNESS_CACHES:
+        _LOUDNESS_CACHES[lang_code] = voice_loudness.load_loudness_cache(lang_code)
+    return _LOUDNESS_CACHES[lang_code]
+
+
+def save_loudness_cache(voice_lines, lang_code):
+    if lang_code not in _LOUDNESS_CACHES:
+        return
+    line_ids = {line["id"] for line in voice_lines}
+    cache = {line_id: entry for line_id, entry in _LOUDNESS_CACHES[lang_code].items() if line_id in line_ids}
+    voice_loudness.save_loudness_cache(lang_code, cache)
+
+
+def save_timing_manifest(voice_lines, lang_code):
+    """Refresh the game-facing duration/word-timing manifest for the language's clips."""
+    voice_timing.update_manifest(
+        lang_code,
+        [(line["id"], line["text"]) for line in voice_lines],
+        fresh_words=_FRESH_WORD_TIMINGS.pop(lang_code, {}),
+        loudness=loudness_cache(lang_code),
+    )
+
+
+def master_wav_path(lang_code, line_id, audio_hash):
+    return PROJECT_ROOT / MASTER_WAV_DIR / lang_code / f"{line_id}.{audio_hash[:16]}.wav"
+
+
+def store_master_wav(wav_path, lang_code, line_id, audio_hash):
+    """Keep the lossless take an encoded clip was made from."""
+    target = master_wav_path(lang_code, line_id, audio_hash)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(wav_path, target)
+
+
+def prune_master_wavs(lang_code):
+    """Delete masters of takes that were replaced (the loudness cache knows each clip's hash)."""
+    master_dir = PROJECT_ROOT / MASTER_WAV_DIR / lang_code
+    if not master_dir.exists():
+        return
+    cache = loudness_cache(lang_code)
+    for path in master_dir.glob("*.wav"):
+        line_id, _, short_hash = path.stem.rpartition(".")
+        entry = cache.get(line_id)
+        if isinstance(entry, dict) and entry.get("audio_hash") and not entry["audio_hash"].startswith(short_hash):
+            path.unlink()
+
+
 def verification_report_path(lang_code):
     return Path(f"voice_verification_report_{lang_code}.json")
 
 
 def load_verification_report(lang_code):
-    path = verification_report_path(lang_code)
-    if not path.exists():
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    return data if isinstance(data, dict) else {}
+    """Report entries from the SQLite store, picking up JSON edits made outside it."""
+    store = voice_report_store.report_store()
+    store.sync_from_json(lang_code, verification_report_path(lang_code))
+    return store.entries(lang_code)
 
 
-def save_verification_report(lang_code, report):
-    path = verification_report_path(lang_code)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=4, ensure_ascii=False)
-        f.write("\n")
+def report_audio_hashes(lang_code):
+    """Encoded-audio hashes recorded in the loudness cache, keyed by line ID."""
+    return {
+        line_id: entry.get("audio_hash")
+        for line_id, entry in loudness_cache(lang_code).items()
+        if isinstance(entry, dict)
+    }
+
+
+def save_verification_report(lang_code, report, run_id=None):
+    """Upsert changed entries into the store, then export the JSON report."""
+    store = voice_report_store.report_store()
+    store.upsert_many(lang_code, report, report_audio_hashes(lang_code), run_id)
+    if voice_report_store.json_export_enabled():
+        store.export_json(lang_code, verification_report_path(lang_code))
 
 
 def report_metadata_entry(line, lang_code):
@@ -278,7 +397,7 @@ def metadata_only_report_entry(line, lang_code):
     }
 
 
-def sync_verification_report_metadata(voice_lines, lang_code, report=None):
+def sync_verification_report_metadata(voice_lines, lang_code, report=None, run_id=None):
     report = report if report is not None else load_verification_report(lang_code)
 
     changed = False
@@ -298,7 +417,7 @@ def sync_verification_report_metadata(voice_lines, lang_code, report=None):
                 changed = True
 
     if changed:
-        save_verification_report(lang_code, report)
+        save_verification_report(lang_code, report, run_id)
     return report
 
 
@@ -371,37 +490,38 @@ def load_models():
     if tts is not None:
         return  # Already loaded
 
-    print("Loading XTTS v2 model (this may take a long time on first run)...")
-    # You must accept the Coqui TTS terms of service
-    os.environ["COQUI_TOS_AGREED"] = "1"
+    tts_backend_name = voice_backends.selected_tts_backend_name()
+    if tts_backend_name == "xtts":
+        print("Loading XTTS v2 model (this may take a long time on first run)...")
+    else:
+        print(f"Loading {tts_backend_name} TTS backend...")
 
     try:
         # Use CPU for Intel Mac. If you have a GPU, change to "cuda"
-        tts = TTS(MODEL_NAME).to("cpu")
+        tts = voice_backends.load_tts_backend(tts_backend_name, model_name=MODEL_NAME, device="cpu")
     except Exception as e:
         print(f"CRITICAL ERROR: Failed to load TTS model: {e}")
         sys.exit(1)
 
     print("Loading Whisper model for verification...")
-    if whisper:
-        stt_model = whisper.load_model("base")
-    else:
-        stt_model = None
+    stt_model = voice_backends.load_stt_backend()
 
 
-def load_voice_lines_from_extracted():
+def load_voice_lines_from_extracted(lang_code=None):
     """
     Load voice lines from the extracted JSON file (generated by extract_voice_lines.py).
     This ensures voice generation uses the actual text from the game data files.
     """
-    if not os.path.exists(EXTRACTED_LINES_FILE):
-        print(f"WARNING: {EXTRACTED_LINES_FILE} not found!")
+    lang_code = lang_code or LANGUAGE
+    lines_file = extracted_lines_file(lang_code)
+    if not os.path.exists(lines_file):
+        print(f"WARNING: {lines_file} not found!")
         print(
             "Run 'python tools/extract_voice_lines.py' first to extract lines from game data."
         )
         return []
 
-    with open(EXTRACTED_LINES_FILE, "r", encoding="utf-8") as f:
+    with open(lines_file, "r", encoding="utf-8") as f:
         lines = json.load(f)
 
     # Load voice settings (speed, emotion overrides)
@@ -438,7 +558,7 @@ def load_voice_lines_from_extracted():
         # Apply phonetic overrides from external file
         # Only apply phonetic overrides for English (they're English pronunciation guides)
         # For other languages, use the original text
-        if line_id in phonetic_overrides and LANGUAGE == "en":
+        if line_id in phonetic_overrides and lang_code == "en":
             entry["text"] = phonetic_overrides[line_id]
             voice_dependencies.append(PHONETIC_OVERRIDES_FILE)
 
@@ -461,14 +581,31 @@ def load_voice_lines_from_extracted():
     return result
 
 
-def verify_audio(audio_path, expected_text, lang_code="en"):
+def prescreen_rejection(screen, lang_code):
+    """Verification result for a take the signal pre-screen already rejected."""
+    return {
+        "transcribed": "",
+        "wer": 1.0,
+        "is_bad": True,
+        "language": lang_code,
+        "prescreen": screen["reasons"],
+    }
+
+
+def verify_audio(audio_path, expected_text, lang_code="en", screen=None):
+    """Transcribe and score a take; a failed pre-screen result skips STT entirely."""
+    if screen is not None and not screen["ok"]:
+        print(f"  Pre-screen rejected take: {'; '.join(screen['reasons'])}")
+        return prescreen_rejection(screen, lang_code)
     print(f"  Verifying audio quality (language: {lang_code})...")
     try:
         # Transcribe (Whisper handles wav/ogg/mp3)
         # Use language parameter for better accuracy
-        result = stt_model.transcribe(audio_path, language=lang_code)
+        result = stt_model.transcribe(audio_path, language=lang_code, expected_text=expected_text)
         transcribed_text = result["text"].strip()
         original_text = expected_text.strip()
+        if result.get("tier"):
+            STAGE_COUNTS[f"stt_{result['tier']}"] += 1
 
         # Chinese is scored as character tokens because whitespace-delimited
         # WER turns a whole sentence into a single "word" and badly overstates
@@ -476,7 +613,12 @@ def verify_audio(audio_path, expected_text, lang_code="en"):
         error_rate = calculate_text_error_rate(original_text, transcribed_text, lang_code)
 
         print(f'    Transcribed: "{transcribed_text}"')
-        print(f"    WER: {error_rate:.2f}")
+        if result.get("tier") == "accurate" and "fast_wer" in result:
+            print(f"    WER: {error_rate:.2f} (borderline fast-tier WER {result['fast_wer']:.2f}, rescored)")
+        else:
+            print(f"    WER: {error_rate:.2f}")
+        if result.get("weak_words"):
+            print(f"    Low-confidence words: {', '.join(result['weak_words'])}")
 
         # Use more lenient threshold for Mandarin (0.7) vs English (0.4)
         # Mandarin transcription can vary more due to character recognition differences
@@ -487,6 +629,7 @@ def verify_audio(audio_path, expected_text, lang_code="en"):
             "wer": error_rate,
             "is_bad": error_rate > wer_threshold,
             "language": lang_code,
+            "words": result.get("words", []),
         }
     except Exception as e:
         print(f"    Verification error: {e}")
@@ -525,25 +668,56 @@ def trim_long_pauses(audio_path, max_pause_ms=300):
         print(f"    Trimming error: {e}")
 
 
-def convert_to_ogg(input_wav, output_ogg):
+def wav_duration_seconds(wav_path):
+    with wave.open(str(wav_path), "rb") as wav_file:
+        return wav_file.getnframes() / float(wav_file.getframerate())
+
+
+def adaptive_bitrate_kbps(duration_s, lufs=None):
+    """Pick an Opus bitrate for a mono voice line from its duration and loudness.
+
+    Short lines are dominated by onsets and the container overhead, so they get
+    more bits; long narration settles into steady speech that holds up at lower
+    rates. Lines the peak ceiling kept well below the loudness target are more
+    dynamic and get a small bump.
+    """
+    if duration_s < 2.0:
+        kbps = 32
+    elif duration_s < 8.0:
+        kbps = 28
+    else:
+        kbps = 24
+    if lufs is not None and lufs < TARGET_LUFS - 3.0:
+        kbps += 4
+    return kbps
+
+
+def encoding_profile_args(profile_name, input_wav, lufs=None):
+    """ffmpeg output arguments (channels, codec, bitrate) for an encoding profile."""
+    if profile_name not in ENCODING_PROFILES:
+        raise ValueError(
+            f"Unknown encoding profile '{profile_name}' (expected one of: {', '.join(ENCODING_PROFILES)})"
+        )
+    profile = ENCODING_PROFILES[profile_name]
+    kbps = profile["bitrate_kbps"]
+    if kbps is None:
+        kbps = adaptive_bitrate_kbps(wav_duration_seconds(input_wav), lufs)
+    args = ["-ac", str(profile["channels"]), "-c:a", "libopus", "-b:a", f"{kbps}k"]
+    if profile.get("application"):
+        args += ["-application", profile["application"]]
+    return args
+
+
+def convert_to_ogg(input_wav, output_ogg, profile=None, lufs=None):
     """Convert wav to ogg using ffmpeg with libopus codec (more stable than native vorbis)."""
-    print(f"  Converting to OGG: {output_ogg}")
+    profile = profile or ENCODING_PROFILE
+    print(f"  Converting to OGG ({profile}): {output_ogg}")
     try:
         # Using libopus for better stability and quality in OGG container
         result = subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                input_wav,
-                "-ac",
-                "2",
-                "-c:a",
-                "libopus",
-                "-b:a",
-                "64k",
-                output_ogg,
-            ],
+            ["ffmpeg", "-y", "-i", input_wav]
+            + encoding_profile_args(profile, input_wav, lufs)
+            + [output_ogg],
             capture_output=True,
         )
         if result.returncode != 0:
@@ -555,6 +729,126 @@ def convert_to_ogg(input_wav, output_ogg):
         return False
 
 
+def synthesize_with_budget(gen_text, speaker_wav, tts_language, wav_path, speed=1.0, emotion=None):
+    """Synthesize a take, aborting and retrying runaway generations early.
+
+    Each budgeted attempt streams audio and stops as soon as it runs past the
+    line's duration budget. If every retry runs away, one last take is made
+    without a budget so the line is still produced and judged by verification.
+    """
+    budget = voice_prescreen.max_duration_seconds(gen_text, speed) if STREAMING_ENABLED else None
+    attempts = SYNTH_RETRIES + 1 if budget is not None else 0
+    for attempt in range(1, attempts + 1):
+        try:
+            with timed_stage("synthesize"):
+                tts.synthesize(
+                    text=gen_text,
+                    speaker_wav=speaker_wav,
+                    language=tts_language,
+                    file_path=wav_path,
+                    speed=speed,
+                    emotion=emotion,
+                    max_duration_s=budget,
+                )
+            return
+        except voice_backends.GenerationBudgetExceeded as e:
+            STAGE_COUNTS["synthesize_aborted"] += 1
+            print(f"  Aborted runaway take {attempt}/{attempts}: {e}")
+
+    with timed_stage("synthesize"):
+        tts.synthesize(
+            text=gen_text,
+            speaker_wav=speaker_wav,
+            language=tts_language,
+            file_path=wav_path,
+            speed=speed,
+            emotion=emotion,
+        )
+
+
+def split_sentences(text):
+    """Split a line into sentence segments for per-segment synthesis."""
+    return [piece.strip() for piece in SENTENCE_BREAK_RE.split(text) if piece and piece.strip()]
+
+
+def segment_cache_key(segment_text, voice_target, lang_code, speed=1.0, emotion=None):
+    payload = {
+        "version": SEGMENT_CACHE_VERSION,
+        "text": segment_text,
+        "voice_target": voice_target,
+        "language": lang_code,
+        "speed": speed,
+        "emotion": emotion,
+        "tts": getattr(tts, "name", None),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def segment_cache_path(lang_code, key):
+    return PROJECT_ROOT / SEGMENT_CACHE_DIR / lang_code / key[:2] / f"{key}.wav"
+
+
+def stitch_segments(segment_paths, output_wav, gap_ms=SEGMENT_GAP_MS):
+    """Concatenate segment WAVs with a fixed silence between them."""
+    pieces = []
+    rate = None
+    for path in segment_paths:
+        samples, sample_rate = voice_loudness.read_wav(path)
+        if rate is None:
+            rate = sample_rate
+        elif sample_rate != rate:
+            raise ValueError(f"segment {path} is {sample_rate} Hz, expected {rate} Hz")
+        if pieces:
+            pieces.append(np.zeros((int(rate * gap_ms / 1000), samples.shape[1]), dtype=np.float32))
+        pieces.append(samples)
+    voice_loudness.write_wav(output_wav, np.concatenate(pieces), rate)
+
+
+def synthesize_segments(segments, speaker_wav, tts_language, wav_path, voice_target, lang_code, speed=1.0, emotion=None):
+    """Synthesize only the segments missing from the cache, then stitch the line together.
+
+    Returns (fresh segment WAV, cache path) pairs. They only enter the cache
+    through cache_segments once the stitched take passes its checks, so a bad
+    take is never replayed on the next regeneration.
+    """
+    paths = []
+    pending = []
+    reused = 0
+    try:
+        for i, segment in enumerate(segments):
+            cache_path = segment_cache_path(lang_code, segment_cache_key(segment, voice_target, lang_code, speed, emotion))
+            if cache_path.exists():
+                reused += 1
+                paths.append(cache_path)
+                continue
+            segment_wav = f"{wav_path}.seg{i}.wav"
+            pending.append((segment_wav, cache_path))
+            synthesize_with_budget(segment, speaker_wav, tts_language, segment_wav, speed, emotion)
+            with timed_stage("trim"):
+                trim_long_pauses(segment_wav)
+            paths.append(segment_wav)
+        print(f"  Stitching {len(segments)} sentence segment(s) ({reused} cached)")
+        with timed_stage("stitch"):
+            stitch_segments(paths, wav_path)
+    except Exception:
+        discard_segments(pending)
+        raise
+    return pending
+
+
+def cache_segments(pending):
+    for segment_wav, cache_path in pending:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(segment_wav, cache_path)
+
+
+def discard_segments(pending):
+    for segment_wav, _ in pending:
+        if os.path.exists(segment_wav):
+            os.remove(segment_wav)
+
+
 def generate_voice(
     line_id,
     character,
@@ -565,6 +859,7 @@ def generate_voice(
     lang_code="en",
     force=False,
     regeneration_reason=None,
+    reuse_segments=True,
 ):
     # Create language subdirectory if it doesn't exist
     lang_dir = os.path.join(OUTPUT_DIR, lang_code)
@@ -573,6 +868,7 @@ def generate_voice(
     temp_wav = f"temp_{line_id}.wav"
 
     verification_result = None
+    pending_segments = []
 
     if os.path.exists(output_ogg):
         # Skip if file exists and has content
@@ -601,7 +897,7 @@ def generate_voice(
 
     target_path = os.path.join(TARGETS_DIR, target_filename)
 
-    if not os.path.exists(target_path):
+    if tts.requires_speaker_wav and not os.path.exists(target_path):
         print(f"ERROR: Reference voice for '{character}' not found at '{target_path}'.")
         sys.exit(1)
 
@@ -613,34 +909,59 @@ def generate_voice(
 
     try:
         # Generate high quality audio using cloning
-        tts.tts_to_file(
-            text=gen_text,
-            speaker_wav=target_path,
-            language=tts_language,
-            file_path=temp_wav,
-            speed=speed,
-            emotion=emotion,
-            temperature=0.75,
-            repetition_penalty=2.0,
-            top_k=50,
-            top_p=0.85,
-        )
+        segments = split_sentences(gen_text) if SEGMENT_CACHE_ENABLED and reuse_segments else []
+        if len(segments) > 1:
+            # Segments are trimmed individually before they are cached
+            pending_segments = synthesize_segments(
+                segments, target_path, tts_language, temp_wav, target_filename, lang_code, speed, emotion
+            )
+        else:
+            synthesize_with_budget(gen_text, target_path, tts_language, temp_wav, speed, emotion)
+
+            # Trim excessive pauses
+            with timed_stage("trim"):
+                trim_long_pauses(temp_wav)
+
+        # Cheap signal checks on the raw take; normalization would hide clipping and lift near-silence
+        screen = None
+        if PRESCREEN_ENABLED:
+            with timed_stage("prescreen"):
+                screen = voice_prescreen.screen_wav(temp_wav, gen_text, speed)
 
-        # Trim excessive pauses
-        trim_long_pauses(temp_wav)
+        # Normalize loudness before encoding so the clip never has to be decoded again for it
+        with timed_stage("loudness"):
+            loudness = voice_loudness.normalize_wav(temp_wav, TARGET_LUFS)
 
         # Verify quality before converting
-        verification_result = verify_audio(temp_wav, text, lang_code)
+        with timed_stage("verify"):
+            verification_result = verify_audio(temp_wav, text, lang_code, screen=screen)
+        if verification_result.get("is_bad"):
+            # Rejected by the pre-screen or the WER check: don't let its sentences be reused
+            discard_segments(pending_segments)
+        else:
+            cache_segments(pending_segments)
+        pending_segments = []
 
         # Convert to OGG using our fixed converter
-        if not convert_to_ogg(temp_wav, output_ogg):
-            raise Exception("FFmpeg conversion failed")
+        with timed_stage("encode"):
+            if not convert_to_ogg(temp_wav, output_ogg, lufs=loudness["lufs"]):
+                raise Exception("FFmpeg conversion failed")
+
+        audio_hash = voice_loudness.audio_file_hash(output_ogg)
+        loudness_cache(lang_code)[line_id] = voice_loudness.cache_entry(audio_hash, loudness)
+        if MASTER_WAVS_ENABLED:
+            store_master_wav(temp_wav, lang_code, line_id, audio_hash)
+        if verification_result.get("words"):
+            # Verification ran on the final (trimmed, normalized) take, so its
+            # word timings hold for the encoded clip.
+            _FRESH_WORD_TIMINGS.setdefault(lang_code, {})[line_id] = verification_result["words"]
 
         if os.path.exists(temp_wav):
             os.remove(temp_wav)
 
     except Exception as e:
         print(f"CRITICAL ERROR generating {line_id}: {e}")
+        discard_segments(pending_segments)
         if os.path.exists(temp_wav):
             os.remove(temp_wav)
         sys.exit(1)
@@ -1462,88 +1783,129 @@ game_script = [
     },
 ]
 
-if __name__ == "__main__":
+def check_duplicate_ids(voice_lines):
+    """Return False (after printing them) if any voice ID maps to different texts."""
+    seen_ids = {}
+    duplicates = []
+    for line in voice_lines:
+        line_id = line["id"]
+        line_text = line["text"]
+        if line_id in seen_ids:
+            if seen_ids[line_id] != line_text:
+                duplicates.append(
+                    {"id": line_id, "text1": seen_ids[line_id], "text2": line_text}
+                )
+        else:
+            seen_ids[line_id] = line_text
+
+    if not duplicates:
+        return True
+
+    print("\n" + "=" * 60)
+    print("ERROR: Duplicate voice IDs with different text detected!")
+    print("=" * 60)
+    for dup in duplicates:
+        print(f"\nID: {dup['id']}")
+        print(
+            f"  Text 1: \"{dup['text1'][:60]}...\""
+            if len(dup["text1"]) > 60
+            else f"  Text 1: \"{dup['text1']}\""
+        )
+        print(
+            f"  Text 2: \"{dup['text2'][:60]}...\""
+            if len(dup["text2"]) > 60
+            else f"  Text 2: \"{dup['text2']}\""
+        )
+    print("\nFix these duplicates before generating voices!")
+    return False
+
+
+def build_work_queue(lang_code):
+    """Load a language's lines and find the ones that need generation.
+
+    Returns (voice_lines, lines_to_generate, generation_statuses), or None on error.
+    """
     # Try to load from extracted JSON first (preferred - stays in sync with game data)
-    extracted_lines = load_voice_lines_from_extracted()
+    with timed_stage("load_lines"):
+        extracted_lines = load_voice_lines_from_extracted(lang_code)
 
     if extracted_lines:
         print(f"\nUsing {len(extracted_lines)} voice lines from extracted game data")
-        print(f"Current language: {LANGUAGE}")
+        print(f"Current language: {lang_code}")
         print(
-            f"Expected source: tools/extracted_voice_lines.json (should be extracted with EXTRACT_LANG={LANGUAGE})"
+            f"Expected source: {extracted_lines_file(lang_code)} (should be extracted with EXTRACT_LANG={lang_code})"
         )
         voice_lines = extracted_lines
     else:
         # Fallback to hardcoded game_script only for English
-        if LANGUAGE == "en":
+        if lang_code == "en":
             print(
                 "\nFalling back to hardcoded game_script (run extract_voice_lines.py to update)"
             )
             voice_lines = game_script
         else:
-            print(f"\nERROR: No extracted voice lines found for language '{LANGUAGE}'!")
+            print(f"\nERROR: No extracted voice lines found for language '{lang_code}'!")
             print(
-                f"Please run: EXTRACT_LANG={LANGUAGE} python3 tools/extract_voice_lines.py"
+                f"Please run: EXTRACT_LANG={lang_code} python3 tools/extract_voice_lines.py"
             )
             print(
                 "The hardcoded game_script only contains English lines and cannot be used as a fallback."
             )
-            sys.exit(1)
+            return None
 
     # Check for duplicate voice IDs with different text
-    seen_ids = {}
-    duplicates = []
-    for line in voice_lines:
-        line_id = line["id"]
-        line_text = line["text"]
-        if line_id in seen_ids:
-            if seen_ids[line_id] != line_text:
-                duplicates.append(
-                    {"id": line_id, "text1": seen_ids[line_id], "text2": line_text}
-                )
-        else:
-            seen_ids[line_id] = line_text
-
-    if duplicates:
-        print("\n" + "=" * 60)
-        print("ERROR: Duplicate voice IDs with different text detected!")
-        print("=" * 60)
-        for dup in duplicates:
-            print(f"\nID: {dup['id']}")
-            print(
-                f"  Text 1: \"{dup['text1'][:60]}...\""
-                if len(dup["text1"]) > 60
-                else f"  Text 1: \"{dup['text1']}\""
-            )
-            print(
-                f"  Text 2: \"{dup['text2'][:60]}...\""
-                if len(dup["text2"]) > 60
-                else f"  Text 2: \"{dup['text2']}\""
-            )
-        print("\nFix these duplicates before generating voices!")
-        sys.exit(1)
+    if not check_duplicate_ids(voice_lines):
+        return None
 
     # Pre-fill list of lines that need generation.
-    hash_manifest = load_voice_hash_manifest(LANGUAGE)
-    lines_to_generate = []
-    generation_statuses = {}
-    for line in voice_lines:
-        status = voice_file_generation_status(line, LANGUAGE, hash_manifest)
-        if status["needs_generation"]:
-            lines_to_generate.append(line)
-            generation_statuses[line["id"]] = status
-
-    if len(lines_to_generate) == 0:
-        save_voice_hash_manifest(voice_lines, LANGUAGE)
-        sync_verification_report_metadata(voice_lines, LANGUAGE)
-        print("All voice files are current. Nothing to generate.")
-        sys.exit(0)
-
-    # Only load models if we actually need to generate something
-    load_models()
+    with timed_stage("status"):
+        hash_manifest = load_voice_hash_manifest(lang_code)
+        lines_to_generate = []
+        generation_statuses = {}
+        for line in voice_lines:
+            status = voice_file_generation_status(line, lang_code, hash_manifest)
+            if status["needs_generation"]:
+                lines_to_generate.append(line)
+                generation_statuses[line["id"]] = status
+
+    return voice_lines, lines_to_generate, generation_statuses
+
+
+def finish_language(lang_code, voice_lines, report=None):
+    """Merge a language's results into its report and write its manifests."""
+    if report is None:
+        with timed_stage("manifest"):
+            save_voice_hash_manifest(voice_lines, lang_code)
+        with timed_stage("report"):
+            sync_verification_report_metadata(voice_lines, lang_code)
+        with timed_stage("timing"):
+            save_timing_manifest(voice_lines, lang_code)
+        return
 
-    print(f"=== Generating voices for language: {LANGUAGE} ===")
-    print(f"Output directory: {os.path.join(OUTPUT_DIR, LANGUAGE)}")
+    # Save report - use language-specific report file
+    with timed_stage("report"):
+        existing_report = load_verification_report(lang_code)
+
+        for unique_key, data in report.items():
+            if data is not None:
+                existing_report[unique_key] = data
+
+        run_id = voice_report_store.report_store().begin_run("generate_voices_xtts", lang_code)
+        sync_verification_report_metadata(voice_lines, lang_code, existing_report, run_id)
+        save_verification_report(lang_code, existing_report, run_id)
+    print(f"\nVerification report updated in {verification_report_path(lang_code)}")
+    with timed_stage("manifest"):
+        save_voice_hash_manifest(voice_lines, lang_code)
+        save_loudness_cache(voice_lines, lang_code)
+        prune_master_wavs(lang_code)
+    with timed_stage("timing"):
+        save_timing_manifest(voice_lines, lang_code)
+
+
+def generate_language(lang_code, lines_to_generate, generation_statuses):
+    """Generate one language's queue with the already-loaded models; returns its report entries."""
+    print(f"=== Generating voices for language: {lang_code} ===")
+    print(f"Output directory: {os.path.join(OUTPUT_DIR, lang_code)}")
     print(f"Need to generate {len(lines_to_generate)} voice file(s)...")
     print("\nLines to generate:")
     for line in lines_to_generate:
@@ -1566,32 +1928,75 @@ if __name__ == "__main__":
             speed=line.get("speed", 1.0),
             emotion=line.get("emotion"),
             phonetic_text=line.get("phonetic_text"),
-            lang_code=LANGUAGE,
+            lang_code=lang_code,
             force=status["reason"] == "stale",
             regeneration_reason=status["details"],
         )
         # Use language+id as unique key since same ID can exist in multiple languages
-        unique_key = f"{LANGUAGE}:{line['id']}"
+        unique_key = f"{lang_code}:{line['id']}"
         report[unique_key] = {
             "id": line["id"],
             "character": line["char"],
             "original_text": line.get("original_text", line["text"]),
-            "voice_target": voice_target_filename(line["char"], LANGUAGE),
+            "voice_target": voice_target_filename(line["char"], lang_code),
             "stt_output": res.get("transcribed", "") if res else "",
             "wer": res.get("wer", 0) if res else 0,
             "is_bad": res.get("is_bad", False) if res else False,
-            "language": LANGUAGE,
+            "language": lang_code,
         }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and verify XTTS voice lines.")
+    parser.add_argument(
+        "--langs",
+        default=None,
+        help=(
+            "Comma-separated languages to generate in this one process, sharing the loaded "
+            f"models (e.g. en,zh; 'all' = {','.join(SUPPORTED_LANGUAGES)}). Defaults to $VOICE_LANG."
+        ),
+    )
+    args = parser.parse_args(argv)
+    if not args.langs:
+        args.langs = [LANGUAGE]
+    elif args.langs == "all":
+        args.langs = list(SUPPORTED_LANGUAGES)
+    else:
+        args.langs = [lang.strip() for lang in args.langs.split(",") if lang.strip()]
+    return args
 
-    # Save report - use language-specific report file
-    lang_report_file = f"voice_verification_report_{LANGUAGE}.json"
-    existing_report = load_verification_report(LANGUAGE)
 
-    for unique_key, data in report.items():
-        if data is not None:
-            existing_report[unique_key] = data
+def main(argv=None):
+    args = parse_args(argv)
 
-    sync_verification_report_metadata(voice_lines, LANGUAGE, existing_report)
-    save_verification_report(LANGUAGE, existing_report)
-    print(f"\nVerification report updated in {lang_report_file}")
-    save_voice_hash_manifest(voice_lines, LANGUAGE)
+    # Build every language's work queue first, so the models are loaded once
+    # and only if some language actually has lines to generate.
+    queues = []
+    for lang_code in args.langs:
+        queue = build_work_queue(lang_code)
+        if queue is None:
+            return 1
+        queues.append((lang_code, *queue))
+
+    if not any(lines_to_generate for _, _, lines_to_generate, _ in queues):
+        for lang_code, voice_lines, _, _ in queues:
+            finish_language(lang_code, voice_lines)
+        print("All voice files are current. Nothing to generate.")
+        return 0
+
+    # Only load models if we actually need to generate something
+    load_models()
+
+    for lang_code, voice_lines, lines_to_generate, generation_statuses in queues:
+        if not lines_to_generate:
+            finish_language(lang_code, voice_lines)
+            print(f"All {lang_code} voice files are current.")
+            continue
+        report = generate_language(lang_code, lines_to_generate, generation_statuses)
+        finish_language(lang_code, voice_lines, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,9 @@
  *   --limit <n>              Process at most n files (for testing)
  *
  * Requires ffmpeg on PATH.
+ *
+ * generate_voices_xtts.py now normalizes new clips before encoding; see
+ * tools/voice_loudness.py for the cached Python re-normalization pass.
  */
 
 const fs = require('fs');
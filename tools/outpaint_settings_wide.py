@@ -16,7 +16,6 @@ Example:
 from __future__ import annotations
 
 import argparse
-import hashlib
 import os
 from pathlib import Path
 from typing import Iterable, Optional
@@ -45,6 +44,14 @@ except Exception:
 from diffusers import StableDiffusionInpaintPipeline
 
 from model_paths import resolve_sd_model_path
+from sd_pipeline import (
+    SCHEDULER_PRESETS,
+    apply_scheduler_preset,
+    pick_device,
+    pick_dtype,
+    pipeline_manager,
+    seed_from_name,
+)
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -55,21 +62,6 @@ TARGET_H = 256
 PIPE_W = 456  # Stable Diffusion inpaint requires multiples of 8
 
 
-def pick_device() -> str:
-    if torch.cuda.is_available():
-        return "cuda"
-    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
-        return "mps"
-    return "cpu"
-
-
-def pick_dtype(device: str) -> torch.dtype:
-    # Safer defaults for Apple MPS and CPU.
-    if device == "cuda":
-        return torch.float16
-    return torch.float32
-
-
 def list_pngs(folder: Path) -> Iterable[Path]:
     return sorted(p for p in folder.glob("*.png") if p.is_file())
 
@@ -107,12 +99,6 @@ def make_outpaint_inputs(src: Image.Image, target_w: int, target_h: int, feather
     return canvas, mask
 
 
-def seed_from_name(name: str, base_seed: int) -> int:
-    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
-    stable = int(digest[:8], 16)
-    return (stable + base_seed) % (2**31 - 1)
-
-
 def resolve_model_path(explicit_model: Optional[str]) -> Path:
     if explicit_model:
         p = Path(explicit_model).expanduser().resolve()
@@ -129,17 +115,7 @@ def resolve_model_path(explicit_model: Optional[str]) -> Path:
 
 def load_pipe(model_path: Path, device: str, dtype: torch.dtype):
     print(f"[load] model={model_path}")
-    pipe = StableDiffusionInpaintPipeline.from_single_file(
-        str(model_path),
-        torch_dtype=dtype,
-        use_safetensors=True,
-        safety_checker=None,
-    )
-    pipe = pipe.to(device)
-    pipe.safety_checker = None
-    if device in ("mps", "cpu"):
-        pipe.enable_attention_slicing()
-    return pipe
+    return pipeline_manager(model_path, device, dtype).get(StableDiffusionInpaintPipeline)
 
 
 def main() -> None:
@@ -150,7 +126,8 @@ def main() -> None:
     parser.add_argument("--overwrite", action="store_true", help="Write outputs back into input folder.")
     parser.add_argument("--prompt", default="pixel art Three Kingdoms scene background, seamless extension, coherent lighting, clean edges, crisp details", help="Positive prompt.")
     parser.add_argument("--negative-prompt", default="people, characters, text, logo, watermark, blurry, smudged, deformed geometry", help="Negative prompt.")
-    parser.add_argument("--steps", type=int, default=28, help="Inference steps.")
+    parser.add_argument("--scheduler", choices=list(SCHEDULER_PRESETS), default="checkpoint", help="Sampler preset; 'checkpoint' keeps the model's own scheduler. dpmpp-2m or unipc need far fewer steps.")
+    parser.add_argument("--steps", type=int, default=None, help="Inference steps (default: the scheduler preset's step count, 28 for checkpoint).")
     parser.add_argument("--guidance", type=float, default=6.5, help="Guidance scale.")
     parser.add_argument("--strength", type=float, default=1.0, help="Inpaint strength.")
     parser.add_argument("--feather", type=int, default=2, help="Mask feather radius in pixels.")
@@ -178,6 +155,12 @@ def main() -> None:
     print(f"[env] device={device} dtype={dtype} files={len(files)}")
 
     pipe = load_pipe(model_path, device, dtype)
+    preset_steps = apply_scheduler_preset(pipe, args.scheduler)
+    steps = args.steps or preset_steps
+    print(f"[env] scheduler={args.scheduler} steps={steps}")
+    # Every file shares the same prompts: encode them once (or load them from the cache).
+    prompt_cache = pipeline_manager(model_path).prompt_cache()
+    prompt_embeds, negative_prompt_embeds = prompt_cache.encode([args.prompt], [args.negative_prompt])
 
     for i, src_path in enumerate(files, start=1):
         dst_path = output_dir / src_path.name
@@ -188,13 +171,13 @@ def main() -> None:
             gen = torch.Generator(device=device).manual_seed(file_seed)
 
             result = pipe(
-                prompt=args.prompt,
-                negative_prompt=args.negative_prompt,
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
                 image=base,
                 mask_image=mask,
                 width=PIPE_W,
                 height=TARGET_H,
-                num_inference_steps=args.steps,
+                num_inference_steps=steps,
                 guidance_scale=args.guidance,
                 strength=args.strength,
                 generator=gen,
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pixel-art downscaling and image comparison helpers for the portrait tools.
+
+Diffusion runs at several times the size of the final 40x48 portraits. NEAREST
+keeps one arbitrary pixel of every block, so a stray highlight or noise pixel can
+end up in the sprite. block_mode_downscale instead keeps each block's dominant
+color after quantizing to a shared palette, the way a pixel artist would
+reduce it.
+
+mean_delta_e (CIE76 distance in Lab), ssim (structure of the luma channel) and
+palette_distance (how far apart the two color sets are) compare small
+portraits, for benchmarks that trade generation cost against output quality.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+DOWNSCALE_METHODS = ("nearest", "mode")
+PALETTE_COLORS = 48
+
+
+def block_mode_downscale(image: Image.Image, width: int, height: int, colors: int = PALETTE_COLORS) -> Image.Image:
+    """Downscale to width x height, giving each output pixel its block's most common palette color."""
+    image = image.convert("RGB")
+    block_w = max(1, image.width // width)
+    block_h = max(1, image.height // height)
+    if image.size != (width * block_w, height * block_h):
+        image = image.resize((width * block_w, height * block_h), Image.NEAREST)
+
+    quantized = image.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+    palette = np.array(quantized.getpalette()[: colors * 3], dtype=np.uint8).reshape(-1, 3)
+    indices = np.asarray(quantized, dtype=np.intp)
+
+    # [height, block_h, width, block_w] -> one row of block pixels per output pixel
+    blocks = indices.reshape(height, block_h, width, block_w).transpose(0, 2, 1, 3).reshape(height * width, -1)
+    counts = np.zeros((blocks.shape[0], len(palette)), dtype=np.int32)
+    np.add.at(counts, (np.arange(blocks.shape[0])[:, None], blocks), 1)
+    dominant = counts.argmax(axis=1)
+    return Image.fromarray(palette[dominant].reshape(height, width, 3), "RGB")
+
+
+def pixel_downscale(image: Image.Image, width: int, height: int, method: str = "nearest") -> Image.Image:
+    if method == "nearest":
+        return image.resize((width, height), Image.NEAREST)
+    if method == "mode":
+        return block_mode_downscale(image, width, height)
+    raise ValueError(f"Unknown downscale method '{method}' (expected one of: {', '.join(DOWNSCALE_METHODS)})")
+
+
+def rgb_to_lab(image: Image.Image) -> np.ndarray:
+    """sRGB (D65) image -> float [h, w, 3] CIE Lab."""
+    rgb = np.asarray(image.convert("RGB"), dtype=np.float64) / 255.0
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array(
+        [
+            [0.4124564, 0.3575761, 0.1804375],
+            [0.2126729, 0.7151522, 0.0721750],
+            [0.0193339, 0.1191920, 0.9503041],
+        ]
+    ).T
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack(
+        [116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+        axis=-1,
+    )
+
+
+def delta_e_map(a: Image.Image, b: Image.Image) -> np.ndarray:
+    if a.size != b.size:
+        raise ValueError(f"Cannot compare images of different sizes: {a.size} vs {b.size}")
+    return np.linalg.norm(rgb_to_lab(a) - rgb_to_lab(b), axis=-1)
+
+
+def mean_delta_e(a: Image.Image, b: Image.Image) -> float:
+    """Mean per-pixel CIE76 color difference (about 2.3 is a just-noticeable difference)."""
+    return float(delta_e_map(a, b).mean())
+
+
+def ssim(a: Image.Image, b: Image.Image, window: int = 7) -> float:
+    """Mean structural similarity of the luma channels (7x7 uniform window, like scikit-image)."""
+    if a.size != b.size:
+        raise ValueError(f"Cannot compare images of different sizes: {a.size} vs {b.size}")
+    x = np.asarray(a.convert("L"), dtype=np.float64)
+    y = np.asarray(b.convert("L"), dtype=np.float64)
+    window = min(window, x.shape[0], x.shape[1])
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    def local_mean(img: np.ndarray) -> np.ndarray:
+        return np.lib.stride_tricks.sliding_window_view(img, (window, window)).mean(axis=(-2, -1))
+
+    n = window * window
+    mu_x, mu_y = local_mean(x), local_mean(y)
+    # Sample (co)variances, as scikit-image computes them
+    var_x = (local_mean(x * x) - mu_x * mu_x) * n / (n - 1)
+    var_y = (local_mean(y * y) - mu_y * mu_y) * n / (n - 1)
+    cov = (local_mean(x * y) - mu_x * mu_y) * n / (n - 1)
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(ssim_map.mean())
+
+
+def _palette(image: Image.Image) -> tuple[np.ndarray, np.ndarray]:
+    """Distinct colors of an image in Lab, with the share of pixels each covers."""
+    rgb = np.asarray(image.convert("RGB")).reshape(-1, 3)
+    colors, counts = np.unique(rgb, axis=0, return_counts=True)
+    lab = rgb_to_lab(Image.fromarray(colors.reshape(1, -1, 3).astype(np.uint8))).reshape(-1, 3)
+    return lab, counts / counts.sum()
+
+
+def palette_distance(a: Image.Image, b: Image.Image) -> float:
+    """Symmetric, pixel-weighted mean dE from each image's colors to the other's nearest color."""
+    lab_a, weight_a = _palette(a)
+    lab_b, weight_b = _palette(b)
+    distances = np.linalg.norm(lab_a[:, None, :] - lab_b[None, :, :], axis=-1)
+    return float((distances.min(axis=1) @ weight_a + distances.min(axis=0) @ weight_b) / 2)
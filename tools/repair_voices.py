@@ -2,7 +2,6 @@
 """Repair high-WER voice lines by keeping only improved regenerations."""
 
 import argparse
-import json
 import os
 import shutil
 import sys
@@ -10,6 +9,7 @@ import tempfile
 from pathlib import Path
 
 import generate_voices_xtts as voices
+import voice_report_store
 
 
 DEFAULT_WER_THRESHOLDS = {
@@ -28,22 +28,6 @@ def legacy_report_path(lang_code):
     return report_path(lang_code)
 
 
-def load_json(path, default):
-    if not path.exists():
-        return default
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return default
-
-
-def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-        f.write("\n")
-
-
 def report_entry_key(lang_code, line_id):
     return f"{lang_code}:{line_id}"
 
@@ -77,6 +61,15 @@ def parse_args():
         default=[],
         help="Repair a specific voice ID. Can be passed multiple times.",
     )
+    parser.add_argument(
+        "--attempts",
+        type=int,
+        default=int(os.environ.get("VOICE_REPAIR_ATTEMPTS", "1")),
+        help=(
+            "Candidates to generate per line; the lowest-WER one is kept. Stops early once a "
+            "candidate is under the threshold. Takes rejected by the signal pre-screen skip STT."
+        ),
+    )
     parser.add_argument(
         "--include-ok",
         action="store_true",
@@ -127,7 +120,16 @@ def report_result(line, lang_code, verification_result):
     }
 
 
-def repair_line(line, old_entry, lang_code, backup_dir):
+def restore_backup(backup_path, audio_path, lang_code, line_id, old_loudness):
+    shutil.copy2(backup_path, audio_path)
+    cache = voices.loudness_cache(lang_code)
+    if old_loudness is None:
+        cache.pop(line_id, None)
+    else:
+        cache[line_id] = old_loudness
+
+
+def repair_line(line, old_entry, lang_code, backup_dir, threshold, attempts=1):
     line_id = line["id"]
     audio_path = line_audio_path(lang_code, line_id)
     if not audio_path.exists() or audio_path.stat().st_size == 0:
@@ -135,35 +137,55 @@ def repair_line(line, old_entry, lang_code, backup_dir):
         return "skipped", old_entry
 
     backup_path = Path(backup_dir) / f"{line_id}.ogg"
+    best_path = Path(backup_dir) / f"{line_id}.best.ogg"
     shutil.copy2(audio_path, backup_path)
+    old_loudness = voices.loudness_cache(lang_code).get(line_id)
 
     old_wer = float(old_entry.get("wer", 1.0))
     print(f"\nRepairing {line_id} ({line['char']}): old WER {old_wer:.2f}")
 
-    result = voices.generate_voice(
-        line["id"],
-        line["char"],
-        line["text"],
-        speed=line.get("speed", 1.0),
-        emotion=line.get("emotion"),
-        phonetic_text=line.get("phonetic_text"),
-        lang_code=lang_code,
-        force=True,
-        regeneration_reason=f"voice repair: old WER {old_wer:.2f}",
-    )
+    # Best of N: keep a copy of the lowest-WER candidate so far, since each
+    # attempt overwrites the line's audio file.
+    best = None
+    for attempt in range(1, max(1, attempts) + 1):
+        if attempts > 1:
+            print(f"  Attempt {attempt}/{attempts}")
+        result = voices.generate_voice(
+            line["id"],
+            line["char"],
+            line["text"],
+            speed=line.get("speed", 1.0),
+            emotion=line.get("emotion"),
+            phonetic_text=line.get("phonetic_text"),
+            lang_code=lang_code,
+            force=True,
+            regeneration_reason=f"voice repair: old WER {old_wer:.2f}",
+            # Every candidate must be a fresh take, not stitched from cached sentences.
+            reuse_segments=False,
+        )
+        if not result or "wer" not in result or result.get("prescreen"):
+            continue
 
-    if not result or "wer" not in result:
-        shutil.copy2(backup_path, audio_path)
-        print(f"  Rejected {line_id}: candidate did not produce a WER")
+        new_wer = float(result["wer"])
+        if best is None or new_wer < best[0]:
+            shutil.copy2(audio_path, best_path)
+            best = (new_wer, result, voices.loudness_cache(lang_code).get(line_id))
+        if new_wer <= threshold:
+            break
+
+    if best is None:
+        restore_backup(backup_path, audio_path, lang_code, line_id, old_loudness)
+        print(f"  Rejected {line_id}: no candidate passed the pre-screen and produced a WER")
         return "rejected", old_entry
 
-    new_wer = float(result["wer"])
+    new_wer, result, new_loudness = best
     if new_wer < old_wer:
+        restore_backup(best_path, audio_path, lang_code, line_id, new_loudness)
         print(f"  Kept {line_id}: WER improved {old_wer:.2f} -> {new_wer:.2f}")
         return "kept", report_result(line, lang_code, result)
 
-    shutil.copy2(backup_path, audio_path)
-    print(f"  Restored {line_id}: candidate WER {new_wer:.2f} was not lower than {old_wer:.2f}")
+    restore_backup(backup_path, audio_path, lang_code, line_id, old_loudness)
+    print(f"  Restored {line_id}: best candidate WER {new_wer:.2f} was not lower than {old_wer:.2f}")
     return "rejected", old_entry
 
 
@@ -180,11 +202,13 @@ def main():
         )
 
     active_report_path = report_path(lang_code)
-    report = load_json(active_report_path, None)
-    if report is None and legacy_report_path(lang_code) != active_report_path:
-        report = load_json(legacy_report_path(lang_code), None)
+    store = voice_report_store.report_store()
+    report = voices.load_verification_report(lang_code)
+    if not report and legacy_report_path(lang_code) != active_report_path:
+        store.sync_from_json(lang_code, legacy_report_path(lang_code))
+        report = store.entries(lang_code)
 
-    if report is None:
+    if not report:
         print(
             f"No voice verification report found for {lang_code}. "
             "Run make voices or a voice verification pass first."
@@ -216,15 +240,22 @@ def main():
     voices.load_models()
 
     counts = {"kept": 0, "rejected": 0, "skipped": 0}
+    run_id = store.begin_run("repair_voices", lang_code)
     with tempfile.TemporaryDirectory(prefix=f"voice-repair-{lang_code}-") as backup_dir:
         for _, line, old_entry in candidates:
             key = report_entry_key(lang_code, line["id"])
-            status, entry = repair_line(line, old_entry, lang_code, backup_dir)
+            status, entry = repair_line(line, old_entry, lang_code, backup_dir, threshold, args.attempts)
             counts[status] += 1
             report[key] = entry
-            save_json(active_report_path, report)
+            if status == "kept":
+                loudness = voices.loudness_cache(lang_code).get(line["id"]) or {}
+                store.upsert(lang_code, entry, loudness.get("audio_hash"), run_id)
 
     voices.save_voice_hash_manifest(lines, lang_code)
+    voices.save_loudness_cache(lines, lang_code)
+    voices.prune_master_wavs(lang_code)
+    if voice_report_store.json_export_enabled():
+        store.export_json(lang_code, active_report_path)
     print(
         f"\nVoice repair complete for {lang_code}: "
         f"{counts['kept']} kept, {counts['rejected']} rejected, {counts['skipped']} skipped."
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Shared Stable Diffusion pipeline loading for the portrait and outpaint tools.
+
+`from_single_file` re-converts the original checkpoint into diffusers modules
+on every start. Here the checkpoint is instead converted once into a diffusers
+directory under a cache keyed by the checkpoint's sha256 and size. Later
+starts load that directory with `from_pretrained`, which memory-maps the
+safetensors weights instead of rebuilding them.
+
+The cache lives in .models/diffusers_cache (override with TKT_SD_CACHE_DIR).
+Set TKT_SD_DIFFUSERS_CACHE=0 to always load from the single file.
+
+SCHEDULER_PRESETS names the samplers the tools can switch between with
+--scheduler, each with the step count it is meant to run at.
+
+PromptEmbeddingCache keeps CLIP text embeddings in an in-memory LRU backed by
+safetensors files in the same cache, keyed by checkpoint fingerprint and
+prompt text. The shared negative prompts are then encoded once, ever, rather
+than on every pipeline call.
+
+SDPipelineManager owns the device, dtype and attention slicing choice for a
+checkpoint and builds any further pipeline kind (img2img, inpaint) around the
+already loaded UNet, VAE and text encoder instead of loading them again.
+pipeline_manager returns one manager per checkpoint per process.
+
+Callers pass in the pipeline class, so this module never imports diffusers
+itself and the callers' torch-load patches stay in effect.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from model_paths import PROJECT_ROOT, resolve_sd_model_path
+
+
+CACHE_DIR = Path(os.environ.get("TKT_SD_CACHE_DIR", str(PROJECT_ROOT / ".models" / "diffusers_cache"))).expanduser()
+CACHE_ENABLED = os.environ.get("TKT_SD_DIFFUSERS_CACHE", "1").lower() not in ("0", "off", "false", "no")
+FINGERPRINTS_FILE = "fingerprints.json"
+PROMPT_CACHE_SIZE = int(os.environ.get("TKT_SD_PROMPT_CACHE_SIZE", "256"))
+
+# name -> diffusers scheduler class, config overrides and default step count.
+# "checkpoint" keeps whatever scheduler the checkpoint ships with.
+SCHEDULER_PRESETS = {
+    "checkpoint": {"scheduler": None, "config": {}, "steps": 28},
+    "euler-a": {"scheduler": "EulerAncestralDiscreteScheduler", "config": {}, "steps": 20},
+    "dpmpp-2m": {
+        "scheduler": "DPMSolverMultistepScheduler",
+        "config": {"algorithm_type": "dpmsolver++", "solver_order": 2, "use_karras_sigmas": False},
+        "steps": 12,
+    },
+    "dpmpp-2m-karras": {
+        "scheduler": "DPMSolverMultistepScheduler",
+        "config": {"algorithm_type": "dpmsolver++", "solver_order": 2, "use_karras_sigmas": True},
+        "steps": 10,
+    },
+    "unipc": {"scheduler": "UniPCMultistepScheduler", "config": {}, "steps": 10},
+    "ddim": {"scheduler": "DDIMScheduler", "config": {}, "steps": 25},
+}
+# Attention slicing trades a little speed for much lower peak memory where memory is unified or scarce
+ATTENTION_SLICING_DEVICES = ("mps", "cpu")
+# Scheduler config each pipeline was loaded with, so presets never inherit each other's overrides
+_BASE_SCHEDULERS: dict = {}
+
+
+def _load_fingerprints() -> dict:
+    path = CACHE_DIR / FINGERPRINTS_FILE
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_fingerprints(fingerprints: dict) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f"{FINGERPRINTS_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, CACHE_DIR / FINGERPRINTS_FILE)
+
+
+def checkpoint_fingerprint(model_path: Path) -> str:
+    """`<sha256[:16]>-<size>` for a checkpoint.
+
+    The hash is remembered per path, size and mtime, so an unchanged
+    multi-gigabyte checkpoint is not re-read on every start.
+    """
+    model_path = Path(model_path).resolve()
+    stat = model_path.stat()
+    fingerprints = _load_fingerprints()
+    known = fingerprints.get(str(model_path))
+    if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        return known["fingerprint"]
+
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 24), b""):
+            digest.update(chunk)
+    fingerprint = f"{digest.hexdigest()[:16]}-{stat.st_size}"
+    fingerprints[str(model_path)] = {
+        "fingerprint": fingerprint,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    _save_fingerprints(fingerprints)
+    return fingerprint
+
+
+def pick_device() -> str:
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def pick_dtype(device: str) -> Any:
+    import torch
+
+    # Safer defaults for Apple MPS and CPU.
+    if device == "cuda":
+        return torch.float16
+    return torch.float32
+
+
+def seed_from_name(name: str, base_seed: int) -> int:
+    """Stable per-file seed: the same file name and base seed always give the same seed."""
+    digest = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    stable = int(digest[:8], 16)
+    return (stable + base_seed) % (2**31 - 1)
+
+
+def apply_scheduler_preset(pipe: Any, name: str) -> int:
+    """Switch pipe to a SCHEDULER_PRESETS entry; returns the preset's default step count."""
+    if name not in SCHEDULER_PRESETS:
+        raise ValueError(f"Unknown scheduler preset '{name}' (expected one of: {', '.join(SCHEDULER_PRESETS)})")
+    import diffusers
+
+    base = _BASE_SCHEDULERS.setdefault(id(pipe), pipe.scheduler)
+    preset = SCHEDULER_PRESETS[name]
+    if preset["scheduler"] is None:
+        pipe.scheduler = base
+    else:
+        scheduler_cls = getattr(diffusers, preset["scheduler"])
+        pipe.scheduler = scheduler_cls.from_config(base.config, **preset["config"])
+    return preset["steps"]
+
+
+def cached_model_dir(model_path: Path) -> Path:
+    return CACHE_DIR / checkpoint_fingerprint(model_path)
+
+
+def convert_checkpoint(pipeline_cls: Any, model_path: Path, target_dir: Path, **loader_options: Any) -> Path:
+    """Convert a single-file checkpoint into a diffusers directory at target_dir.
+
+    loader_options (e.g. local_files_only) go to from_single_file. torch_dtype
+    is ignored: the cache keeps the checkpoint's full precision and callers
+    pick their dtype when loading from it.
+    """
+    print(f"[sd-cache] converting {model_path.name} -> {target_dir} (one-time)")
+    options = {
+        "safety_checker": None,
+        "feature_extractor": None,
+        "requires_safety_checker": False,
+        "use_safetensors": True,
+    }
+    options.update(loader_options)
+    options.pop("torch_dtype", None)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f"{target_dir.name}.", dir=CACHE_DIR))
+    try:
+        pipe = pipeline_cls.from_single_file(str(model_path), **options)
+        pipe.save_pretrained(str(staging), safe_serialization=True)
+        del pipe
+        try:
+            os.replace(staging, target_dir)
+        except OSError:
+            # Another process finished the same conversion first.
+            if not (target_dir / "model_index.json").exists():
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target_dir
+
+
+def load_sd_pipeline(pipeline_cls: Any, model_path: Optional[Path] = None, torch_dtype: Any = None, **kwargs: Any) -> Any:
+    """
+    Load `pipeline_cls` (e.g. StableDiffusionImg2ImgPipeline) for the project checkpoint.
+
+    Converts the checkpoint into the diffusers cache on first use and loads
+    from the cache afterwards. Extra kwargs go to from_pretrained/from_single_file.
+    """
+    model_path = Path(model_path or resolve_sd_model_path())
+    options = {
+        "safety_checker": None,
+        "requires_safety_checker": False,
+        "use_safetensors": True,
+    }
+    if torch_dtype is not None:
+        options["torch_dtype"] = torch_dtype
+    options.update(kwargs)
+
+    if not CACHE_ENABLED:
+        return pipeline_cls.from_single_file(str(model_path), **options)
+
+    target_dir = cached_model_dir(model_path)
+    if not (target_dir / "model_index.json").exists():
+        convert_checkpoint(pipeline_cls, model_path, target_dir, **options)
+    print(f"[sd-cache] loading {target_dir}")
+    options.setdefault("local_files_only", True)
+    options.setdefault("low_cpu_mem_usage", True)
+    return pipeline_cls.from_pretrained(str(target_dir), **options)
+
+
+class PromptEmbeddingCache:
+    """CLIP text embeddings per prompt, cached in memory (LRU) and on disk.
+
+    Each text is encoded on its own, which matches what encode_prompt does for
+    the prompt and negative prompt under classifier-free guidance: both are
+    padded to the tokenizer's max length.
+
+    Keys include the text encoder's dtype: an fp16 encoding differs from an
+    fp32 one even after upcasting, so each precision gets its own entries.
+    Files are stored as fp32 either way.
+    """
+
+    def __init__(self, pipe: Any, model_hash: str, max_entries: int = PROMPT_CACHE_SIZE) -> None:
+        self.pipe = pipe
+        self.model_hash = model_hash
+        self.max_entries = max(1, max_entries)
+        self.cache_dir = CACHE_DIR / "prompt_embeds" / model_hash
+        self.memory: "OrderedDict[str, Any]" = OrderedDict()
+        self.stats = {"memory": 0, "disk": 0, "encoded": 0}
+
+    def _key(self, text: str) -> str:
+        dtype = str(self.pipe.text_encoder.dtype)
+        return hashlib.sha256(f"{self.model_hash}\0{dtype}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, text: str) -> Any:
+        """[1, tokens, dim] embedding of one prompt, on the pipeline's device."""
+        import torch
+        from safetensors.torch import load_file, save_file
+
+        key = self._key(text)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["memory"] += 1
+            return self.memory[key]
+
+        path = self.cache_dir / f"{key}.safetensors"
+        embeds = None
+        if path.exists():
+            try:
+                embeds = load_file(str(path))["embeds"]
+                self.stats["disk"] += 1
+            except Exception:
+                embeds = None
+        if embeds is None:
+            with torch.no_grad():
+                embeds, _ = self.pipe.encode_prompt(text, self.pipe.device, 1, False)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            save_file({"embeds": embeds.detach().to(device="cpu", dtype=torch.float32).contiguous()}, str(tmp_path))
+            os.replace(tmp_path, path)
+            self.stats["encoded"] += 1
+
+        embeds = embeds.to(device=self.pipe.device, dtype=self.pipe.text_encoder.dtype)
+        self.memory[key] = embeds
+        if len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return embeds
+
+    def encode(self, prompts: list, negative_prompts: list) -> tuple:
+        """Batched (prompt_embeds, negative_prompt_embeds) for a pipeline call."""
+        import torch
+
+        return (
+            torch.cat([self.embed(text) for text in prompts]),
+            torch.cat([self.embed(text or "") for text in negative_prompts]),
+        )
+
+    def summary(self) -> str:
+        return (
+            f"prompt embeddings: {self.stats['memory']} memory hit(s), "
+            f"{self.stats['disk']} disk hit(s), {self.stats['encoded']} encoded"
+        )
+
+
+class SDPipelineManager:
+    """One checkpoint's components, loaded once and shared by every pipeline built from them.
+
+    The first `get` loads the checkpoint as the requested pipeline class and
+    moves it to the device. Later calls with another class wrap the same
+    component objects, so nothing is loaded or copied again. Each pipeline
+    gets its own scheduler, since schedulers keep per-run state and presets
+    replace them. Sharing assumes a regular 4-channel UNet, which both img2img
+    and (legacy) inpainting accept. Each tool currently builds a single
+    pipeline kind; sharing only applies to a process that builds several.
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[Path] = None,
+        device: Optional[str] = None,
+        dtype: Any = None,
+        attention_slicing: Optional[bool] = None,
+    ) -> None:
+        self.model_path = Path(model_path or resolve_sd_model_path())
+        self.device = device or pick_device()
+        self.dtype = dtype if dtype is not None else pick_dtype(self.device)
+        if attention_slicing is None:
+            attention_slicing = self.device in ATTENTION_SLICING_DEVICES
+        self.attention_slicing = attention_slicing
+        self.pipelines: dict = {}
+        self._components: Optional[dict] = None
+        self._scheduler: Any = None
+        self._prompt_cache: Optional[PromptEmbeddingCache] = None
+
+    def get(self, pipeline_cls: Any, **kwargs: Any) -> Any:
+        """The pipeline_cls pipeline over the shared components; kwargs only apply to the first load."""
+        pipe = self.pipelines.get(pipeline_cls)
+        if pipe is not None:
+            return pipe
+
+        started = time.perf_counter()
+        if self._components is None:
+            pipe = load_sd_pipeline(pipeline_cls, self.model_path, torch_dtype=self.dtype, **kwargs)
+            pipe.safety_checker = None
+            if self.attention_slicing:
+                pipe.enable_attention_slicing()
+            pipe.to(self.device)
+            self._components = dict(pipe.components)
+            self._scheduler = pipe.scheduler
+            source = "loaded"
+        else:
+            accepted = inspect.signature(pipeline_cls.__init__).parameters
+            components = {name: module for name, module in self._components.items() if name in accepted}
+            components["scheduler"] = type(self._scheduler).from_config(self._scheduler.config)
+            if "requires_safety_checker" in accepted:
+                components["requires_safety_checker"] = False
+            pipe = pipeline_cls(**components)
+            source = "built from shared components"
+        print(f"[sd] {pipeline_cls.__name__} {source} in {time.perf_counter() - started:.2f}s ({self.device}, {self.dtype})")
+        self.pipelines[pipeline_cls] = pipe
+        return pipe
+
+    def prompt_cache(self) -> PromptEmbeddingCache:
+        """Prompt embeddings shared by all of this manager's pipelines (they share a text encoder)."""
+        if self._prompt_cache is None:
+            if not self.pipelines:
+                raise RuntimeError("Load a pipeline before asking for its prompt cache")
+            pipe = next(iter(self.pipelines.values()))
+            self._prompt_cache = PromptEmbeddingCache(pipe, checkpoint_fingerprint(self.model_path))
+        return self._prompt_cache
+
+
+_MANAGERS: dict = {}
+
+
+def pipeline_manager(
+    model_path: Optional[Path] = None,
+    device: Optional[str] = None,
+    dtype: Any = None,
+    attention_slicing: Optional[bool] = None,
+) -> SDPipelineManager:
+    """The process-wide manager for a checkpoint, created on first use with the given settings."""
+    model_path = Path(model_path or resolve_sd_model_path()).resolve()
+    manager = _MANAGERS.get(model_path)
+    if manager is None:
+        manager = _MANAGERS[model_path] = SDPipelineManager(model_path, device, dtype, attention_slicing)
+    return manager
@@ -6,7 +6,10 @@ and comparing to the original text.
 
 import os
 import json
-from faster_whisper import WhisperModel
+import voice_backends
+import voice_loudness
+import voice_report_store
+import voice_timing
 from voice_metrics import calculate_text_error_rate
 
 # Language support
@@ -16,9 +19,11 @@ LANGUAGE = os.environ.get("VOICE_LANG", "en")
 VOICES_DIR = os.path.join("public/assets/audio/voices", LANGUAGE)
 if LANGUAGE != "en":
     EXTRACTED_LINES_FILE = f"tools/extracted_voice_lines_{LANGUAGE}.json"
-    REPORT_FILE = f"voice_verification_report_{LANGUAGE}.json"
 else:
     EXTRACTED_LINES_FILE = "tools/extracted_voice_lines.json"
+if LANGUAGE != "en":
+    REPORT_FILE = str(voice_report_store.default_json_path(LANGUAGE))
+else:
     REPORT_FILE = "voice_verification_report.json"
 
 # Load game script from extracted voice lines
@@ -30,22 +35,30 @@ with open(EXTRACTED_LINES_FILE, 'r', encoding='utf-8') as f:
 WER_THRESHOLD = 0.7 if LANGUAGE == "zh" else 0.3
 
 def load_whisper_model():
-    """Load the Whisper model (using 'base' for speed, 'medium' for accuracy)"""
+    """Load the Whisper cascade (tiny int8 first pass, larger model for borderline clips).
+
+    Set VOICE_STT_BACKEND=faster-whisper to score everything with a single model,
+    or VOICE_STT_BACKEND=align to score by CTC forced alignment of the expected text.
+    Uses the warm model from voice_daemon.py when one is running.
+    """
     print("Loading Whisper model...")
-    model = WhisperModel("base", device="cpu", compute_type="int8")
+    model = voice_backends.load_stt_backend()
+    if model is None:
+        raise RuntimeError("Whisper (faster-whisper or openai-whisper) is required for voice verification")
     print("Model loaded!")
     return model
 
 
-def transcribe_audio(model, audio_path, lang_code="en"):
-    """Transcribe an audio file using Whisper"""
+def transcribe_audio(model, audio_path, lang_code="en", expected_text=None):
+    """Transcribe an audio file using Whisper; returns (text, word timings)"""
     try:
-        segments, info = model.transcribe(audio_path, language=lang_code)
-        text = " ".join([segment.text for segment in segments])
-        return text.strip()
+        result = model.transcribe(audio_path, language=lang_code, expected_text=expected_text)
+        if result.get("weak_words"):
+            print(f"  Low-confidence words: {', '.join(result['weak_words'])}")
+        return result["text"].strip(), result.get("words", [])
     except Exception as e:
         print(f"Error transcribing {audio_path}: {e}")
-        return ""
+        return "", []
 
 
 def calculate_wer(original, transcribed):
@@ -98,6 +111,8 @@ def verify_all_voices():
     
     model = load_whisper_model()
     report = {}
+    word_timings = {}
+    audio_hashes = {}
     
     total = len(game_script)
     bad_count = 0
@@ -127,8 +142,12 @@ def verify_all_voices():
             bad_count += 1
             continue
         
+        audio_hashes[line_id] = voice_loudness.audio_file_hash(audio_path)
+
         # Transcribe (use language code for better accuracy)
-        stt_output = transcribe_audio(model, audio_path, lang_code=LANGUAGE)
+        stt_output, words = transcribe_audio(model, audio_path, lang_code=LANGUAGE, expected_text=original_text)
+        if words:
+            word_timings[line_id] = words
         
         # Calculate WER
         error_rate = calculate_wer(original_text, stt_output)
@@ -152,27 +171,27 @@ def verify_all_voices():
             "language": LANGUAGE
         }
     
-    # Save report - merge with existing if it exists
-    existing_report = {}
-    if os.path.exists(REPORT_FILE):
-        try:
-            with open(REPORT_FILE, "r", encoding="utf-8") as f:
-                existing_report = json.load(f)
-        except:
-            existing_report = {}
-    
-    # Merge new results into existing report
-    for key, data in report.items():
-        existing_report[key] = data
-    
-    with open(REPORT_FILE, "w", encoding="utf-8") as f:
-        json.dump(existing_report, f, indent=4, ensure_ascii=False)
+    # Upsert into the report store (only changed lines are written), then
+    # export the language's JSON report from it
+    store = voice_report_store.report_store()
+    store.sync_from_json(LANGUAGE, REPORT_FILE)
+    store.upsert_many(LANGUAGE, report, audio_hashes, run_id=store.begin_run("verify_voices", LANGUAGE))
+    if voice_report_store.json_export_enabled():
+        store.export_json(LANGUAGE, REPORT_FILE)
+
+    # Keep the word timings Whisper just produced in the game's timing manifest
+    voice_timing.update_manifest(
+        LANGUAGE,
+        [(line["id"], line["text"]) for line in game_script],
+        fresh_words=word_timings,
+    )
     
     print(f"\n{'='*60}")
     print(f"Verification complete! (Language: {LANGUAGE})")
     print(f"Total lines: {total}")
     print(f"Bad lines (WER > {WER_THRESHOLD*100:.0f}%): {bad_count}")
     print(f"Report saved to: {REPORT_FILE}")
+    print(f"Timing manifest: {voice_timing.manifest_path(LANGUAGE)}")
     
     return report
 
@@ -192,7 +211,7 @@ def verify_single(line_id):
         print(f"Audio file not found: {audio_path}")
         return None
     
-    stt_output = transcribe_audio(model, audio_path, lang_code=LANGUAGE)
+    stt_output, _ = transcribe_audio(model, audio_path, lang_code=LANGUAGE, expected_text=line["text"])
     error_rate = calculate_wer(line["text"], stt_output)
     
     print(f"Line ID: {line_id}")
@@ -0,0 +1,642 @@
+"""Pluggable speech synthesis (TTS) and transcription (STT) backends for the voice tools.
+
+The generator normally clones voices with XTTS and verifies them with Whisper.
+The stub backends stand in for both models so the rest of the pipeline (trimming,
+encoding, reports, manifests) can be exercised and benchmarked on a machine with
+no model weights.
+
+Select backends with VOICE_TTS_BACKEND (xtts|stub) and VOICE_STT_BACKEND
+(cascade|whisper|faster-whisper|align|stub|none).
+
+The "align" STT backend skips free decoding altogether: it force-aligns the
+expected text against the clip with a CTC acoustic model and reports a
+confidence per word (see ForcedAlignSTTBackend).
+
+The default "cascade" STT backend transcribes every clip with a tiny int8
+Whisper model and only re-transcribes clips whose WER lands in a per-language
+borderline band with a larger model (see CascadeSTTBackend).
+
+TTS backends accept max_duration_s: XTTS then streams the generation and
+aborts with GenerationBudgetExceeded as soon as the audio produced so far runs
+past the budget, instead of finishing a runaway take first.
+
+When tools/voice_daemon.py is running, the loaders hand out thin clients that
+forward jobs to the daemon's already-loaded models instead of loading them
+in-process. Set VOICE_DAEMON=0 to always load in-process.
+"""
+
+import hashlib
+import json
+import os
+import re
+import socket
+import tempfile
+import wave
+
+TTS_BACKEND_ENV = "VOICE_TTS_BACKEND"
+STT_BACKEND_ENV = "VOICE_STT_BACKEND"
+DAEMON_SOCKET_ENV = "VOICE_DAEMON_SOCKET"
+DAEMON_ENABLE_ENV = "VOICE_DAEMON"
+DEFAULT_TTS_BACKEND = "xtts"
+DEFAULT_STT_BACKEND = "cascade"
+XTTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+WHISPER_MODEL_SIZE = "base"
+CASCADE_FAST_MODEL = os.environ.get("VOICE_CASCADE_FAST_MODEL", "tiny")
+CASCADE_ACCURATE_MODEL = os.environ.get("VOICE_CASCADE_ACCURATE_MODEL", "small")
+CASCADE_BANDS_ENV = "VOICE_CASCADE_BANDS"
+# Per-language (low, high) WER band in which the fast tier's score is not
+# trusted. Below low the clip is clearly good, at or above high it is clearly
+# bad; anything in between is re-transcribed by the accurate tier. Each band
+# straddles the pass thresholds the verifiers use (en 0.3/0.4, zh 0.7).
+DEFAULT_CASCADE_BANDS = {
+    "en": (0.15, 0.65),
+    "zh": (0.4, 0.95),
+}
+DEFAULT_CASCADE_BAND = (0.15, 0.75)
+# Forced-alignment words whose mean CTC token probability falls below this
+# are treated as not spoken.
+ALIGN_WORD_CONFIDENCE_MIN = float(os.environ.get("VOICE_ALIGN_WORD_CONFIDENCE", "0.35"))
+DAEMON_PROBE_TIMEOUT_S = 2.0
+# Whisper backends return word-level timestamps for the voice timing manifest
+# (see voice_timing.py). VOICE_WORD_TIMESTAMPS=0 skips that extra alignment pass.
+WORD_TIMESTAMPS = os.environ.get("VOICE_WORD_TIMESTAMPS", "1").lower() not in ("0", "off", "false", "no")
+
+
+class GenerationBudgetExceeded(RuntimeError):
+    """A streaming synthesis ran past its duration budget and was aborted."""
+
+    def __init__(self, produced_s, budget_s):
+        super().__init__(f"generated {produced_s:.1f}s of audio, over the {budget_s:.1f}s budget")
+        self.produced_s = produced_s
+        self.budget_s = budget_s
+
+
+def write_pcm16_wav(file_path, samples, sample_rate):
+    """Write mono float samples in [-1, 1] as a 16-bit WAV."""
+    import numpy
+
+    pcm = (numpy.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(str(file_path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+
+class XTTSBackend:
+    """Coqui XTTS v2 voice cloning."""
+
+    name = "xtts"
+    requires_speaker_wav = True
+    # Project overrides, layered over the model config's sampling defaults
+    sampling = {"temperature": 0.75, "repetition_penalty": 2.0, "top_k": 50, "top_p": 0.85}
+    CONFIG_SAMPLING_KEYS = ("temperature", "length_penalty", "repetition_penalty", "top_k", "top_p")
+
+    def __init__(self, model_name=XTTS_MODEL_NAME, device="cpu"):
+        from TTS.api import TTS
+
+        # You must accept the Coqui TTS terms of service
+        os.environ["COQUI_TOS_AGREED"] = "1"
+        self.model = TTS(model_name).to(device)
+        self._latents = {}
+
+    def _sampling_settings(self):
+        """Sampling kwargs as Xtts.synthesize builds them: config values, then our overrides."""
+        config = self.model.synthesizer.tts_model.config
+        settings = {key: getattr(config, key) for key in self.CONFIG_SAMPLING_KEYS if hasattr(config, key)}
+        settings.update(self.sampling)
+        return settings
+
+    def _conditioning_latents(self, speaker_wav):
+        """Speaker latents, computed once per reference clip with the config's reference settings."""
+        key = os.path.abspath(speaker_wav)
+        if key not in self._latents:
+            xtts = self.model.synthesizer.tts_model
+            config = xtts.config
+            # Same arguments Xtts.full_inference passes for tts_to_file
+            self._latents[key] = xtts.get_conditioning_latents(
+                audio_path=[speaker_wav],
+                gpt_cond_len=config.gpt_cond_len,
+                gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+                max_ref_length=config.max_ref_len,
+                sound_norm_refs=config.sound_norm_refs,
+            )
+        return self._latents[key]
+
+    def _synthesize_streaming(self, text, speaker_wav, language, file_path, speed, max_duration_s):
+        import numpy
+
+        xtts = self.model.synthesizer.tts_model
+        sample_rate = xtts.config.audio.output_sample_rate
+        gpt_cond_latent, speaker_embedding = self._conditioning_latents(speaker_wav)
+        chunks = []
+        produced = 0
+        stream = xtts.inference_stream(
+            text,
+            language,
+            gpt_cond_latent,
+            speaker_embedding,
+            speed=speed,
+            enable_text_splitting=True,
+            **self._sampling_settings(),
+        )
+        for chunk in stream:
+            chunk = chunk.detach().cpu().numpy().reshape(-1)
+            chunks.append(chunk)
+            produced += len(chunk)
+            if produced / sample_rate > max_duration_s:
+                stream.close()
+                raise GenerationBudgetExceeded(produced / sample_rate, max_duration_s)
+        write_pcm16_wav(file_path, numpy.concatenate(chunks) if chunks else numpy.zeros(0), sample_rate)
+        return file_path
+
+    def synthesize(self, text, speaker_wav, language, file_path, speed=1.0, emotion=None, max_duration_s=None):
+        if max_duration_s is not None:
+            return self._synthesize_streaming(text, speaker_wav, language, file_path, speed, max_duration_s)
+        self.model.tts_to_file(
+            text=text,
+            speaker_wav=speaker_wav,
+            language=language,
+            file_path=file_path,
+            speed=speed,
+            emotion=emotion,
+            **self._sampling_settings(),
+        )
+        return file_path
+
+
+class StubTTSBackend:
+    """Deterministic synthetic speech for model-free runs.
+
+    Each word becomes a voiced burst (a harmonic tone with a syllable envelope)
+    and punctuation becomes silence, so pause trimming and encoding see
+    realistic input. The same text, speaker and speed always give the same
+    samples.
+    """
+
+    name = "stub"
+    requires_speaker_wav = False
+    sample_rate = 24000  # XTTS v2 output rate
+
+    WORD_GAP_S = 0.06
+    CLAUSE_GAP_S = 0.25
+    SENTENCE_GAP_S = 0.45
+    SECONDS_PER_CHAR = 0.06
+    SECONDS_PER_CJK_CHAR = 0.22
+
+    def __init__(self, model_name=None, device="cpu"):
+        import numpy
+
+        self.np = numpy
+
+    def _seed(self, *parts):
+        digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+        return int(digest[:16], 16)
+
+    def _tokens(self, text):
+        """Split text into (word, trailing_gap_seconds) pairs."""
+        tokens = []
+        for match in re.finditer(r"([^\s,;:.!?，。！？；：、…]+)([\s,;:.!?，。！？；：、…]*)", text):
+            word, trail = match.group(1), match.group(2)
+            if any(ch in trail for ch in ".!?。！？…"):
+                gap = self.SENTENCE_GAP_S
+            elif any(ch in trail for ch in ",;:，；：、"):
+                gap = self.CLAUSE_GAP_S
+            else:
+                gap = self.WORD_GAP_S
+            tokens.append((word, gap))
+        return tokens
+
+    def _word_duration(self, word):
+        cjk = sum(1 for ch in word if "㐀" <= ch <= "鿿")
+        other = len(word) - cjk
+        return max(0.12, cjk * self.SECONDS_PER_CJK_CHAR + other * self.SECONDS_PER_CHAR)
+
+    def render(self, text, speaker_wav=None, language="en", speed=1.0):
+        """Return the synthetic waveform as float32 samples in [-1, 1]."""
+        np = self.np
+        rng = np.random.default_rng(self._seed(text, speaker_wav, language, speed))
+        speaker_rng = np.random.default_rng(self._seed(speaker_wav))
+        f0_base = float(speaker_rng.uniform(90.0, 180.0))
+        speed = speed or 1.0
+        sr = self.sample_rate
+
+        pieces = [np.zeros(int(0.1 * sr), dtype=np.float32)]
+        for word, gap in self._tokens(text):
+            duration = self._word_duration(word) / speed
+            t = np.arange(int(duration * sr), dtype=np.float32) / sr
+            f0 = f0_base * float(rng.uniform(0.9, 1.15))
+            pitch = f0 * (1.0 + 0.03 * np.sin(2 * np.pi * 5.0 * t))
+            phase = 2 * np.pi * np.cumsum(pitch) / sr
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+            syllables = max(1, round(duration / 0.18))
+            envelope = np.abs(np.sin(np.pi * syllables * t / max(duration, 1e-6))) ** 0.5
+            burst = 0.25 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+            pieces.append(burst.astype(np.float32))
+            pieces.append(np.zeros(int(gap / speed * sr), dtype=np.float32))
+
+        return np.clip(np.concatenate(pieces), -1.0, 1.0)
+
+    def synthesize(self, text, speaker_wav, language, file_path, speed=1.0, emotion=None, max_duration_s=None):
+        samples = self.render(text, speaker_wav, language, speed)
+        if max_duration_s is not None and len(samples) / self.sample_rate > max_duration_s:
+            raise GenerationBudgetExceeded(len(samples) / self.sample_rate, max_duration_s)
+        write_pcm16_wav(file_path, samples, self.sample_rate)
+        return file_path
+
+
+class WhisperSTTBackend:
+    """openai-whisper transcription."""
+
+    name = "whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE):
+        import whisper
+
+        self.model = whisper.load_model(model_size)
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        result = self.model.transcribe(str(audio_path), language=language, word_timestamps=WORD_TIMESTAMPS)
+        segments = result.get("segments", [])
+        return {
+            "text": result["text"].strip(),
+            "segments": [
+                {"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+                for seg in segments
+            ],
+            "words": [
+                {"word": word["word"], "start": float(word["start"]), "end": float(word["end"]), "score": float(word["probability"])}
+                for seg in segments
+                for word in seg.get("words", [])
+            ],
+            "language": result.get("language", language),
+        }
+
+
+class FasterWhisperSTTBackend:
+    """faster-whisper (CTranslate2) transcription, int8 on CPU."""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, device="cpu", compute_type="int8"):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        segments, info = self.model.transcribe(str(audio_path), language=language, word_timestamps=WORD_TIMESTAMPS)
+        segments = list(segments)
+        words = [
+            {"word": word.word, "start": float(word.start), "end": float(word.end), "score": float(word.probability)}
+            for seg in segments
+            for word in (seg.words or [])
+        ]
+        segments = [
+            {"start": float(seg.start), "end": float(seg.end), "text": seg.text}
+            for seg in segments
+        ]
+        return {
+            "text": " ".join(seg["text"] for seg in segments).strip(),
+            "segments": segments,
+            "words": words,
+            "language": info.language,
+            "language_probability": float(info.language_probability),
+        }
+
+
+class StubSTTBackend:
+    """Echoes the expected text back, so every clip scores a WER of zero."""
+
+    name = "stub"
+
+    def __init__(self, model_size=None):
+        pass
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        return {"text": (expected_text or "").strip(), "segments": [], "language": language}
+
+
+def parse_cascade_bands(value):
+    """Parse "en=0.15:0.65,zh=0.4:0.95" into {"en": (0.15, 0.65), ...}."""
+    bands = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            lang, band = item.split("=", 1)
+            low, high = (float(part) for part in band.split(":", 1))
+        except ValueError:
+            raise ValueError(f"Invalid {CASCADE_BANDS_ENV} entry '{item}' (expected lang=low:high)")
+        bands[lang.strip().lower()] = (low, high)
+    return bands
+
+
+class CascadeSTTBackend:
+    """Two-tier Whisper: a tiny model scores every clip, a larger one settles borderline ones.
+
+    Needs expected_text to decide; without it the accurate tier transcribes
+    directly. The accurate model is loaded on the first borderline clip, so a
+    run where every clip is clearly good or clearly bad never pays for it.
+    Results carry "tier" ("fast" or "accurate") and the "wer" the decision used.
+    """
+
+    name = "cascade"
+
+    def __init__(self, model_size=None, fast_model=CASCADE_FAST_MODEL, accurate_model=CASCADE_ACCURATE_MODEL, bands=None):
+        try:
+            self.engine = FasterWhisperSTTBackend
+            self.fast = FasterWhisperSTTBackend(fast_model)
+        except ImportError:
+            self.engine = WhisperSTTBackend
+            self.fast = WhisperSTTBackend(fast_model)
+        self.accurate_model = accurate_model
+        self.accurate = None
+        self.bands = dict(DEFAULT_CASCADE_BANDS)
+        self.bands.update(parse_cascade_bands(os.environ.get(CASCADE_BANDS_ENV)))
+        self.bands.update(bands or {})
+        self.counts = {"fast": 0, "accurate": 0}
+
+    def band(self, language):
+        return self.bands.get((language or "").lower(), DEFAULT_CASCADE_BAND)
+
+    def _accurate_tier(self):
+        if self.accurate is None:
+            self.accurate = self.engine(self.accurate_model)
+        return self.accurate
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        from voice_metrics import calculate_text_error_rate
+
+        if expected_text is None:
+            result = self._accurate_tier().transcribe(audio_path, language=language)
+            self.counts["accurate"] += 1
+            return dict(result, tier="accurate")
+
+        result = self.fast.transcribe(audio_path, language=language)
+        error_rate = calculate_text_error_rate(expected_text, result["text"], language)
+        low, high = self.band(language)
+        if error_rate < low or error_rate >= high:
+            self.counts["fast"] += 1
+            return dict(result, tier="fast", wer=error_rate)
+
+        result = self._accurate_tier().transcribe(audio_path, language=language)
+        self.counts["accurate"] += 1
+        return dict(
+            result,
+            tier="accurate",
+            wer=calculate_text_error_rate(expected_text, result["text"], language),
+            fast_wer=error_rate,
+        )
+
+
+class ForcedAlignSTTBackend:
+    """Scores a clip by force-aligning the expected text with a CTC model (torchaudio MMS_FA).
+
+    One forward pass plus a Viterbi alignment, with no beam search, so it is much
+    cheaper than Whisper on CPU. Each expected word gets a confidence (mean
+    probability of its aligned tokens). "text" holds the words that cleared
+    ALIGN_WORD_CONFIDENCE_MIN, so the usual WER against the expected text
+    becomes the fraction of words the audio does not support. "words" and
+    "weak_words" show which ones failed.
+
+    MMS_FA aligns romanized text: Mandarin is aligned per character through
+    pypinyin. The backend needs expected_text; it cannot transcribe.
+    """
+
+    name = "align"
+
+    def __init__(self, model_size=None, device="cpu"):
+        import torch
+        import torchaudio
+
+        self.torch = torch
+        self.torchaudio = torchaudio
+        self.device = device
+        bundle = torchaudio.pipelines.MMS_FA
+        self.model = bundle.get_model(with_star=False).to(device).eval()
+        self.tokenizer = bundle.get_tokenizer()
+        self.aligner = bundle.get_aligner()
+        self.sample_rate = bundle.sample_rate
+        self.vocabulary = set(bundle.get_dict(star=None))
+
+    def _romanize(self, word, language):
+        if (language or "").lower() == "zh":
+            from pypinyin import Style, lazy_pinyin
+
+            word = "".join(lazy_pinyin(word, style=Style.NORMAL))
+        return "".join(ch for ch in word.lower() if ch in self.vocabulary)
+
+    def _words(self, text, language):
+        """(display word, romanized word) pairs that the aligner can handle."""
+        from voice_metrics import normalize_for_wer
+
+        words = []
+        for word in normalize_for_wer(text, language).split():
+            romanized = self._romanize(word, language)
+            if romanized:
+                words.append((word, romanized))
+        return words
+
+    def _load_audio(self, audio_path):
+        waveform, sample_rate = self.torchaudio.load(str(audio_path))
+        waveform = waveform.mean(dim=0, keepdim=True)
+        if sample_rate != self.sample_rate:
+            waveform = self.torchaudio.functional.resample(waveform, sample_rate, self.sample_rate)
+        return waveform.to(self.device)
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        if expected_text is None:
+            raise ValueError("The align STT backend needs the expected text of the clip")
+
+        words = self._words(expected_text, language)
+        waveform = self._load_audio(audio_path)
+        frame_s = 0.0
+        scores = [0.0] * len(words)
+        spans = [[] for _ in words]
+        if words:
+            with self.torch.inference_mode():
+                emission, _ = self.model(waveform)
+            frame_s = waveform.size(1) / emission.size(1) / self.sample_rate
+            try:
+                spans = self.aligner(emission[0], self.tokenizer([romanized for _, romanized in words]))
+                scores = [
+                    sum(span.score * len(span) for span in word_spans) / sum(len(span) for span in word_spans)
+                    for word_spans in spans
+                ]
+            except RuntimeError:
+                # The clip is too short to hold every expected token: nothing aligns.
+                pass
+
+        aligned = []
+        for (word, _), word_spans, score in zip(words, spans, scores):
+            entry = {"word": word, "score": float(score)}
+            if word_spans:
+                entry["start"] = word_spans[0].start * frame_s
+                entry["end"] = word_spans[-1].end * frame_s
+            aligned.append(entry)
+        kept = [entry["word"] for entry in aligned if entry["score"] >= ALIGN_WORD_CONFIDENCE_MIN]
+        return {
+            "text": " ".join(kept),
+            "segments": [],
+            "language": language,
+            "words": aligned,
+            "weak_words": [entry["word"] for entry in aligned if entry["score"] < ALIGN_WORD_CONFIDENCE_MIN],
+            "score": sum(scores) / len(scores) if scores else 0.0,
+        }
+
+
+TTS_BACKENDS = {
+    "xtts": XTTSBackend,
+    "stub": StubTTSBackend,
+}
+
+STT_BACKENDS = {
+    "cascade": CascadeSTTBackend,
+    "whisper": WhisperSTTBackend,
+    "faster-whisper": FasterWhisperSTTBackend,
+    "align": ForcedAlignSTTBackend,
+    "stub": StubSTTBackend,
+}
+
+
+def default_daemon_socket_path():
+    """Socket path shared by the daemon and its clients."""
+    uid = getattr(os, "getuid", lambda: 0)()
+    return os.environ.get(DAEMON_SOCKET_ENV) or os.path.join(
+        tempfile.gettempdir(), f"tkt-voice-daemon-{uid}.sock"
+    )
+
+
+class VoiceDaemonClient:
+    """Sends newline-delimited JSON jobs to a running voice daemon."""
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_daemon_socket_path()
+        self.timeout = timeout
+        self.info = {}
+
+    def request(self, op, **params):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps({"op": op, **params}, ensure_ascii=False).encode("utf-8") + b"\n")
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+
+        if not chunks:
+            raise RuntimeError(f"voice daemon closed the connection during '{op}'")
+        response = json.loads(b"".join(chunks).decode("utf-8"))
+        if response.get("error_type") == "GenerationBudgetExceeded":
+            raise GenerationBudgetExceeded(response["produced_s"], response["budget_s"])
+        if not response.get("ok"):
+            raise RuntimeError(f"voice daemon '{op}' failed: {response.get('error', 'unknown error')}")
+        return response.get("result")
+
+
+def connect_daemon(socket_path=None):
+    """Return a client for a live daemon, or None if none is running or it is disabled."""
+    if os.environ.get(DAEMON_ENABLE_ENV, "1").lower() in ("0", "off", "false", "no"):
+        return None
+    return probe_daemon(socket_path)
+
+
+def probe_daemon(socket_path=None):
+    """Return a client for a live daemon at socket_path, or None; ignores VOICE_DAEMON."""
+    client = VoiceDaemonClient(socket_path)
+    if not os.path.exists(client.socket_path):
+        return None
+    try:
+        client.timeout = DAEMON_PROBE_TIMEOUT_S
+        client.info = client.request("ping") or {}
+    except (OSError, ValueError, RuntimeError):
+        return None
+    client.timeout = None  # Jobs wait in the daemon queue for as long as they need.
+    return client
+
+
+class DaemonTTSBackend:
+    """Forwards synthesis to the voice daemon. Paths are sent absolute; the daemon writes the WAV."""
+
+    def __init__(self, client):
+        self.client = client
+        self.name = client.info.get("tts")
+        self.requires_speaker_wav = bool(client.info.get("tts_requires_speaker_wav", True))
+
+    def synthesize(self, text, speaker_wav, language, file_path, speed=1.0, emotion=None, max_duration_s=None):
+        self.client.request(
+            "synthesize",
+            text=text,
+            speaker_wav=os.path.abspath(speaker_wav) if speaker_wav else None,
+            language=language,
+            file_path=os.path.abspath(file_path),
+            speed=speed,
+            emotion=emotion,
+            max_duration_s=max_duration_s,
+        )
+        return file_path
+
+
+class DaemonSTTBackend:
+    """Forwards transcription to one of the daemon's loaded STT backends."""
+
+    def __init__(self, client, backend_name):
+        self.client = client
+        self.name = backend_name
+
+    def transcribe(self, audio_path, language=None, expected_text=None):
+        return self.client.request(
+            "transcribe",
+            backend=self.name,
+            audio_path=os.path.abspath(audio_path),
+            language=language,
+            expected_text=expected_text,
+        )
+
+
+def selected_tts_backend_name(name=None):
+    return (name or os.environ.get(TTS_BACKEND_ENV) or DEFAULT_TTS_BACKEND).lower()
+
+
+def selected_stt_backend_name(name=None):
+    return (name or os.environ.get(STT_BACKEND_ENV) or DEFAULT_STT_BACKEND).lower()
+
+
+def load_tts_backend(name=None, use_daemon=True, **kwargs):
+    """Instantiate the selected TTS backend. Raises ValueError for unknown names."""
+    backend_name = selected_tts_backend_name(name)
+    if backend_name not in TTS_BACKENDS:
+        raise ValueError(
+            f"Unknown TTS backend '{backend_name}' (expected one of: {', '.join(sorted(TTS_BACKENDS))})"
+        )
+    if use_daemon:
+        client = connect_daemon()
+        if client and client.info.get("tts") == backend_name:
+            print(f"Using warm {backend_name} model from voice daemon ({client.socket_path})")
+            return DaemonTTSBackend(client)
+    return TTS_BACKENDS[backend_name](**kwargs)
+
+
+def load_stt_backend(name=None, use_daemon=True, **kwargs):
+    """Instantiate the selected STT backend, or return None when it is unavailable."""
+    backend_name = selected_stt_backend_name(name)
+    if backend_name == "none":
+        return None
+    if backend_name not in STT_BACKENDS:
+        raise ValueError(
+            f"Unknown STT backend '{backend_name}' (expected one of: {', '.join(sorted(STT_BACKENDS))}, none)"
+        )
+    if use_daemon:
+        client = connect_daemon()
+        if client and backend_name in client.info.get("stt", []):
+            print(f"Using warm {backend_name} model from voice daemon ({client.socket_path})")
+            return DaemonSTTBackend(client, backend_name)
+    try:
+        return STT_BACKENDS[backend_name](**kwargs)
+    except ImportError:
+        return None
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Pack per-language voice clips into a few bank files with a JSON offset index.
+
+Each language's public/assets/audio/voices/{lang}/*.ogg files are concatenated
+into tools/voice_banks/{lang}/voices_NNN.bank, and index.json maps every voice
+ID to its bank, byte offset, length and content hash. A reader opens one bank and
+slices clips out of it instead of opening hundreds of tiny files.
+
+Banks are kept out of public/ (override with VOICE_BANKS_DIR) so the build does
+not ship every clip twice; the game still loads the loose clips.
+
+Rebuilds are incremental: clips keep their bank across runs, and only banks
+whose members changed, appeared or disappeared are rewritten. New clips are
+appended to the last bank until it reaches --max-bank-mb.
+
+Usage:
+  python tools/voice_bank.py pack --lang en
+  python tools/voice_bank.py bench --lang en     # cold-load time: bank vs loose files
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+VOICES_DIR = PROJECT_ROOT / "public" / "assets" / "audio" / "voices"
+BANKS_DIR = Path(os.environ.get("VOICE_BANKS_DIR", str(PROJECT_ROOT / "tools" / "voice_banks"))).expanduser()
+INDEX_VERSION = 1
+DEFAULT_MAX_BANK_MB = 8.0
+
+
+def bank_dir(lang_code):
+    return BANKS_DIR / lang_code
+
+
+def index_path(lang_code):
+    return bank_dir(lang_code) / "index.json"
+
+
+def bank_filename(bank_number):
+    return f"voices_{bank_number:03d}.bank"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_index(lang_code):
+    path = index_path(lang_code)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return None
+    return data
+
+
+def save_index(lang_code, index):
+    with open(index_path(lang_code), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def scan_clips(lang_code, previous_entries):
+    """Return {voice_id: (path, size, mtime_ns, hash)} for the loose clips.
+
+    Clips whose size and mtime match the previous index reuse its hash
+    instead of being read again.
+    """
+    clips = {}
+    for path in sorted((VOICES_DIR / lang_code).glob("*.ogg")):
+        stat = path.stat()
+        if stat.st_size == 0:
+            continue
+        voice_id = path.stem
+        previous = previous_entries.get(voice_id)
+        if previous and previous.get("length") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            clip_hash = previous["hash"]
+        else:
+            clip_hash = content_hash(path.read_bytes())
+        clips[voice_id] = (path, stat.st_size, stat.st_mtime_ns, clip_hash)
+    return clips
+
+
+def assign_banks(clips, previous_entries, max_bank_bytes):
+    """Keep existing clips in their bank; append new clips to the last bank with room."""
+    members = {}
+    for voice_id in sorted(clips):
+        previous = previous_entries.get(voice_id)
+        if previous is not None:
+            members.setdefault(previous["bank"], []).append(voice_id)
+
+    bank_sizes = {bank: sum(clips[v][1] for v in ids) for bank, ids in members.items()}
+    current_bank = max(members) if members else 0
+    for voice_id in sorted(clips):
+        if voice_id in previous_entries:
+            continue
+        size = clips[voice_id][1]
+        if bank_sizes.get(current_bank, 0) and bank_sizes[current_bank] + size > max_bank_bytes:
+            current_bank += 1
+        members.setdefault(current_bank, []).append(voice_id)
+        bank_sizes[current_bank] = bank_sizes.get(current_bank, 0) + size
+    return members
+
+
+def pack(lang_code, max_bank_bytes, force=False):
+    out_dir = bank_dir(lang_code)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = None if force else load_index(lang_code)
+    previous_entries = previous["entries"] if previous else {}
+    previous_banks = {b["file"]: b for b in previous["banks"]} if previous else {}
+
+    clips = scan_clips(lang_code, previous_entries)
+    members = assign_banks(clips, previous_entries, max_bank_bytes)
+
+    entries = {}
+    banks = []
+    rewritten = 0
+    for bank_number in sorted(members):
+        voice_ids = sorted(members[bank_number])
+        filename = bank_filename(bank_number)
+        bank_path = out_dir / filename
+        unchanged = (
+            filename in previous_banks
+            and bank_path.exists()
+            and sorted(v for v, e in previous_entries.items() if e["bank"] == bank_number) == voice_ids
+            and all(previous_entries[v]["hash"] == clips[v][3] for v in voice_ids)
+        )
+
+        if unchanged:
+            for voice_id in voice_ids:
+                entries[voice_id] = {**previous_entries[voice_id], "mtime_ns": clips[voice_id][2]}
+            banks.append(previous_banks[filename])
+            continue
+
+        offset = 0
+        digest = hashlib.sha256()
+        tmp_path = bank_path.with_suffix(".bank.tmp")
+        with open(tmp_path, "wb") as bank_file:
+            for voice_id in voice_ids:
+                path, size, mtime_ns, clip_hash = clips[voice_id]
+                data = path.read_bytes()
+                bank_file.write(data)
+                digest.update(data)
+                entries[voice_id] = {
+                    "bank": bank_number,
+                    "offset": offset,
+                    "length": len(data),
+                    "hash": clip_hash,
+                    "mtime_ns": mtime_ns,
+                }
+                offset += len(data)
+        os.replace(tmp_path, bank_path)
+        banks.append({"file": filename, "bytes": offset, "hash": digest.hexdigest()})
+        rewritten += 1
+
+    kept_files = {b["file"] for b in banks}
+    for stale in out_dir.glob("voices_*.bank"):
+        if stale.name not in kept_files:
+            stale.unlink()
+
+    index = {"version": INDEX_VERSION, "language": lang_code, "banks": banks, "entries": entries}
+    if index != previous:
+        save_index(lang_code, index)
+    return {"clips": len(entries), "banks": len(banks), "rewritten": rewritten}
+
+
+def drop_from_page_cache(path):
+    """Ask the OS to evict a file from the page cache (Linux); returns False if unsupported."""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def read_loose(lang_code, voice_ids):
+    total = 0
+    for voice_id in voice_ids:
+        with open(VOICES_DIR / lang_code / f"{voice_id}.ogg", "rb") as f:
+            total += len(f.read())
+    return total
+
+
+def read_banked(lang_code, voice_ids):
+    with open(index_path(lang_code), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    handles = {}
+    total = 0
+    try:
+        for voice_id in voice_ids:
+            entry = index["entries"][voice_id]
+            bank_file = handles.get(entry["bank"])
+            if bank_file is None:
+                bank_file = open(bank_dir(lang_code) / bank_filename(entry["bank"]), "rb")
+                handles[entry["bank"]] = bank_file
+            bank_file.seek(entry["offset"])
+            total += len(bank_file.read(entry["length"]))
+    finally:
+        for bank_file in handles.values():
+            bank_file.close()
+    return total
+
+
+def bench(lang_code, repeats):
+    index = load_index(lang_code)
+    if index is None:
+        print(f"No bank index for {lang_code}; run 'pack' first.")
+        return 1
+
+    voice_ids = sorted(index["entries"])
+    if not voice_ids:
+        print(f"The {lang_code} bank index is empty; nothing to read.")
+        return 0
+    loose_files = [VOICES_DIR / lang_code / f"{v}.ogg" for v in voice_ids]
+    bank_files = [bank_dir(lang_code) / b["file"] for b in index["banks"]] + [index_path(lang_code)]
+
+    cold = all(drop_from_page_cache(p) for p in loose_files[:1])
+    if not cold:
+        print("Page-cache eviction is not supported here; timings are warm-cache reads.")
+
+    results = {"loose": [], "bank": []}
+    for _ in range(repeats):
+        for mode, files, reader in (("loose", loose_files, read_loose), ("bank", bank_files, read_banked)):
+            if cold:
+                for path in files:
+                    drop_from_page_cache(path)
+            start = time.perf_counter()
+            total_bytes = reader(lang_code, voice_ids)
+            results[mode].append(time.perf_counter() - start)
+
+    print(f"Read {len(voice_ids)} {lang_code} clips ({total_bytes / 1e6:.1f} MB), best of {repeats} {'cold' if cold else 'warm'} run(s):")
+    for mode, files in (("loose", loose_files), ("bank", bank_files)):
+        best = min(results[mode])
+        print(f"  {mode:<6} {len(files):>5} file(s) {best * 1000:>9.1f} ms  {best * 1e6 / len(voice_ids):>7.1f} us/clip")
+    speedup = min(results["loose"]) / min(results["bank"]) if min(results["bank"]) else float("inf")
+    print(f"  bank reads are {speedup:.1f}x faster")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pack voice clips into indexed bank files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_parser = sub.add_parser("pack", help="Build or incrementally update the banks.")
+    pack_parser.add_argument("--max-bank-mb", type=float, default=DEFAULT_MAX_BANK_MB, help="Soft size limit per bank.")
+    pack_parser.add_argument("--force", action="store_true", help="Ignore the existing index and rebuild every bank.")
+    bench_parser = sub.add_parser("bench", help="Compare cold-load time of banks vs loose files.")
+    bench_parser.add_argument("--repeats", type=int, default=3, help="Runs per mode; the best is reported.")
+    for sub_parser in (pack_parser, bench_parser):
+        sub_parser.add_argument(
+            "--lang",
+            action="append",
+            default=None,
+            help="Language to process; repeat for several (default: every language under voices/).",
+        )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    langs = args.lang or sorted(p.name for p in VOICES_DIR.iterdir() if p.is_dir())
+    status = 0
+    for lang_code in langs:
+        if args.command == "pack":
+            stats = pack(lang_code, int(args.max_bank_mb * 1024 * 1024), force=args.force)
+            print(
+                f"{lang_code}: {stats['clips']} clip(s) in {stats['banks']} bank(s), "
+                f"{stats['rewritten']} bank(s) rewritten -> {project_relative(bank_dir(lang_code))}"
+            )
+        else:
+            status = bench(lang_code, max(1, args.repeats)) or status
+    return status
+
+
+def project_relative(path):
+    try:
+        return str(Path(path).resolve().relative_to(PROJECT_ROOT))
+    except ValueError:
+        return str(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Keep the voice models warm between tool runs.
+
+Loads the TTS model (XTTS by default) and the Whisper transcription models once,
+then serves synthesis and transcription jobs over a Unix domain socket. Jobs are
+queued and run one at a time on a single worker thread, since the models are not
+safe to share between threads.
+
+generate_voices_xtts.py, repair_voices.py and verify_voices.py pick the daemon
+up automatically when it is running (see voice_backends.connect_daemon) and load
+models in-process otherwise.
+
+Usage:
+  python tools/voice_daemon.py                 # serve until Ctrl+C
+  python tools/voice_daemon.py --status        # show what a running daemon serves
+  python tools/voice_daemon.py --stop          # ask a running daemon to exit
+"""
+
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+
+import voice_backends
+
+
+class ModelWorker:
+    """Owns the loaded models and runs queued jobs on one thread."""
+
+    def __init__(self, tts_name, stt_names, device="cpu"):
+        self.tts_name = tts_name
+        self.tts = None
+        if tts_name != "none":
+            print(f"Loading {tts_name} TTS model...")
+            self.tts = voice_backends.load_tts_backend(tts_name, use_daemon=False, device=device)
+
+        self.stt = {}
+        for stt_name in stt_names:
+            print(f"Loading {stt_name} STT model...")
+            backend = voice_backends.load_stt_backend(stt_name, use_daemon=False)
+            if backend is None:
+                print(f"  {stt_name} is not installed; skipping")
+                continue
+            self.stt[stt_name] = backend
+
+        self.jobs = queue.Queue()
+        self.completed = 0
+        self.thread = threading.Thread(target=self._run, name="voice-daemon-worker", daemon=True)
+        self.thread.start()
+
+    def info(self):
+        return {
+            "pid": os.getpid(),
+            "tts": self.tts_name if self.tts else None,
+            "tts_requires_speaker_wav": bool(self.tts and self.tts.requires_speaker_wav),
+            "stt": sorted(self.stt),
+            "queued": self.jobs.qsize(),
+            "completed": self.completed,
+        }
+
+    def submit(self, request):
+        """Queue a job and block until the worker has a response for it."""
+        done = threading.Event()
+        slot = {}
+        self.jobs.put((request, slot, done))
+        done.wait()
+        return slot["response"]
+
+    def _run(self):
+        while True:
+            request, slot, done = self.jobs.get()
+            started = time.perf_counter()
+            try:
+                slot["response"] = {"ok": True, "result": self._execute(request)}
+            except voice_backends.GenerationBudgetExceeded as e:
+                slot["response"] = {
+                    "ok": False,
+                    "error": f"{type(e).__name__}: {e}",
+                    "error_type": type(e).__name__,
+                    "produced_s": e.produced_s,
+                    "budget_s": e.budget_s,
+                }
+            except Exception as e:
+                slot["response"] = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.completed += 1
+            print(
+                f"[{request.get('op')}] {time.perf_counter() - started:.2f}s "
+                f"({'ok' if slot['response']['ok'] else slot['response']['error']})"
+            )
+            done.set()
+
+    def _execute(self, request):
+        op = request.get("op")
+        if op == "synthesize":
+            if self.tts is None:
+                raise RuntimeError("this daemon was started without a TTS model")
+            self.tts.synthesize(
+                text=request["text"],
+                speaker_wav=request.get("speaker_wav"),
+                language=request["language"],
+                file_path=request["file_path"],
+                speed=request.get("speed", 1.0),
+                emotion=request.get("emotion"),
+                max_duration_s=request.get("max_duration_s"),
+            )
+            return {"file_path": request["file_path"]}
+        if op == "transcribe":
+            backend_name = request.get("backend") or voice_backends.DEFAULT_STT_BACKEND
+            backend = self.stt.get(backend_name)
+            if backend is None:
+                raise RuntimeError(f"STT backend '{backend_name}' is not loaded in this daemon")
+            return backend.transcribe(
+                request["audio_path"],
+                language=request.get("language"),
+                expected_text=request.get("expected_text"),
+            )
+        raise ValueError(f"unknown op '{op}'")
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            try:
+                request = json.loads(raw.decode("utf-8"))
+            except ValueError as e:
+                self._reply({"ok": False, "error": f"invalid request: {e}"})
+                continue
+
+            op = request.get("op")
+            if op == "ping":
+                self._reply({"ok": True, "result": self.server.worker.info()})
+            elif op == "shutdown":
+                self._reply({"ok": True, "result": None})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self._reply(self.server.worker.submit(request))
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class VoiceDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, worker):
+        self.worker = worker
+        super().__init__(socket_path, RequestHandler)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve warm XTTS/Whisper models to the voice tools.")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: $VOICE_DAEMON_SOCKET or a per-user temp path).")
+    parser.add_argument(
+        "--tts",
+        default=voice_backends.selected_tts_backend_name(),
+        help="TTS backend to keep loaded (xtts|stub|none).",
+    )
+    parser.add_argument(
+        "--stt",
+        default="cascade,faster-whisper",
+        help="Comma-separated STT backends to keep loaded (cascade,whisper,faster-whisper,align,stub).",
+    )
+    parser.add_argument("--device", default="cpu", help="Torch device for the TTS model.")
+    parser.add_argument("--status", action="store_true", help="Print the status of a running daemon and exit.")
+    parser.add_argument("--stop", action="store_true", help="Stop a running daemon and exit.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    socket_path = args.socket or voice_backends.default_daemon_socket_path()
+
+    if args.status or args.stop:
+        # Probe directly: VOICE_DAEMON=0 only stops clients from using the daemon
+        client = voice_backends.probe_daemon(socket_path)
+        if client is None:
+            print(f"No voice daemon is running at {socket_path}")
+            return 1
+        if args.stop:
+            client.request("shutdown")
+            print(f"Stopped voice daemon {client.info.get('pid')} at {socket_path}")
+        else:
+            print(json.dumps(client.info, indent=2))
+        return 0
+
+    if os.path.exists(socket_path):
+        if voice_backends.probe_daemon(socket_path) is not None:
+            print(f"A voice daemon is already running at {socket_path}")
+            return 1
+        os.unlink(socket_path)  # Stale socket from a daemon that did not exit cleanly
+
+    stt_names = [name.strip().lower() for name in args.stt.split(",") if name.strip()]
+    worker = ModelWorker(args.tts.lower(), stt_names, device=args.device)
+
+    server = VoiceDaemonServer(socket_path, worker)
+    os.chmod(socket_path, 0o600)
+    info = worker.info()
+    print(f"Voice daemon ready on {socket_path} (tts={info['tts']}, stt={', '.join(info['stt']) or 'none'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("Voice daemon stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
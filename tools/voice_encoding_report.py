@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Compare voice encoding profiles on size, decode memory and speech-to-text WER.
+
+Each sampled clip is re-encoded with every profile in
+generate_voices_xtts.ENCODING_PROFILES, from the same lossless master WAV that
+--apply would use. Clips without a master fall back to decoding the shipped
+Opus, which adds a lossy generation; the report counts and marks which source
+each clip used. Every variant then goes through the
+generator's own verify_audio WER check. A profile passes the guard when no line
+that was OK under the reference profile turns bad and the mean WER does not rise
+by more than --max-wer-increase.
+
+With --apply PROFILE, all clips of the language are re-encoded with that
+profile, but only if it passed the guard in this run. Clips are re-encoded from
+the lossless master WAV the generator kept for them (tools/voice_masters), never
+from the shipped Opus, so switching profiles adds no extra lossy generation.
+Clips without a matching master are left alone and listed; regenerate them to
+get one.
+
+Usage:
+  VOICE_LANG=en python tools/voice_encoding_report.py --limit 40
+  VOICE_LANG=en python tools/voice_encoding_report.py --limit 40 --apply mono-adaptive
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import generate_voices_xtts as voices
+import voice_backends
+import voice_loudness
+
+# Browsers decode Opus to 48 kHz float32 PCM.
+DECODE_RATE = 48000
+DECODE_BYTES_PER_SAMPLE = 4
+REFERENCE_PROFILE = "stereo64"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare voice encoding profiles with a WER guard.")
+    parser.add_argument("--limit", type=int, default=40, help="Number of clips to sample (0 = all).")
+    parser.add_argument("--seed", type=int, default=1337, help="Seed for sampling clips.")
+    parser.add_argument("--max-wer-increase", type=float, default=0.02, help="Allowed rise in mean WER vs the reference profile.")
+    parser.add_argument("--json-out", default=None, help="Write the full per-line results to this JSON file.")
+    parser.add_argument("--apply", default=None, help="Re-encode every clip with this profile if it passes the guard.")
+    return parser.parse_args()
+
+
+def decode_clip(audio_path, wav_path):
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", str(audio_path), "-c:a", "pcm_s16le", str(wav_path)],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip())
+
+
+def decoded_memory_bytes(duration_s, channels):
+    return int(duration_s * DECODE_RATE * channels * DECODE_BYTES_PER_SAMPLE)
+
+
+def evaluate_profiles(lines, lang_code, work_dir):
+    cache = voices.loudness_cache(lang_code)
+    rows = []
+    for i, line in enumerate(lines, start=1):
+        audio_path = Path(voices.OUTPUT_DIR) / lang_code / f"{line['id']}.ogg"
+        master = voices.master_wav_path(lang_code, line["id"], voice_loudness.audio_file_hash(audio_path))
+        print(f"[{i}/{len(lines)}] {line['id']}")
+        if master.exists():
+            wav_path, source = master, "master"
+        else:
+            wav_path, source = Path(work_dir) / f"{line['id']}.wav", "opus"
+            print("  no master WAV; decoding the shipped Opus")
+            try:
+                decode_clip(audio_path, wav_path)
+            except RuntimeError as e:
+                print(f"  decode failed: {e}")
+                continue
+
+        entry = cache.get(line["id"])
+        lufs = entry.get("lufs") if isinstance(entry, dict) else None
+        duration = voices.wav_duration_seconds(wav_path)
+        row = {"id": line["id"], "source": source, "duration_s": duration, "profiles": {}}
+        for profile_name, profile in voices.ENCODING_PROFILES.items():
+            encoded = Path(work_dir) / f"{line['id']}.{profile_name}.ogg"
+            if not voices.convert_to_ogg(str(wav_path), str(encoded), profile=profile_name, lufs=lufs):
+                continue
+            result = voices.verify_audio(str(encoded), line["text"], lang_code)
+            row["profiles"][profile_name] = {
+                "bytes": encoded.stat().st_size,
+                "decoded_bytes": decoded_memory_bytes(duration, profile["channels"]),
+                "wer": result.get("wer"),
+                "is_bad": result.get("is_bad", True),
+            }
+        rows.append(row)
+    return rows
+
+
+def summarize(rows, max_wer_increase):
+    summary = {}
+    reference = {row["id"]: row["profiles"].get(REFERENCE_PROFILE) for row in rows}
+    for profile_name in voices.ENCODING_PROFILES:
+        entries = [(row, row["profiles"][profile_name]) for row in rows if profile_name in row["profiles"]]
+        if not entries:
+            continue
+        total_bytes = sum(e["bytes"] for _, e in entries)
+        total_duration = sum(row["duration_s"] for row, _ in entries)
+        wers = [e["wer"] for _, e in entries if e["wer"] is not None]
+        ref_wers = [reference[row["id"]]["wer"] for row, _ in entries if reference.get(row["id"]) and reference[row["id"]]["wer"] is not None]
+        regressions = [
+            row["id"]
+            for row, e in entries
+            if e["is_bad"] and reference.get(row["id"]) and not reference[row["id"]]["is_bad"]
+        ]
+        mean_wer = sum(wers) / len(wers) if wers else None
+        ref_mean = sum(ref_wers) / len(ref_wers) if ref_wers else None
+        passes = not regressions and (mean_wer is None or ref_mean is None or mean_wer - ref_mean <= max_wer_increase)
+        summary[profile_name] = {
+            "clips": len(entries),
+            "bytes": total_bytes,
+            "avg_kbps": 8 * total_bytes / total_duration / 1000 if total_duration else 0.0,
+            "decoded_bytes": sum(e["decoded_bytes"] for _, e in entries),
+            "mean_wer": mean_wer,
+            "regressions": regressions,
+            "passes": passes,
+        }
+    return summary
+
+
+def print_summary(summary):
+    reference_bytes = summary.get(REFERENCE_PROFILE, {}).get("bytes")
+    print(f"\n{'profile':<15} {'clips':>5} {'size':>9} {'vs ref':>7} {'kbps':>6} {'decoded':>9} {'mean WER':>9}  guard")
+    for name, s in summary.items():
+        ratio = f"{s['bytes'] / reference_bytes:.0%}" if reference_bytes else "-"
+        mean_wer = f"{s['mean_wer']:.3f}" if s["mean_wer"] is not None else "-"
+        guard = "PASS" if s["passes"] else f"FAIL ({len(s['regressions'])} line(s) turned bad)"
+        print(
+            f"{name:<15} {s['clips']:>5} {s['bytes'] / 1e6:>7.2f}MB {ratio:>7} {s['avg_kbps']:>6.1f} "
+            f"{s['decoded_bytes'] / 1e6:>7.1f}MB {mean_wer:>9}  {guard}"
+        )
+
+
+def apply_profile(profile_name, lines, lang_code):
+    """Re-encode clips from their master WAVs; returns (converted, ids without a master)."""
+    cache = voices.loudness_cache(lang_code)
+    converted = 0
+    missing = []
+    for line in lines:
+        audio_path = Path(voices.OUTPUT_DIR) / lang_code / f"{line['id']}.ogg"
+        if not audio_path.exists():
+            continue
+        old_hash = voice_loudness.audio_file_hash(audio_path)
+        master = voices.master_wav_path(lang_code, line["id"], old_hash)
+        if not master.exists():
+            missing.append(line["id"])
+            continue
+        entry = cache.get(line["id"])
+        lufs = entry.get("lufs") if isinstance(entry, dict) else None
+        if not voices.convert_to_ogg(str(master), str(audio_path), profile=profile_name, lufs=lufs):
+            continue
+        new_hash = voice_loudness.audio_file_hash(audio_path)
+        master.rename(voices.master_wav_path(lang_code, line["id"], new_hash))
+        if isinstance(entry, dict) and entry.get("audio_hash") == old_hash:
+            entry["audio_hash"] = new_hash
+        converted += 1
+    voices.save_loudness_cache(lines, lang_code)
+    return converted, missing
+
+
+def main():
+    args = parse_args()
+    lang_code = voices.LANGUAGE
+    if args.apply and args.apply not in voices.ENCODING_PROFILES:
+        print(f"Unknown profile '{args.apply}'. Choose from: {', '.join(voices.ENCODING_PROFILES)}")
+        return 1
+
+    voices.stt_model = voice_backends.load_stt_backend()
+    if voices.stt_model is None:
+        print("A speech-to-text backend is required for the WER guard.")
+        return 1
+
+    all_lines = [
+        line
+        for line in voices.load_voice_lines_from_extracted()
+        if (Path(voices.OUTPUT_DIR) / lang_code / f"{line['id']}.ogg").exists()
+    ]
+    sample = list(all_lines)
+    if args.limit > 0 and len(sample) > args.limit:
+        sample = random.Random(args.seed).sample(sample, args.limit)
+    if not sample:
+        print(f"No {lang_code} voice clips to compare.")
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix=f"voice-encoding-{lang_code}-") as work_dir:
+        rows = evaluate_profiles(sample, lang_code, work_dir)
+        summary = summarize(rows, args.max_wer_increase)
+        print_summary(summary)
+        from_opus = [row["id"] for row in rows if row["source"] == "opus"]
+        print(f"\nSource: {len(rows) - len(from_opus)} clip(s) from master WAVs, {len(from_opus)} from the shipped Opus")
+        if from_opus:
+            print(f"  Opus-sourced results include an extra lossy generation that --apply would not: {', '.join(from_opus)}")
+
+        if args.json_out:
+            with open(args.json_out, "w", encoding="utf-8") as f:
+                json.dump({"language": lang_code, "summary": summary, "lines": rows}, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+
+        if args.apply:
+            if not summary.get(args.apply, {}).get("passes"):
+                print(f"\nNot applying {args.apply}: it did not pass the WER guard.")
+                return 1
+            converted, missing = apply_profile(args.apply, all_lines, lang_code)
+            print(f"\nRe-encoded {converted} {lang_code} clip(s) with {args.apply}.")
+            if missing:
+                print(
+                    f"Left {len(missing)} clip(s) as they are: no lossless master WAV "
+                    f"(regenerate them to re-encode): {', '.join(missing)}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
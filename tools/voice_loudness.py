@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+EBU R128 / ITU-R BS.1770 loudness analysis and normalization for voice clips.
+
+generate_voices_xtts.py calls normalize_wav() on each freshly synthesized WAV,
+before it is encoded, so clips leave the generator at the target loudness and
+never need decoding again for normalization. Each line's loudness is cached per
+language together with the hash of its encoded .ogg.
+
+Run as a script to re-normalize existing clips (the Python counterpart of
+tools/normalize_voice_loudness.js). Clips whose audio hash matches a cached
+measurement at the target are skipped without being decoded:
+
+  python tools/voice_loudness.py --lang en [--target-lufs -16] [--dry-run]
+
+Mono audio is measured as dual mono, i.e. as it sounds when played on both
+speakers, which matches ffmpeg's measurement of the stereo files we used to ship.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+VOICES_DIR = "public/assets/audio/voices"
+DEFAULT_TARGET_LUFS = -16.0
+DEFAULT_PEAK_CEILING_DB = -1.5
+SKIP_TOLERANCE_LU = 0.5
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+BLOCK_S = 0.4
+BLOCK_STEP_S = 0.1
+
+
+def audio_file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_wav(path):
+    """Return (samples as float32 [frames, channels] in [-1, 1], sample_rate)."""
+    with wave.open(str(path), "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        width = wav_file.getsampwidth()
+        rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        ints = (bytes_[:, 0].astype(np.int32) | (bytes_[:, 1].astype(np.int32) << 8) | (bytes_[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"unsupported WAV sample width {width} in {path}")
+    return samples.reshape(-1, channels), rate
+
+
+def write_wav(path, samples, sample_rate):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype("<i2")
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(pcm.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+
+_IMPULSE_RESPONSES = {}
+IMPULSE_RESPONSE_S = 0.5
+
+
+def _biquad_loop(b, a, x):
+    y = np.empty_like(x)
+    x1 = x2 = y1 = y2 = 0.0
+    for n, xn in enumerate(x):
+        yn = b[0] * xn + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        y[n] = yn
+        x2, x1 = x1, xn
+        y2, y1 = y1, yn
+    return y
+
+
+def k_weight(samples, sample_rate):
+    """Apply the BS.1770 K-weighting filter to [frames, channels] samples."""
+    (shelf_b, shelf_a), (hp_b, hp_a) = k_weighting_filters(sample_rate)
+    if lfilter is not None:
+        return lfilter(hp_b, hp_a, lfilter(shelf_b, shelf_a, samples, axis=0), axis=0)
+
+    # Without scipy, convolve with the filter's (truncated) impulse response via
+    # FFT instead of running the recursion sample by sample in Python.
+    if sample_rate not in _IMPULSE_RESPONSES:
+        impulse = np.zeros(int(IMPULSE_RESPONSE_S * sample_rate))
+        impulse[0] = 1.0
+        _IMPULSE_RESPONSES[sample_rate] = _biquad_loop(hp_b, hp_a, _biquad_loop(shelf_b, shelf_a, impulse))
+    response = _IMPULSE_RESPONSES[sample_rate]
+    size = 1 << (len(samples) + len(response) - 2).bit_length()
+    spectrum = np.fft.rfft(samples, n=size, axis=0) * np.fft.rfft(response, n=size)[:, None]
+    return np.fft.irfft(spectrum, n=size, axis=0)[: len(samples)]
+
+
+def k_weighting_filters(sample_rate):
+    """BS.1770 pre-filter (high shelf) and RLB high-pass, computed for any sample rate."""
+    gain_db, q, fc = 3.99984385397, 0.7071752369554193, 1681.9744509555319
+    k = math.tan(math.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20.0)
+    vb = vh ** 0.499666774155
+    a0 = 1.0 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+
+    q, fc = 0.5003270373253953, 38.13547087613982
+    k = math.tan(math.pi * fc / sample_rate)
+    a0 = 1.0 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0]
+    return (shelf_b, shelf_a), (highpass_b, highpass_a)
+
+
+def integrated_loudness(samples, sample_rate):
+    """Gated integrated loudness in LUFS, or -inf for silence."""
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    weighted = k_weight(samples.astype(np.float64), sample_rate)
+
+    block = int(round(BLOCK_S * sample_rate))
+    step = int(round(BLOCK_STEP_S * sample_rate))
+    squared = weighted ** 2
+    if len(squared) < block:
+        # Shorter than one gating block: measure the clip as a single block.
+        block_power = squared.mean(axis=0, keepdims=True)
+    else:
+        cumulative = np.vstack([np.zeros((1, squared.shape[1])), np.cumsum(squared, axis=0)])
+        starts = np.arange(0, len(squared) - block + 1, step)
+        block_power = (cumulative[starts + block] - cumulative[starts]) / block
+
+    # Channel weights are 1.0 for L/R/C, so the block power is a plain sum.
+    power = block_power.sum(axis=1)
+    if samples.shape[1] == 1:
+        power = power * 2.0  # dual mono
+    with np.errstate(divide="ignore"):
+        block_lufs = -0.691 + 10 * np.log10(power)
+
+    gated = power[block_lufs > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = power[(block_lufs > ABSOLUTE_GATE_LUFS) & (block_lufs > relative_gate)]
+    if gated.size == 0:
+        return float("-inf")
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def peak_db(samples):
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    return 20 * math.log10(peak) if peak > 0 else float("-inf")
+
+
+def loudness_gain_db(input_lufs, input_peak_db, target_lufs, peak_ceiling_db):
+    """Gain that reaches the target loudness without pushing the peak over the ceiling."""
+    if not math.isfinite(input_lufs):
+        return 0.0
+    gain = target_lufs - input_lufs
+    if math.isfinite(input_peak_db):
+        gain = min(gain, peak_ceiling_db - input_peak_db)
+    return gain
+
+
+def normalize_samples(samples, sample_rate, target_lufs=DEFAULT_TARGET_LUFS, peak_ceiling_db=DEFAULT_PEAK_CEILING_DB):
+    """Return (normalized samples, measurement dict)."""
+    input_lufs = integrated_loudness(samples, sample_rate)
+    input_peak = peak_db(samples)
+    gain = loudness_gain_db(input_lufs, input_peak, target_lufs, peak_ceiling_db)
+    factor = 10 ** (gain / 20.0)
+    measurement = {
+        "input_lufs": round(input_lufs, 2) if math.isfinite(input_lufs) else None,
+        "input_peak_db": round(input_peak, 2) if math.isfinite(input_peak) else None,
+        "gain_db": round(gain, 2),
+        "lufs": round(input_lufs + gain, 2) if math.isfinite(input_lufs) else None,
+        "peak_db": round(input_peak + gain, 2) if math.isfinite(input_peak) else None,
+        "target_lufs": target_lufs,
+    }
+    return samples * factor, measurement
+
+
+def normalize_wav(path, target_lufs=DEFAULT_TARGET_LUFS, peak_ceiling_db=DEFAULT_PEAK_CEILING_DB):
+    """Measure a WAV and rewrite it at the target loudness. Returns the measurement."""
+    samples, rate = read_wav(path)
+    normalized, measurement = normalize_samples(samples, rate, target_lufs, peak_ceiling_db)
+    if measurement["gain_db"] != 0.0:
+        write_wav(path, normalized, rate)
+    return measurement
+
+
+def loudness_cache_path(lang_code):
+    return PROJECT_ROOT / "tools" / f"voice_loudness_{lang_code}.json"
+
+
+def load_loudness_cache(lang_code):
+    path = loudness_cache_path(lang_code)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_loudness_cache(lang_code, cache):
+    path = loudness_cache_path(lang_code)
+    if load_loudness_cache(lang_code) == cache:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def cache_entry(audio_hash, measurement):
+    return {
+        "audio_hash": audio_hash,
+        "lufs": measurement["lufs"],
+        "peak_db": measurement["peak_db"],
+        "target_lufs": measurement["target_lufs"],
+    }
+
+
+def is_current(entry, audio_hash, target_lufs):
+    """True when this exact audio was already measured or normalized for the target.
+
+    Clips held below the target by the peak ceiling count as current too;
+    processing them again would not change them.
+    """
+    return (
+        isinstance(entry, dict)
+        and entry.get("audio_hash") == audio_hash
+        and entry.get("target_lufs") == target_lufs
+    )
+
+
+def decode_to_wav(audio_path, wav_path):
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", str(audio_path), "-c:a", "pcm_s16le", str(wav_path)],
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-normalize voice clips to a target loudness.")
+    parser.add_argument("--lang", default=os.environ.get("VOICE_LANG", "en"), help="Voice language directory (en|zh).")
+    parser.add_argument("--target-lufs", type=float, default=DEFAULT_TARGET_LUFS, help="Target integrated loudness.")
+    parser.add_argument("--peak-ceiling", type=float, default=DEFAULT_PEAK_CEILING_DB, help="Sample peak ceiling in dBFS.")
+    parser.add_argument("--dry-run", action="store_true", help="Measure only; do not rewrite clips.")
+    parser.add_argument("--limit", type=int, default=0, help="Process at most N clips (0 = all).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Imported here so importing this module from the generator stays cheap.
+    import generate_voices_xtts as voices
+
+    voices_dir = PROJECT_ROOT / VOICES_DIR / args.lang
+    files = sorted(voices_dir.glob("*.ogg"))
+    if args.limit > 0:
+        files = files[: args.limit]
+    if not files:
+        print(f"No .ogg files under {voices_dir}")
+        return 0
+
+    cache = load_loudness_cache(args.lang)
+    present_ids = {p.stem for p in voices_dir.glob("*.ogg")}
+    counts = {"cached": 0, "measured": 0, "normalized": 0, "failed": 0}
+    print(f"Target loudness: {args.target_lufs} LUFS ({len(files)} {args.lang} clip(s))")
+
+    with tempfile.TemporaryDirectory(prefix=f"voice-loudness-{args.lang}-") as work_dir:
+        for audio_path in files:
+            line_id = audio_path.stem
+            audio_hash = audio_file_hash(audio_path)
+            if is_current(cache.get(line_id), audio_hash, args.target_lufs):
+                counts["cached"] += 1
+                continue
+
+            wav_path = Path(work_dir) / f"{line_id}.wav"
+            try:
+                decode_to_wav(audio_path, wav_path)
+                samples, rate = read_wav(wav_path)
+                normalized, measurement = normalize_samples(samples, rate, args.target_lufs, args.peak_ceiling)
+            except Exception as e:
+                print(f"  [error] {line_id}: {e}")
+                counts["failed"] += 1
+                continue
+
+            counts["measured"] += 1
+            input_lufs = measurement["input_lufs"]
+            if input_lufs is None or abs(measurement["gain_db"]) < SKIP_TOLERANCE_LU:
+                measurement = {**measurement, "lufs": input_lufs, "peak_db": measurement["input_peak_db"]}
+                cache[line_id] = cache_entry(audio_hash, measurement)
+                continue
+
+            if args.dry_run:
+                print(f"  [would normalize] {line_id} {input_lufs:.1f} -> {measurement['lufs']:.1f} LUFS")
+                continue
+
+            write_wav(wav_path, normalized, rate)
+            if not voices.convert_to_ogg(str(wav_path), str(audio_path)):
+                counts["failed"] += 1
+                continue
+            cache[line_id] = cache_entry(audio_file_hash(audio_path), measurement)
+            counts["normalized"] += 1
+            print(f"  {line_id} {input_lufs:.1f} -> {measurement['lufs']:.1f} LUFS")
+
+    cache = {line_id: entry for line_id, entry in cache.items() if line_id in present_ids}
+    if not args.dry_run:
+        save_loudness_cache(args.lang, cache)
+    print(
+        f"\nDone: {counts['cached']} cached, {counts['measured']} measured, "
+        f"{counts['normalized']} normalized, {counts['failed']} failed."
+    )
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
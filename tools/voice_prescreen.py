@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Cheap signal-level checks that reject obviously broken voice takes before STT.
+
+XTTS failures tend to be loud and obvious: near-silent takes, clipped takes,
+noise bursts, and babble that runs several times longer than the text needs.
+These checks catch them with a few vectorized numpy passes over the WAV, so
+Whisper only runs on takes that could plausibly pass.
+
+generate_voices_xtts.generate_voice() screens each trimmed WAV before loudness
+normalization (which would hide clipping and lift near-silence). A rejected take
+skips STT and is reported as bad. Run this as a script to screen existing WAVs:
+
+  python tools/voice_prescreen.py take.wav --text "We are ready to march."
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import numpy as np
+
+import voice_loudness
+
+FRAME_S = 0.04
+ACTIVE_FRAME_DBFS = -45.0
+CLIP_LEVEL = 0.999
+
+# Typical speaking rate of the cloned voices, in seconds per spoken character.
+SECONDS_PER_CHAR = 0.07
+SECONDS_PER_CJK_CHAR = 0.22
+LEAD_SECONDS = 0.25
+
+# Rejection thresholds. These are deliberately loose: anything borderline goes
+# on to Whisper, which makes the real call.
+MAX_DURATION_RATIO = 3.0
+MAX_DURATION_SLACK_S = 1.5
+MIN_DURATION_RATIO = 0.35
+MIN_ACTIVE_S = 0.3
+MAX_SILENCE_RATIO = 0.7
+MAX_CLIPPED_RATIO = 0.005
+MAX_SPECTRAL_FLATNESS = 0.45
+
+_CJK_RE = re.compile(r"[㐀-鿿]")
+_LATIN_RE = re.compile(r"[A-Za-z0-9]")
+
+
+def expected_duration_seconds(text, speed=1.0):
+    """Rough spoken duration of a line at the given XTTS speed."""
+    cjk = len(_CJK_RE.findall(text or ""))
+    latin = len(_LATIN_RE.findall(text or ""))
+    return LEAD_SECONDS + (cjk * SECONDS_PER_CJK_CHAR + latin * SECONDS_PER_CHAR) / (speed or 1.0)
+
+
+def max_duration_seconds(text, speed=1.0):
+    """Duration past which a take is treated as a runaway generation."""
+    return expected_duration_seconds(text, speed) * MAX_DURATION_RATIO + MAX_DURATION_SLACK_S
+
+
+def signal_stats(samples, sample_rate):
+    """Duration, silence ratio, peak/clipping and spectral flatness of a clip."""
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    mono = mono.astype(np.float32, copy=False)
+    duration = len(mono) / float(sample_rate)
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    clipped = int(np.count_nonzero(np.abs(samples) >= CLIP_LEVEL))
+
+    frame_len = max(1, int(FRAME_S * sample_rate))
+    frame_count = len(mono) // frame_len
+    stats = {
+        "duration_s": duration,
+        "peak_db": 20.0 * np.log10(peak) if peak > 0 else -120.0,
+        "clipped_ratio": clipped / float(samples.size) if samples.size else 0.0,
+        "silence_ratio": 1.0,
+        "active_s": 0.0,
+        "spectral_flatness": 0.0,
+    }
+    if frame_count == 0:
+        return stats
+
+    frames = mono[: frame_count * frame_len].reshape(frame_count, frame_len)
+    rms_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    active = rms_db > ACTIVE_FRAME_DBFS
+    stats["silence_ratio"] = float(1.0 - active.mean())
+    stats["active_s"] = float(active.sum() * frame_len / float(sample_rate))
+
+    if active.any():
+        window = np.hanning(frame_len).astype(np.float32)
+        power = np.abs(np.fft.rfft(frames[active] * window, axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        stats["spectral_flatness"] = float(np.median(flatness))
+    return stats
+
+
+def screen_samples(samples, sample_rate, text, speed=1.0):
+    """Return {"ok", "reasons", "stats"}; ok=False means the take is clearly bad."""
+    stats = signal_stats(samples, sample_rate)
+    expected = expected_duration_seconds(text, speed)
+    stats["expected_s"] = expected
+    reasons = []
+
+    if stats["active_s"] < MIN_ACTIVE_S:
+        reasons.append(f"near-silent ({stats['active_s']:.2f}s above {ACTIVE_FRAME_DBFS:.0f} dBFS)")
+    elif stats["silence_ratio"] > MAX_SILENCE_RATIO:
+        reasons.append(f"mostly silence ({stats['silence_ratio']:.0%})")
+    if stats["duration_s"] > max_duration_seconds(text, speed):
+        reasons.append(f"too long ({stats['duration_s']:.1f}s for ~{expected:.1f}s of text)")
+    elif stats["duration_s"] < expected * MIN_DURATION_RATIO:
+        reasons.append(f"too short ({stats['duration_s']:.1f}s for ~{expected:.1f}s of text)")
+    if stats["clipped_ratio"] > MAX_CLIPPED_RATIO:
+        reasons.append(f"clipping ({stats['clipped_ratio']:.2%} of samples at full scale)")
+    if stats["spectral_flatness"] > MAX_SPECTRAL_FLATNESS:
+        reasons.append(f"noise-like spectrum (flatness {stats['spectral_flatness']:.2f})")
+
+    return {"ok": not reasons, "reasons": reasons, "stats": stats}
+
+
+def screen_wav(path, text, speed=1.0):
+    samples, sample_rate = voice_loudness.read_wav(path)
+    return screen_samples(samples, sample_rate, text, speed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signal-level pre-screen for voice takes.")
+    parser.add_argument("wav", nargs="+", help="WAV file(s) to screen.")
+    parser.add_argument("--text", required=True, help="Text the take is supposed to say.")
+    parser.add_argument("--speed", type=float, default=1.0, help="XTTS speed the take was generated at.")
+    args = parser.parse_args()
+
+    status = 0
+    for path in args.wav:
+        result = screen_wav(path, args.text, args.speed)
+        print(f"{path}: {'OK' if result['ok'] else 'REJECT ' + '; '.join(result['reasons'])}")
+        print("  " + json.dumps({k: round(v, 4) for k, v in result["stats"].items()}))
+        if not result["ok"]:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
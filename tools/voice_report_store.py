@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+SQLite store for voice verification reports, with a query CLI.
+
+The voice tools upsert report entries here one line at a time instead of
+rewriting the whole report, and every change to a line's WER, status or audio
+hash is kept in a history table so regressions between runs can be queried.
+voice_verification_report_{lang}.json is still exported from the store at the
+end of each run, so the committed JSON files and anything that reads them keep
+working. If a JSON report changes outside the store (e.g. after a git pull), it
+is imported again the next time it is loaded.
+
+The database lives at voice_reports.sqlite next to the JSON reports, or at
+$VOICE_REPORT_DB.
+
+Usage:
+  python tools/voice_report_store.py worst --lang zh --character caocao --limit 20
+  python tools/voice_report_store.py regressed --lang en
+  python tools/voice_report_store.py summary --lang zh
+  python tools/voice_report_store.py export --lang en
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_DB_PATH = "voice_reports.sqlite"
+DB_PATH_ENV = "VOICE_REPORT_DB"
+JSON_EXPORT_ENV = "VOICE_REPORT_JSON"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    language TEXT NOT NULL,
+    line_id TEXT NOT NULL,
+    character TEXT,
+    wer REAL,
+    is_bad INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    audio_hash TEXT,
+    entry TEXT NOT NULL,
+    run_id INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (language, line_id)
+);
+CREATE INDEX IF NOT EXISTS idx_reports_language ON reports (language);
+CREATE INDEX IF NOT EXISTS idx_reports_character ON reports (language, character);
+CREATE INDEX IF NOT EXISTS idx_reports_wer ON reports (language, wer);
+CREATE INDEX IF NOT EXISTS idx_reports_status ON reports (language, status);
+CREATE INDEX IF NOT EXISTS idx_reports_audio_hash ON reports (audio_hash);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tool TEXT NOT NULL,
+    language TEXT NOT NULL,
+    started_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS report_history (
+    run_id INTEGER,
+    language TEXT NOT NULL,
+    line_id TEXT NOT NULL,
+    wer REAL,
+    is_bad INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    audio_hash TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_line ON report_history (language, line_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_history_run ON report_history (run_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def default_db_path():
+    return os.environ.get(DB_PATH_ENV) or DEFAULT_DB_PATH
+
+
+def json_export_enabled():
+    return os.environ.get(JSON_EXPORT_ENV, "1") != "0"
+
+
+def report_key(lang_code, line_id):
+    return f"{lang_code}:{line_id}"
+
+
+def entry_status(entry):
+    if entry.get("verification_status"):
+        return entry["verification_status"]
+    if entry.get("error"):
+        return "error"
+    return "bad" if entry.get("is_bad") else "ok"
+
+
+def entry_line_id(key, entry):
+    return entry.get("id") or str(key).split(":", 1)[-1]
+
+
+def _file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _wer(entry):
+    try:
+        return float(entry["wer"]) if entry.get("wer") is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ReportStore:
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def begin_run(self, tool, lang_code):
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (tool, language, started_at) VALUES (?, ?, ?)",
+                (tool, lang_code, time.time()),
+            )
+        return cursor.lastrowid
+
+    def upsert(self, lang_code, entry, audio_hash=None, run_id=None, commit=True):
+        """Insert or update one line. Returns True if anything about the line changed."""
+        line_id = entry_line_id(None, entry)
+        row = self.conn.execute(
+            "SELECT entry, wer, is_bad, status, audio_hash FROM reports WHERE language = ? AND line_id = ?",
+            (lang_code, line_id),
+        ).fetchone()
+        encoded = json.dumps(entry, ensure_ascii=False)
+        wer = _wer(entry)
+        is_bad = 1 if entry.get("is_bad") else 0
+        status = entry_status(entry)
+        if audio_hash is None and row is not None:
+            audio_hash = row["audio_hash"]
+        if row is not None and row["entry"] == encoded and row["audio_hash"] == audio_hash:
+            return False
+
+        now = time.time()
+        self.conn.execute(
+            """
+            INSERT INTO reports (language, line_id, character, wer, is_bad, status, audio_hash, entry, run_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (language, line_id) DO UPDATE SET
+                character = excluded.character,
+                wer = excluded.wer,
+                is_bad = excluded.is_bad,
+                status = excluded.status,
+                audio_hash = excluded.audio_hash,
+                entry = excluded.entry,
+                run_id = COALESCE(excluded.run_id, reports.run_id),
+                updated_at = excluded.updated_at
+            """,
+            (lang_code, line_id, entry.get("character"), wer, is_bad, status, audio_hash, encoded, run_id, now),
+        )
+        verification_changed = row is None or (row["wer"], row["is_bad"], row["status"], row["audio_hash"]) != (
+            wer,
+            is_bad,
+            status,
+            audio_hash,
+        )
+        if verification_changed and status != "metadata_only":
+            self.conn.execute(
+                "INSERT INTO report_history (run_id, language, line_id, wer, is_bad, status, audio_hash, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, lang_code, line_id, wer, is_bad, status, audio_hash, now),
+            )
+        if commit:
+            self.conn.commit()
+        return True
+
+    def upsert_many(self, lang_code, entries, audio_hashes=None, run_id=None):
+        """Upsert a {key: entry} report in one transaction. Returns the number of changed lines."""
+        audio_hashes = audio_hashes or {}
+        changed = 0
+        with self.conn:
+            for key, entry in entries.items():
+                if not isinstance(entry, dict):
+                    continue
+                entry = {**entry, "id": entry_line_id(key, entry)} if "id" not in entry else entry
+                if self.upsert(lang_code, entry, audio_hashes.get(entry["id"]), run_id, commit=False):
+                    changed += 1
+        return changed
+
+    def entries(self, lang_code):
+        """The report for a language as the {"lang:id": entry} dict the JSON files use."""
+        rows = self.conn.execute(
+            "SELECT line_id, entry FROM reports WHERE language = ? ORDER BY rowid", (lang_code,)
+        )
+        return {report_key(lang_code, row["line_id"]): json.loads(row["entry"]) for row in rows}
+
+    def count(self, lang_code):
+        return self.conn.execute("SELECT COUNT(*) FROM reports WHERE language = ?", (lang_code,)).fetchone()[0]
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def sync_from_json(self, lang_code, json_path):
+        """Import a JSON report if it changed since the store last wrote or read it."""
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        digest = _file_hash(json_path)
+        if self._get_meta(f"json_hash:{lang_code}") == digest:
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            return 0
+        changed = self.upsert_many(lang_code, data if isinstance(data, dict) else {}) if data else 0
+        self._set_meta(f"json_hash:{lang_code}", digest)
+        return changed
+
+    def export_json(self, lang_code, json_path):
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries(lang_code), f, indent=4, ensure_ascii=False)
+            f.write("\n")
+        self._set_meta(f"json_hash:{lang_code}", _file_hash(json_path))
+
+    def worst(self, lang_code, character=None, limit=20, include_ok=True):
+        sql = "SELECT * FROM reports WHERE language = ? AND wer IS NOT NULL"
+        params = [lang_code]
+        if character:
+            sql += " AND character = ?"
+            params.append(character)
+        if not include_ok:
+            sql += " AND is_bad = 1"
+        sql += " ORDER BY wer DESC, line_id LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def last_run_id(self, lang_code):
+        row = self.conn.execute(
+            "SELECT MAX(run_id) FROM report_history WHERE language = ? AND run_id IS NOT NULL", (lang_code,)
+        ).fetchone()
+        return row[0]
+
+    def regressions(self, lang_code, run_id=None, min_increase=0.0):
+        """Lines whose WER in a run (default: the latest) is higher than their previous result."""
+        run_id = run_id if run_id is not None else self.last_run_id(lang_code)
+        if run_id is None:
+            return []
+        return self.conn.execute(
+            """
+            WITH ranked AS (
+                SELECT h.*, ROW_NUMBER() OVER (
+                    PARTITION BY h.line_id ORDER BY h.recorded_at DESC, h.rowid DESC
+                ) AS rank
+                FROM report_history h
+                WHERE h.language = ?
+            )
+            SELECT cur.line_id, r.character, prev.wer AS previous_wer, cur.wer AS wer,
+                   prev.status AS previous_status, cur.status AS status
+            FROM ranked cur
+            JOIN ranked prev ON prev.line_id = cur.line_id AND prev.rank = 2
+            JOIN reports r ON r.language = ? AND r.line_id = cur.line_id
+            WHERE cur.rank = 1 AND cur.run_id = ? AND cur.wer > COALESCE(prev.wer, 0) + ?
+            ORDER BY cur.wer - COALESCE(prev.wer, 0) DESC
+            """,
+            (lang_code, lang_code, run_id, min_increase),
+        ).fetchall()
+
+    def summary(self, lang_code):
+        return self.conn.execute(
+            """
+            SELECT character, COUNT(*) AS lines, SUM(is_bad) AS bad, AVG(wer) AS mean_wer, MAX(wer) AS max_wer
+            FROM reports WHERE language = ?
+            GROUP BY character ORDER BY bad DESC, mean_wer DESC
+            """,
+            (lang_code,),
+        ).fetchall()
+
+
+_STORE = None
+
+
+def report_store():
+    """Shared store for the current process."""
+    global _STORE
+    if _STORE is None or _STORE.path != default_db_path():
+        _STORE = ReportStore()
+    return _STORE
+
+
+def default_json_path(lang_code):
+    return Path(f"voice_verification_report_{lang_code}.json")
+
+
+def format_wer(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the voice verification report store.")
+    parser.add_argument("--db", default=None, help=f"Database path (default: ${DB_PATH_ENV} or {DEFAULT_DB_PATH}).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    worst = sub.add_parser("worst", help="Highest-WER lines.")
+    worst.add_argument("--character", default=None, help="Only this character (e.g. caocao).")
+    worst.add_argument("--limit", type=int, default=20)
+    worst.add_argument("--bad-only", action="store_true", help="Only lines marked bad.")
+
+    regressed = sub.add_parser("regressed", help="Lines whose WER rose in the latest run.")
+    regressed.add_argument("--run", type=int, default=None, help="Run ID to check (default: the latest).")
+    regressed.add_argument("--min-increase", type=float, default=0.0)
+
+    sub.add_parser("summary", help="Line count, bad lines and WER per character.")
+    export = sub.add_parser("export", help="Write the JSON report from the store.")
+    export.add_argument("--out", default=None, help="Output path (default: voice_verification_report_{lang}.json).")
+    import_ = sub.add_parser("import", help="Load a JSON report into the store.")
+    import_.add_argument("--from", dest="source", default=None, help="JSON path (default: voice_verification_report_{lang}.json).")
+
+    for sub_parser in sub.choices.values():
+        sub_parser.add_argument("--lang", default=os.environ.get("VOICE_LANG", "en"), help="Language code.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.db:
+        os.environ[DB_PATH_ENV] = args.db
+    store = report_store()
+    lang_code = args.lang
+    if args.command != "import":
+        store.sync_from_json(lang_code, default_json_path(lang_code))
+
+    if args.command == "worst":
+        rows = store.worst(lang_code, args.character, args.limit, include_ok=not args.bad_only)
+        print(f"{'id':<36} {'character':<14} {'WER':>5}  status")
+        for row in rows:
+            print(f"{row['line_id']:<36} {row['character'] or '':<14} {format_wer(row['wer']):>5}  {row['status']}")
+    elif args.command == "regressed":
+        rows = store.regressions(lang_code, args.run, args.min_increase)
+        if not rows:
+            print(f"No {lang_code} WER regressions in run {args.run or store.last_run_id(lang_code)}.")
+        for row in rows:
+            print(
+                f"{row['line_id']:<36} {row['character'] or '':<14} "
+                f"{format_wer(row['previous_wer'])} -> {format_wer(row['wer'])}  ({row['previous_status']} -> {row['status']})"
+            )
+    elif args.command == "summary":
+        print(f"{'character':<16} {'lines':>5} {'bad':>5} {'mean WER':>9} {'max WER':>8}")
+        for row in store.summary(lang_code):
+            print(
+                f"{row['character'] or '':<16} {row['lines']:>5} {row['bad'] or 0:>5} "
+                f"{format_wer(row['mean_wer']):>9} {format_wer(row['max_wer']):>8}"
+            )
+    elif args.command == "export":
+        out = args.out or default_json_path(lang_code)
+        store.export_json(lang_code, out)
+        print(f"Exported {store.count(lang_code)} {lang_code} entries to {out}")
+    elif args.command == "import":
+        source = args.source or default_json_path(lang_code)
+        with open(source, "r", encoding="utf-8") as f:
+            changed = store.upsert_many(lang_code, json.load(f))
+        print(f"Imported {source}: {changed} {lang_code} entries changed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Per-language timing manifest for the voice lines: duration, word timestamps and
+loudness, so the game can pace subtitles and dialogue without decoding audio.
+
+The manifest is written next to the clips, at
+public/assets/audio/voices/<lang>/timing.json:
+
+  {
+    "version": 1,
+    "language": "en",
+    "lines": {
+      "daxing_gy_01": {
+        "hash": "<sha256 of the .ogg>",
+        "duration": 5.412,
+        "lufs": -16.0,
+        "words": [["third", 0.12, 0.41], ["brother", 0.41, 0.8], ...]
+      }
+    }
+  }
+
+Durations are read from the granule position of the last Ogg page, minus the
+Opus pre-skip, so only a few kilobytes of each file are read and nothing is
+decoded. Word timestamps come from the verification pass:
+- generate_voices_xtts.py records the words its STT backend returned for each
+  take it encodes.
+- verify_voices.py records the words for every clip it checks.
+
+Loudness comes from the loudness cache when its audio hash matches.
+
+Rebuilds are incremental. An entry is kept as long as its file's size and
+mtime, or failing that its hash, are unchanged. Sizes and mtimes are local to
+each checkout, so they live in tools/voice_timing_stats_<lang>.json (not
+committed) rather than in the shipped manifest. Run as a script to refresh a
+language's manifest; --transcribe fills in missing word timings with the
+configured STT backend:
+
+  python tools/voice_timing.py --lang en [--transcribe] [--force]
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+from pathlib import Path
+
+import voice_loudness
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+VOICES_DIR = "public/assets/audio/voices"
+MANIFEST_NAME = "timing.json"
+MANIFEST_VERSION = 1
+# Only these keys ship with the game
+ENTRY_KEYS = ("hash", "duration", "lufs", "words")
+
+OGG_CAPTURE = b"OggS"
+OGG_HEADER = struct.Struct("<4sBBqIIIB")
+# An Ogg page is at most 27 + 255 + 255 * 255 bytes.
+OGG_MAX_PAGE = 65307
+OPUS_GRANULE_RATE = 48000
+
+
+def manifest_path(lang_code):
+    return PROJECT_ROOT / VOICES_DIR / lang_code / MANIFEST_NAME
+
+
+def stats_path(lang_code):
+    return PROJECT_ROOT / "tools" / f"voice_timing_stats_{lang_code}.json"
+
+
+def load_stats(lang_code):
+    """line ID -> {"hash", "bytes", "mtime_ns"} of the clip as last read on this machine."""
+    path = stats_path(lang_code)
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def save_stats(lang_code, stats):
+    path = stats_path(lang_code)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def load_manifest(lang_code):
+    path = manifest_path(lang_code)
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except json.JSONDecodeError:
+            pass
+    return {"version": MANIFEST_VERSION, "language": lang_code, "lines": {}}
+
+
+def save_manifest(lang_code, manifest):
+    path = manifest_path(lang_code)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # Compact: the game fetches this file at startup.
+        json.dump(manifest, f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _ogg_pages(data):
+    """Yield (offset, header fields) for every plausible Ogg page header in data."""
+    offset = data.find(OGG_CAPTURE)
+    while offset != -1 and offset + OGG_HEADER.size <= len(data):
+        fields = OGG_HEADER.unpack_from(data, offset)
+        if fields[1] == 0:
+            yield offset, fields
+        offset = data.find(OGG_CAPTURE, offset + 1)
+
+
+def _granule_rate_and_preskip(head):
+    """(granule rate, pre-skip) from the first page's identification packet."""
+    for offset, fields in _ogg_pages(head):
+        payload = offset + OGG_HEADER.size + fields[7]
+        packet = head[payload: payload + 30]
+        if packet.startswith(b"OpusHead") and len(packet) >= 12:
+            return OPUS_GRANULE_RATE, struct.unpack_from("<H", packet, 10)[0]
+        if packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+            return struct.unpack_from("<I", packet, 12)[0], 0
+        break
+    raise ValueError("not an Ogg Opus or Ogg Vorbis stream")
+
+
+def ogg_duration_seconds(path):
+    """Duration of an Ogg Opus/Vorbis file from its last page's granule position."""
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        rate, pre_skip = _granule_rate_and_preskip(head)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - OGG_MAX_PAGE))
+        tail = f.read()
+
+    # Scan the tail forwards and keep the last real page, since a capture
+    # pattern can also occur inside packet data.
+    granule = None
+    for _, fields in _ogg_pages(tail):
+        if fields[3] >= 0:
+            granule = fields[3]
+    if granule is None:
+        raise ValueError("no Ogg page with a granule position found")
+    return max(0, granule - pre_skip) / float(rate)
+
+
+def compact_words(words):
+    """STT word dicts -> [[word, start, end], ...] rounded to milliseconds."""
+    compact = []
+    for word in words or []:
+        if word.get("start") is None or word.get("end") is None:
+            continue
+        compact.append([word["word"].strip(), round(float(word["start"]), 3), round(float(word["end"]), 3)])
+    return compact
+
+
+def update_manifest(lang_code, line_ids, fresh_words=None, loudness=None, transcriber=None, force=False):
+    """Bring a language's timing manifest up to date; returns counts of what changed.
+
+    fresh_words maps line IDs to the STT words for the clip currently on disk.
+    loudness is the language's loudness cache. transcriber, when given, is an
+    STT backend used to time lines that have no words yet.
+    """
+    fresh_words = fresh_words or {}
+    loudness = loudness if loudness is not None else voice_loudness.load_loudness_cache(lang_code)
+    manifest = load_manifest(lang_code)
+    old_lines = manifest["lines"]
+    old_stats = load_stats(lang_code)
+    lines = {}
+    stats = {}
+    counts = {"kept": 0, "updated": 0, "missing": 0, "transcribed": 0}
+    voices_dir = PROJECT_ROOT / VOICES_DIR / lang_code
+
+    for line_id, text in line_ids:
+        audio_path = voices_dir / f"{line_id}.ogg"
+        try:
+            stat = audio_path.stat()
+        except FileNotFoundError:
+            counts["missing"] += 1
+            continue
+
+        entry = old_lines.get(line_id)
+        known = old_stats.get(line_id) or {}
+        unchanged = (
+            not force
+            and entry is not None
+            and known.get("hash") == entry.get("hash")
+            and known.get("bytes") == stat.st_size
+            and known.get("mtime_ns") == stat.st_mtime_ns
+        )
+        audio_hash = entry["hash"] if unchanged else voice_loudness.audio_file_hash(audio_path)
+        same_audio = entry is not None and not force and entry.get("hash") == audio_hash
+        if not same_audio:
+            try:
+                duration = ogg_duration_seconds(audio_path)
+            except ValueError as e:
+                print(f"  {line_id}: cannot read Ogg duration ({e})")
+                counts["missing"] += 1
+                continue
+            entry = {"hash": audio_hash, "duration": round(duration, 3), "words": []}
+            counts["updated"] += 1
+        else:
+            entry = {key: entry[key] for key in ENTRY_KEYS if key in entry}
+            counts["kept"] += 1
+        stats[line_id] = {"hash": audio_hash, "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        if line_id in fresh_words:
+            entry["words"] = compact_words(fresh_words[line_id])
+        elif transcriber is not None and not entry["words"] and text:
+            result = transcriber.transcribe(str(audio_path), language=lang_code, expected_text=text)
+            entry["words"] = compact_words(result.get("words"))
+            counts["transcribed"] += 1
+
+        measured = loudness.get(line_id)
+        if isinstance(measured, dict) and measured.get("audio_hash") == audio_hash and "lufs" in measured:
+            entry["lufs"] = round(float(measured["lufs"]), 2)
+        lines[line_id] = entry
+
+    if old_lines and not lines:
+        # Nothing on disk matched: a wrong voices directory or a missing line
+        # list, not a reason to throw away the shipped manifest.
+        print(f"  No clips found under {voices_dir}; keeping the existing {MANIFEST_NAME}")
+        return counts
+
+    manifest["lines"] = lines
+    manifest["language"] = lang_code
+    if lines != old_lines:
+        save_manifest(lang_code, manifest)
+    if stats != old_stats:
+        save_stats(lang_code, stats)
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the per-language voice timing manifest.")
+    parser.add_argument("--lang", default=os.environ.get("VOICE_LANG", "en"), help="Language code (default: $VOICE_LANG or en).")
+    parser.add_argument(
+        "--transcribe",
+        action="store_true",
+        help="Run the STT backend (VOICE_STT_BACKEND) on lines that have no word timings yet.",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-read every clip even if it looks unchanged.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    import generate_voices_xtts as voices
+
+    lines = voices.load_voice_lines_from_extracted(args.lang)
+    transcriber = None
+    if args.transcribe:
+        import voice_backends
+
+        transcriber = voice_backends.load_stt_backend()
+        if transcriber is None:
+            print("No STT backend available; word timings will not be filled in.")
+
+    counts = update_manifest(
+        args.lang,
+        [(line["id"], line["text"]) for line in lines],
+        transcriber=transcriber,
+        force=args.force,
+    )
+    print(
+        f"Timing manifest for {args.lang}: {counts['updated']} updated, {counts['kept']} unchanged, "
+        f"{counts['transcribed']} transcribed, {counts['missing']} missing audio"
+    )
+    print(f"Wrote {manifest_path(args.lang)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())